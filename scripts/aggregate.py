@@ -1,10 +1,60 @@
 import argparse
+import json
 import os
-from collections import defaultdict
-from typing import Dict, List, Set, Tuple
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from compare_testsuite_log import (
+    SECTIONS,
+    SIDECAR_SUFFIX,
+    TOOLS,
+    sidecar_path,
+    summary_row,
+)
+from disk_cache import file_digest
+from artifact_names import get_possible_artifact_names
 
 SUMMARIES = "./summaries"
 FAILURES = "./current_logs"
+STATE_VERSION = 2
+REPORT_SUFFIX = "-report.log"
+# Stop watching after 6 hours by default
+DEFAULT_WATCH_TIMEOUT = 6 * 60 * 60
+
+# Failure categories in priority order
+FAILURE_CATEGORIES = {
+    "internal-compiler-error": r"internal compiler error",
+    "segmentation-fault": r"Segmentation fault",
+    "excess-errors": r"test for excess errors",
+    "execution": r"execution test|(?<= )execute(?= )",
+    "link": r"compilation failed to produce executable|undefined reference to|link(?:ing)? failed",
+    "timeout": r"timed out|\(timeout\)",
+    "unresolved": r"^UNRESOLVED:",
+}
+OTHER_CATEGORY = "other"
+# Remaining preexisting failures of these categories are listed in the report
+IMPORTANT_CATEGORIES = {
+    "internal-compiler-error",
+    "segmentation-fault",
+    "excess-errors",
+    "execution",
+}
+CATEGORY_NAMES = list(FAILURE_CATEGORIES)
+# group names can't contain '-'
+CATEGORY_RANKS = {
+    name.replace("-", "_"): rank for rank, name in enumerate(CATEGORY_NAMES)
+}
+FAILURE_CATEGORY_PATTERN = re.compile(
+    "|".join(
+        f"(?P<{name.replace('-', '_')}>{pattern})"
+        for name, pattern in FAILURE_CATEGORIES.items()
+    )
+)
 
 
 def get_additional_failures(file_name: str, failure_name: str, seen_failures: Set[str]):
@@ -35,14 +85,28 @@ def build_summary(failures: Dict[str, List[str]], failure_name: str):
     tools = ("gcc", "g++", "gfortran")
     result = f"|{failure_name}|{tools[0]}|{tools[1]}|{tools[2]}|Previous Hash|\n"
     result += "|---|---|---|---|---|\n"
-    result += f"{''.join(sorted(failures[failure_name.split(' ')[0]]))}"
+    result += f"{''.join(sorted(failures[failure_name.rsplit(' ', 1)[0]]))}"
+    result += "\n"
+    return result
+
+
+def pending_to_markdown(pending: "List[str] | None"):
+    """Lists the targets which are still running"""
+    if not pending:
+        return ""
+    result = "|Pending Targets|\n"
+    result += "|---|\n"
+    result += "".join(f"|{target}|\n" for target in sorted(pending))
     result += "\n"
     return result
 
 
-def failures_to_summary(failures: Dict[str, List[str]]):
+def failures_to_summary(
+    failures: Dict[str, List[str]], pending: "List[str] | None" = None
+):
     """Builds summary section"""
     result = "# Summary\n"
+    result += pending_to_markdown(pending)
     seen_failures: Set[str] = set()
     build_failures, seen_failures = get_additional_failures(
         "failed_build.txt", "Build Failures", seen_failures
@@ -81,6 +145,7 @@ def failures_to_markdown(
     current_hash: str,
     patch_name: str,
     title_prefix: str,
+    pending: "List[str] | None" = None,
 ):
     result = f"""---
 title: {title_prefix} {current_hash if patch_name == "" else patch_name}
@@ -94,8 +159,8 @@ title: {title_prefix} {current_hash if patch_name == "" else patch_name}
         labels.add("resolved-regressions")
     if "" in labels:
         labels.remove("")
-    summary, no_failures = failures_to_summary(failures)
-    if no_failures:
+    summary, no_failures = failures_to_summary(failures, pending)
+    if no_failures and not pending:
         # Something went wrong
         labels.add("invalid")
     if len(labels) > 0:
@@ -118,67 +183,227 @@ def parse_arch_info(name: str, target: str):
     return " ".join(parts)
 
 
-def get_common_intersection(
-    failures: Dict[str, Dict[str, Set[str]]]
-) -> Tuple[Set[str], int]:
+def iter_bits(mask: int) -> Iterator[int]:
+    """
+    Yield the indices of the set bits of mask in ascending order. Only the
+    set bits are visited, clear bits cost nothing.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def to_bitmap(ids: Iterable[int]) -> int:
+    """Build the bitmap with the bits of ids set"""
+    bits = bytearray()
+    for failure_id in ids:
+        byte_index = failure_id >> 3
+        if byte_index >= len(bits):
+            bits.extend(bytes(byte_index + 1 - len(bits)))
+        bits[byte_index] |= 1 << (failure_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FailureIndex:
+    """
+    Failures of every affected target. Each distinct failure line is stored
+    once and identified by an integer id. A target's failures are a bitmap
+    of those ids so cross-target set operations are integer operations.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.lines: List[str] = []
+        # (summary file name, target) of each bitmap
+        self.targets: List[Tuple[str, str]] = []
+        self.bitmaps: List[int] = []
+
+    def add(self, file_name: str, target: str, failures: Iterable[str]):
+        """Record the failures of a target. Targets without failures are skipped."""
+        ids = []
+        for line in failures:
+            failure_id = self.ids.get(line)
+            if failure_id is None:
+                failure_id = len(self.lines)
+                self.ids[line] = failure_id
+                self.lines.append(line)
+            ids.append(failure_id)
+        if len(ids) == 0:
+            return
+        self.targets.append((file_name, target))
+        self.bitmaps.append(to_bitmap(ids))
+
+    def failures(self, mask: int) -> List[str]:
+        """Sorted failure lines of a bitmap"""
+        return sorted(self.lines[failure_id] for failure_id in iter_bits(mask))
+
+    def signatures(self, exclude: int = 0) -> Dict[int, int]:
+        """
+        Group the failures by the exact set of targets they appear on.
+        returns Dict[target bitmap: failure bitmap]
+        failures in exclude are left out
+        """
+        failure_targets: Dict[int, int] = defaultdict(int)
+        for target_index, bitmap in enumerate(self.bitmaps):
+            target_bit = 1 << target_index
+            for failure_id in iter_bits(bitmap & ~exclude):
+                failure_targets[failure_id] |= target_bit
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for failure_id, target_mask in failure_targets.items():
+            groups[target_mask].append(failure_id)
+        return {
+            target_mask: to_bitmap(failure_ids)
+            for target_mask, failure_ids in groups.items()
+        }
+
+
+def get_common_intersection(failures: FailureIndex) -> Tuple[int, int]:
     """
     get common failures across all affected targets (ones that appear in the tables)
+    returns (failure bitmap, number of affected targets)
     """
-    common = [i for v in failures.values() for i in v.values() if len(i) != 0]
-    if len(common) == 0:
-        return set(), 0
-    # Get the intersection of all the sets in the list
-    intersect: Set[str] = set.intersection(*common)
-    return intersect, len(common)
+    if len(failures.bitmaps) == 0:
+        return 0, 0
+    intersect = failures.bitmaps[0]
+    for bitmap in failures.bitmaps[1:]:
+        intersect &= bitmap
+    return intersect, len(failures.bitmaps)
 
 
-def get_unique_failures(
-    failure_type: str, intersect: Set[str], failures: Dict[str, Dict[str, Set[str]]]
-):
+def get_unique_failures(failure_type: str, intersect: int, failures: FailureIndex):
     """
-    get set difference between common failures and failures for target libc/arch/abi
+    get failures that are not common to all affected targets, grouped by the
+    targets they appear on
     """
+    signatures = failures.signatures(exclude=intersect)
     result = ""
+    # failures of a single target
     additional_failures = False
-    for file_name, all_failures in failures.items():
-        for target, target_failures in all_failures.items():
-            diff = target_failures - intersect
-            if len(diff) > 0:
-                if not additional_failures:
-                    result += f"## Architecture Specific {failure_type} Failures\n"
-                    additional_failures = True
-                arch_info = parse_arch_info(file_name, target.strip())
-                result += f"{arch_info}:\n"
-                result += "```\n"
-                result += "".join(sorted(list(diff)))
-                result += "```\n"
+    for target_index, (file_name, target) in enumerate(failures.targets):
+        diff = signatures.get(1 << target_index, 0)
+        if diff == 0:
+            continue
+        if not additional_failures:
+            result += f"## Architecture Specific {failure_type} Failures\n"
+            additional_failures = True
+        result += f"{parse_arch_info(file_name, target.strip())}:\n"
+        result += "```\n"
+        result += "".join(failures.failures(diff))
+        result += "```\n"
+
+    # failures shared by a subset of the targets
+    shared = [
+        (target_mask, failure_mask)
+        for target_mask, failure_mask in signatures.items()
+        if target_mask & (target_mask - 1)
+    ]
+    if len(shared) > 0:
+        result += f"## {failure_type} Failures Shared By Multiple Targets\n"
+    # widest groups first
+    for target_mask, failure_mask in sorted(
+        shared, key=lambda group: (-group[0].bit_count(), group[0])
+    ):
+        arch_infos = [
+            parse_arch_info(file_name, target.strip())
+            for file_name, target in (
+                failures.targets[target_index]
+                for target_index in iter_bits(target_mask)
+            )
+        ]
+        result += f"{', '.join(arch_infos)}:\n"
+        result += "```\n"
+        result += "".join(failures.failures(failure_mask))
+        result += "```\n"
     return result
 
 
 def additional_failures_to_markdown(
-    failure_type: str, failures: Dict[str, Dict[str, Set[str]]], num_targets: int
+    failure_type: str, failures: FailureIndex, num_targets: int
 ):
     """
     Adds new sections to issue displaying what failures were added/resolved
     """
     intersect, num_failures = get_common_intersection(failures)
     result = ""
-    if len(intersect) > 0:
-        found_failures = sorted(list(intersect))
+    if intersect != 0:
         result = f"## {failure_type} Failures Across All Affected Targets ({num_failures} targets / {num_targets} total targets)\n"
         result += "```\n"
-        result += "".join(found_failures)
+        result += "".join(failures.failures(intersect))
         result += "```\n"
     result += get_unique_failures(failure_type, intersect, failures)
     result += "\n"
     return result
 
 
-def aggregate_summary(failures: Dict[str, List[str]], file_name: str):
+def apply_nicknames(row: str, file_name: str) -> str:
+    """Prefixes the libc to the target of a summary row and shortens long arch names"""
+    cells = row.split("|")
+    if "linux" in file_name:
+        cells[1] = "linux: " + cells[1]
+    else:
+        cells[1] = "newlib: " + cells[1]
+
+    # Apply nicknames
+
+    cells[1] = cells[1].replace("gc_zba_zbb_zbc_zbs_zfa", " Bitmanip")
+    cells[1] = cells[1].replace("gc_zba_zbb_zbc_zbs", " Bitmanip")
+    cells[1] = cells[1].replace(
+        "gcv_zvbb_zvbc_zvkg_zvkn_zvknc_zvkned_zvkng_zvknha_zvknhb_zvks_zvksc_zvksed_zvksg_zvksh_zvkt",
+        " Vector Crypto",
+    )
+    cells[1] = cells[1].replace(
+        "rv64imafdcv_zicond_zawrs_zbc_zvkng_zvksg_zvbb_zvbc_zicsr_zba_zbb_zbs_zicbom_zicbop_zicboz_zfhmin_zkt",
+        "RVA23U64 profile",
+    )
+    return "|".join(cells)
+
+
+def classify_failure(line: str) -> str:
     """
-    Reads file and adds the new failures to the current
-    list of failures
+    Tag a failure with its category in a single scan of the line. When several
+    categories match, the one listed first in FAILURE_CATEGORIES wins.
+    """
+    best = len(FAILURE_CATEGORIES)
+    for match in FAILURE_CATEGORY_PATTERN.finditer(line):
+        rank = CATEGORY_RANKS[match.lastgroup]
+        if rank < best:
+            best = rank
+            if rank == 0:
+                break
+    if best == len(FAILURE_CATEGORIES):
+        return OTHER_CATEGORY
+    return CATEGORY_NAMES[best]
+
+
+def categories_to_markdown(categories: Dict[str, Dict[str, int]]) -> str:
+    """Table of the number of failures of each category per target"""
+    if len(categories) == 0:
+        return ""
+    names = CATEGORY_NAMES + [OTHER_CATEGORY]
+    result = "## Remaining Preexisting Failure Categories\n"
+    result += f"|Target|{'|'.join(names)}|\n"
+    result += f"|---|{'---|' * len(names)}\n"
+    for target, counts in sorted(categories.items()):
+        result += f"|{target}|{'|'.join(str(counts.get(name, 0)) for name in names)}|\n"
+    result += "\n"
+    return result
+
+
+def parse_summary_markdown(
+    file_name: str,
+) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, Dict[str, List[str]]]]]:
     """
+    Parses a summary written by compare_testsuite_log.
+    returns (summary rows, failures)
+    summary rows: Dict[section: List[table row]]
+    failures: Dict[section: Dict[target: Dict[tool: List[failure line]]]]
+    """
+    rows: Dict[str, List[str]] = defaultdict(list)
+    failures: Dict[str, Dict[str, Dict[str, List[str]]]] = {
+        section: defaultdict(lambda: defaultdict(list)) for section in SECTIONS
+    }
+    section_headers = {f"# {header}": section for section, header in SECTIONS.items()}
     with open(file_name, "r") as f:
         while True:
             line = f.readline()
@@ -188,85 +413,137 @@ def aggregate_summary(failures: Dict[str, List[str]], file_name: str):
             line = f.readline()
             if not line or line.startswith("# Resolved Failures"):
                 # exited Summary section and going to Resolved Failures section
-                # TODO: add support for consolidating these sections
                 break
             if "Failures" in line:
                 index = line.split("Failures")[0][1:-1]
                 continue
             if line != "\n" and "---" not in line:
-                cells = line.split("|")
-                if "linux" in file_name:
-                    cells[1] = "linux: " + cells[1]
-                else:
-                    cells[1] = "newlib: " + cells[1]
-
-                # Apply nicknames
-
-                cells[1] = cells[1].replace("gc_zba_zbb_zbc_zbs_zfa", " Bitmanip")
-                cells[1] = cells[1].replace("gc_zba_zbb_zbc_zbs", " Bitmanip")
-                cells[1] = cells[1].replace(
-                    "gcv_zvbb_zvbc_zvkg_zvkn_zvknc_zvkned_zvkng_zvknha_zvknhb_zvks_zvksc_zvksed_zvksg_zvksh_zvkt",
-                    " Vector Crypto",
-                )
-                cells[1] = cells[1].replace(
-                    "rv64imafdcv_zicond_zawrs_zbc_zvkng_zvksg_zvbb_zvbc_zicsr_zba_zbb_zbs_zicbom_zicbop_zicboz_zfhmin_zkt",
-                    "RVA23U64 profile",
-                )
-                failures[index].append("|".join(cells))
-        # begin resolved failures
-        resolved: Dict[str, Set[str]] = defaultdict(set)
-        cur_target = None
-        while True:
-            line = f.readline()
-            if not line or line.startswith("# Remaining Preexisting Failures"):
-                break
-            temp_comps = line.split(" ")
-            if temp_comps[0] == "##":
-                cur_target = " ".join(temp_comps[1:]).strip()
-                continue
-            if temp_comps[0] == "###":
-                continue
-            if line != "\n":
-                resolved[cur_target].add(line)
-        # begin Remaining Preexisting Failures
-        unresolved: Dict[str, Set[str]] = defaultdict(set)
+                rows[index].append(line)
+        section = "Resolved"
         cur_target = None
-        while True:
-            line = f.readline()
-            if not line or line.startswith("# New Failures"):
-                break
-            temp_comps = line.split(" ")
-            if temp_comps[0] == "##":
-                cur_target = " ".join(temp_comps[1:]).strip()
-                continue
-            if temp_comps[0] == "###":
+        cur_tool = None
+        for line in f:
+            if line.strip() in section_headers:
+                section = section_headers[line.strip()]
+                cur_target = None
                 continue
-            if line != "\n":
-                if (
-                    "internal compiler error" in line
-                    or "Segmentation fault" in line
-                    or "test for excess errors" in line
-                    or "execution test" in line
-                    or "execute" in line.split(" ")[2:]
-                ):
-                    unresolved[cur_target].add(line)
-        # begin new failures
-        new: Dict[str, Set[str]] = defaultdict(set)
-        cur_target = None
-        while True:
-            line = f.readline()
-            if not line:
-                break
             temp_comps = line.split(" ")
             if temp_comps[0] == "##":
-                cur_target = " ".join(temp_comps[1:]).strip()
+                cur_target = sys.intern(" ".join(temp_comps[1:]).strip())
                 continue
             if temp_comps[0] == "###":
+                cur_tool = sys.intern(temp_comps[1])
                 continue
             if line != "\n":
-                new[cur_target].add(line)
+                failures[section][cur_target][cur_tool].append(sys.intern(line))
+    return rows, failures
+
+
+def load_summary_sidecar(
+    sidecar_name: str,
+) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, Dict[str, List[str]]]]]:
+    """
+    Reads the json sidecar of a summary.
+    Returns the same structure as parse_summary_markdown
+    """
+    with open(sidecar_name, "r") as f:
+        sidecar = json.load(f)
+    rows: Dict[str, List[str]] = defaultdict(list)
+    failures: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    for section in SECTIONS:
+        failures[section] = {}
+        for libname, tools in sidecar[section].items():
+            rows[section].append(
+                summary_row(
+                    libname,
+                    [tuple(tools[tool]["count"]) for tool in TOOLS],
+                    sidecar["previous_hash"],
+                    sidecar["current_hash"],
+                    sidecar["current_hash_committed"],
+                    sidecar["prefix"],
+                )
+            )
+            failures[section][sys.intern(libname.strip())] = {
+                sys.intern(tool): [
+                    sys.intern(line) for line in tool_failures["failures"]
+                ]
+                for tool, tool_failures in tools.items()
+                if len(tool_failures["failures"]) > 0
+            }
+    return rows, failures
+
+
+def summarize_file(file_name: str):
+    """
+    Parses one summary into compact per-target results which are cheap to
+    send back from a worker process.
+    returns (rows, resolved, unresolved, new, categories)
+    rows: Dict[section: List[table row]]
+    resolved, unresolved (important only), new: Dict[target: Tuple[failure]]
+    categories: Dict[target: Dict[category: count]]
+    """
+    sidecar_name = sidecar_path(file_name)
+    if os.path.exists(sidecar_name):
+        rows, sections = load_summary_sidecar(sidecar_name)
+    else:
+        rows, sections = parse_summary_markdown(file_name)
+    rows = {
+        index: [apply_nicknames(row, file_name) for row in index_rows]
+        for index, index_rows in rows.items()
+    }
+
+    resolved: Dict[str, Tuple[str, ...]] = {}
+    unresolved: Dict[str, Tuple[str, ...]] = {}
+    new: Dict[str, Tuple[str, ...]] = {}
+    categories: Dict[str, Dict[str, int]] = {}
+    for target, tools in sections["Resolved"].items():
+        resolved[target] = tuple(set().union(*tools.values()))
+    for target, tools in sections["Remaining Preexisting"].items():
+        counts: Counter = Counter()
+        important = set()
+        for lines in tools.values():
+            for line in lines:
+                category = classify_failure(line)
+                counts[category] += 1
+                if category in IMPORTANT_CATEGORIES:
+                    important.add(line)
+        categories[target] = dict(counts)
+        if important:
+            unresolved[target] = tuple(important)
+    for target, tools in sections["New"].items():
+        new[target] = tuple(set().union(*tools.values()))
+
+    return rows, resolved, unresolved, new, categories
+
+
+def aggregate_summary(failures: Dict[str, List[str]], file_name: str):
+    """
+    Reads file and adds the new failures to the current
+    list of failures
+    """
+    rows, resolved, unresolved, new, categories = summarize_file(file_name)
+    for index, index_rows in rows.items():
+        failures[index].extend(index_rows)
+    return (
+        failures,
+        {target: set(lines) for target, lines in resolved.items()},
+        {target: set(lines) for target, lines in unresolved.items()},
+        {target: set(lines) for target, lines in new.items()},
+        categories,
+    )
 
-    return failures, resolved, unresolved, new
+
+def summarize_files(file_names: List[str], jobs: "int | None" = None):
+    """
+    Yields (file name, summarize_file result) in the order of file_names.
+    Summaries are parsed in a pool of jobs worker processes.
+    """
+    if jobs == 1 or len(file_names) <= 1:
+        for file_name in file_names:
+            yield file_name, summarize_file(file_name)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from zip(file_names, executor.map(summarize_file, file_names))
 
 
 def parse_arguments():
@@ -303,46 +580,257 @@ def parse_arguments():
         type=str,
         help="Title prefix",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="<int>",
+        required=False,
+        default=None,
+        type=int,
+        help="Number of worker processes parsing summaries. Defaults to the cpu count",
+    )
+    parser.add_argument(
+        "-state",
+        "--state-file",
+        dest="state",
+        default=None,
+        metavar="<filename>",
+        type=str,
+        help="Keep the digests of ingested summaries in this file, and their results in <filename>.results/, and only ingest new or changed summaries",
+    )
+    parser.add_argument(
+        "-prefix",
+        default=None,
+        metavar="<string>",
+        type=str,
+        help="Artifact name prefix. When set, targets without results yet are listed as pending",
+    )
+    parser.add_argument(
+        "-watch",
+        default=None,
+        metavar="<seconds>",
+        type=int,
+        help="Poll the summaries every <seconds> and regenerate the report until no targets are pending",
+    )
+    parser.add_argument(
+        "-watch-timeout",
+        default=DEFAULT_WATCH_TIMEOUT,
+        metavar="<seconds>",
+        type=int,
+        help="Stop watching after <seconds> even if targets are still pending",
+    )
     return parser.parse_args()
 
 
-def main():
-    args = parse_arguments()
-    failures: Dict[str, List[str]] = {"Resolved": [], "Remaining Preexisting": [], "New": []}
-    all_resolved: Dict[str, Dict[str, Set[str]]] = {}
-    all_unresolved: Dict[str, Dict[str, Set[str]]] = {}
-    all_new: Dict[str, Dict[str, Set[str]]] = {}
-    for file in os.listdir(SUMMARIES):
-        failures, resolved, unresolved, new = aggregate_summary(
-            failures, os.path.join(SUMMARIES, file)
-        )
-        all_resolved[file] = resolved
-        all_unresolved[file] = unresolved
-        all_new[file] = new
-
-    print([i.keys() for i in all_new.values()])
+def summary_digest(file_name: str) -> str:
+    """Content hash of a summary and its sidecar"""
+    digest = file_digest(file_name)
+    sidecar_name = sidecar_path(file_name)
+    if os.path.exists(sidecar_name):
+        digest += f":{file_digest(sidecar_name)}"
+    return digest
+
+
+def load_state(state_path: "str | None"):
+    """
+    Loads the digests and result counts of previously ingested summaries.
+    returns Dict[summary file: {"digest": str, "counts": result_counts}]
+    """
+    if state_path is None or not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r") as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        return {}
+    return state["summaries"]
+
+
+def save_state(state_path: "str | None", summaries):
+    if state_path is None:
+        return
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": STATE_VERSION, "summaries": summaries}, f)
+    os.replace(tmp_path, state_path)
+
+
+def results_path(results_dir: str, file: str) -> str:
+    """File keeping the summarize_file result of a summary"""
+    return os.path.join(results_dir, f"{file}.json")
+
+
+def save_result(results_dir: str, file: str, result):
+    tmp_path = f"{results_path(results_dir, file)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, results_path(results_dir, file))
+
+
+def load_result(results_dir: str, file: str):
+    with open(results_path(results_dir, file), "r") as f:
+        return json.load(f)
+
+
+def result_counts(result) -> Dict[str, int]:
+    """Number of summary rows and of targets with resolved or new failures"""
+    rows, resolved, _, new, _ = result
+    return {
+        "targets": len(rows.get("Remaining Preexisting", [])),
+        "resolved": len(resolved),
+        "new": len(new),
+    }
+
+
+def update_state(summaries, results_dir: str, jobs: "int | None" = None) -> bool:
+    """
+    Ingests the summaries that are new or changed since the last update and
+    forgets the removed ones. returns whether anything changed
+    The result of each summary is written to results_dir as soon as it is
+    parsed, only its counts are kept in summaries.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    # sidecars are read together with their summary
+    files = [
+        file for file in os.listdir(SUMMARIES) if not file.endswith(SIDECAR_SUFFIX)
+    ]
+    changed = False
+    for file in list(summaries):
+        if file not in files:
+            del summaries[file]
+            if os.path.exists(results_path(results_dir, file)):
+                os.remove(results_path(results_dir, file))
+            changed = True
+    digests = {file: summary_digest(os.path.join(SUMMARIES, file)) for file in files}
+    stale = [
+        os.path.join(SUMMARIES, file)
+        for file in files
+        if summaries.get(file, {}).get("digest") != digests[file]
+        or not os.path.exists(results_path(results_dir, file))
+    ]
+    for file_name, result in summarize_files(stale, jobs):
+        file = os.path.basename(file_name)
+        save_result(results_dir, file, result)
+        summaries[file] = {"digest": digests[file], "counts": result_counts(result)}
+        changed = True
+    return changed
+
+
+def strip_report_suffix(name: str) -> str:
+    """
+    Failures are recorded either by artifact name or by the report log of the
+    artifact. Both map to the artifact name.
+    """
+    if name.endswith(REPORT_SUFFIX):
+        return name[: -len(REPORT_SUFFIX)]
+    return name
+
+
+def get_pending_targets(prefix: str, current_hash: str) -> List[str]:
+    """
+    Expected artifacts that have neither a summary nor a recorded build or
+    testsuite failure yet
+    """
+    finished: Set[str] = set()
+    for file in ("failed_build.txt", "failed_testsuite.txt"):
+        file_path = os.path.join(FAILURES, file)
+        if os.path.exists(file_path):
+            with open(file_path, "r") as f:
+                finished.update(
+                    strip_report_suffix(line.split("|")[0].strip())
+                    for line in f
+                    if line.strip()
+                )
+    summaries = set(os.listdir(SUMMARIES))
+    pending = []
+    for name in get_possible_artifact_names(prefix):
+        artifact_name = name.format(current_hash)
+        if artifact_name in finished:
+            continue
+        if f"{artifact_name}-report-summary.md" in summaries:
+            continue
+        pending.append(artifact_name)
+    return pending
+
+
+def write_reports(summaries, results_dir: str, args, pending: List[str]):
+    """
+    Writes the issue markdown, labels.txt and the unresolved failures.
+    The results of the summaries are read back one at a time.
+    """
+    failures: Dict[str, List[str]] = {
+        "Resolved": [],
+        "Remaining Preexisting": [],
+        "New": [],
+    }
+    all_resolved = FailureIndex()
+    all_unresolved = FailureIndex()
+    all_new = FailureIndex()
+    all_categories: Dict[str, Counter] = defaultdict(Counter)
+    num_targets = sum(entry["counts"]["targets"] for entry in summaries.values())
+    for file in sorted(summaries):
+        rows, resolved, unresolved, new, categories = load_result(results_dir, file)
+        for index, index_rows in rows.items():
+            failures[index].extend(index_rows)
+        for target, counts in categories.items():
+            all_categories[parse_arch_info(file, target)].update(counts)
+        for target, target_failures in resolved.items():
+            all_resolved.add(file, target, target_failures)
+        for target, target_failures in unresolved.items():
+            all_unresolved.add(file, target, target_failures)
+        for target, target_failures in new.items():
+            all_new.add(file, target, target_failures)
+
     summary_markdown = failures_to_markdown(
-        failures, args.current_hash, args.patch_name, args.title_prefix
+        failures, args.current_hash, args.patch_name, args.title_prefix, pending
     )
     resolved_markdown = additional_failures_to_markdown(
-        "Resolved", all_resolved, len(failures["Remaining Preexisting"])
-    )
-    new_markdown = additional_failures_to_markdown(
-        "New", all_new, len(failures["Remaining Preexisting"])
+        "Resolved", all_resolved, num_targets
     )
+    new_markdown = additional_failures_to_markdown("New", all_new, num_targets)
 
     markdown = summary_markdown + new_markdown + resolved_markdown
 
     with open(args.output_markdown, "w") as markdown_file:
         markdown_file.write(markdown)
 
-    unresolved_markdown = additional_failures_to_markdown(
-        "Remaining Preexisting", all_unresolved, len(failures["Remaining Preexisting"])
+    unresolved_markdown = categories_to_markdown(all_categories)
+    unresolved_markdown += additional_failures_to_markdown(
+        "Remaining Preexisting", all_unresolved, num_targets
     )
 
     with open("unresolved_important_failures.md", "w") as markdown_file:
         markdown_file.write(unresolved_markdown)
 
 
+def main():
+    args = parse_arguments()
+    with TemporaryDirectory() as tmp_dir:
+        # the results are kept next to the state file across runs
+        results_dir = f"{args.state}.results" if args.state is not None else tmp_dir
+        watch(args, results_dir)
+
+
+def watch(args, results_dir: str):
+    """Regenerate the reports until no targets are pending if -watch is set"""
+    summaries = load_state(args.state)
+    previous_pending = None
+    deadline = time.monotonic() + args.watch_timeout
+    while True:
+        changed = update_state(summaries, results_dir, args.jobs)
+        pending = []
+        if args.prefix is not None:
+            pending = get_pending_targets(args.prefix, args.current_hash)
+        if changed or pending != previous_pending:
+            write_reports(summaries, results_dir, args, pending)
+            save_state(args.state, summaries)
+        if args.watch is None or len(pending) == 0:
+            break
+        if time.monotonic() >= deadline:
+            print(f"Stopped watching with {len(pending)} targets still pending")
+            break
+        previous_pending = pending
+        time.sleep(args.watch)
+
+
 if __name__ == "__main__":
     main()
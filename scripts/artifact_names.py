@@ -0,0 +1,150 @@
+from typing import List
+
+
+def get_weekly_names(prefix: str) -> List[str]:
+    """
+    Generates all permutaions of target artifact logs for
+    weekly runners
+
+    Current Weekly Builds (prefixes):
+    zve_
+    rvx_zvl_
+    rvx_zvl_lmulx_
+    checking_
+    """
+
+    if prefix == "checking_":
+        return ["checking_gcc-linux-rv64gcv_zicond-lp64d-{}-multilib"]
+
+    # don't test newlib with weekly runs
+    libc = [f"{prefix}gcc-linux"]
+    arch = ["rv32{}-ilp32d-{}", "rv64{}-lp64d-{}"]
+
+    possible_arch_extensions = [
+        "gcv_zve64d",
+        "gcv_zvl1024b",
+        "gcv_zvl512b",
+        "gcv_zvl256b",
+        "gcv_zvl128b",
+    ]
+    # each extension ends in '_'. Use this since lmul extensions
+    # use the same arch extension but the prefix is
+    # currently structured as rvx_zvl_lmulx_
+    is_lmul_prefix = "lmul" in prefix
+    comps = prefix.split("_")
+    prefix_arch = ""
+
+    if len(comps) == 2:
+        prefix = comps[0]
+    else:
+        prefix = comps[1]
+        prefix_arch = comps[0]
+
+    if is_lmul_prefix:
+        multilib_arch_extensions = [
+            ext for ext in possible_arch_extensions if prefix in ext
+        ]
+    else:
+        # Non lmul zvl runs do not run 128 since that's the default and is
+        # caught by the run-frequent runs. However, it would cause a false
+        # build-failure on the zvl runs because it can't find the gcv_zvl128b
+        # binary
+        multilib_arch_extensions = [
+            ext
+            for ext in possible_arch_extensions
+            if prefix in ext and "128" not in ext
+        ]
+    print("prefix arch:", prefix_arch)
+
+    # now have weekly runners rv32 zvl multilib variants
+    multilib_lists = ["-".join([i, j, "multilib"]) for i in libc for j in arch]
+    if prefix_arch != "":
+        multilib_lists = [
+            name for name in multilib_lists if prefix_arch in name.split("-")[2]
+        ]
+
+    multilib_names = [
+        name.format(ext, "{}")
+        for name in multilib_lists
+        for ext in multilib_arch_extensions
+    ]
+
+    return multilib_names
+
+
+def get_binutils_names(prefix: str) -> List[str]:
+    """
+    Generates all permutaions of target artifact logs for
+    binutils runs
+    """
+    assert prefix == "binutils_"
+
+    multilib_names = [
+        "binutils_gcc-linux-rv64gc-lp64d-{}-multilib",
+        "binutils_gcc-linux-rv32gc-ilp32d-{}-multilib",
+        "binutils_gcc-newlib-rv64gc-lp64d-{}-multilib",
+        "binutils_gcc-newlib-rv32gc-ilp32d-{}-multilib",
+    ]
+
+    return multilib_names
+
+
+def get_frequent_names(prefix: str) -> List[str]:
+    """
+    Generates all permutaions of target artifact logs for
+    build frequent runners
+    """
+    libc = [f"{prefix}gcc-linux", f"{prefix}gcc-newlib"]
+    arch = ["rv32{}-ilp32d-{}", "rv64{}-lp64d-{}"]
+
+    multilib_arch_extensions = [
+        "gcv",
+        "imc",
+        "imc_zba_zbb_zbc_zbs",
+    ]
+
+    multilib_lists = [
+        "-".join([i, j, "multilib"]) for i in libc for j in arch if "rv64" in j
+    ]
+
+    multilib_names = [
+        name.format(ext, "{}")
+        for name in multilib_lists
+        for ext in multilib_arch_extensions
+        if not ("linux" in name and "imc" in ext)  # only test uc on newlib
+    ]
+
+    non_multilib_arch_extensions = [
+        "gc",
+        "gc_zba_zbb_zbc_zbs",
+    ]
+
+    non_multilib_lists = ["-".join([i, j, "non-multilib"]) for i in libc for j in arch]
+
+    non_multilib_names = [
+        name.format(ext, "{}")
+        for name in non_multilib_lists
+        for ext in non_multilib_arch_extensions
+    ]
+
+    return multilib_names + non_multilib_names
+
+
+def get_possible_artifact_names(prefix: str) -> List[str]:
+    """
+    Generates all possible permutations of target artifact logs and
+    removes unsupported targets
+
+    Current Support:
+      Linux: rv32/64 multilib non-multilib
+      Newlib: rv32/64 non-multilib
+      Arch extensions: gc
+    """
+    # Weekly arch extensions included since rv64gcv_zv* doesn't
+    # exist without a prefix
+    if prefix == "" or prefix == "coord_" or prefix == "release_14_":
+        return get_frequent_names(prefix)
+    elif prefix == "binutils_":
+        return get_binutils_names(prefix)
+    else:
+        return get_weekly_names(prefix)
@@ -3,6 +3,7 @@ import requests
 import json
 
 from datetime import datetime
+from github_client import API_URL, get_client
 
 
 def parse_arguments():
@@ -18,14 +19,9 @@ def parse_arguments():
 
 
 def get_issues(token: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    url = f"https://api.github.com/repos/ewlu/gcc-precommit-ci/issues?per_page=100&state=open"
-    r = requests.get(url, params)
-    issues = json.loads(r.text)
+    url = f"{API_URL}/repos/ewlu/gcc-precommit-ci/issues"
+    # only the 100 most recently created open issues are considered
+    issues = get_client(token).get_json(url, {"per_page": 100, "state": "open"})
     filtered = [issue for issue in issues if "pull_request" not in issue.keys()]
     return filtered
 
@@ -67,14 +63,9 @@ def check_issue_is_closable(issue):
 
 
 def close_issue(issue_number: int, token: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    url = f"https://api.github.com/repos/ewlu/gcc-precommit-ci/issues/{issue_number}"
+    url = f"{API_URL}/repos/ewlu/gcc-precommit-ci/issues/{issue_number}"
     data = {"state": "closed"}
-    r = requests.patch(url=url, data=json.dumps(data), headers=params)
+    r = get_client(token).request("PATCH", url, data=json.dumps(data))
     print(f"closing issue: {issue_number}")
     print(r.status_code)
     print(r.text)
@@ -1,8 +1,35 @@
 import argparse
-import re
+import hashlib
+import json
 import os
+from typing import Dict, List, Tuple
 
-from compare_testsuite_log import compare_logs
+from compare_testsuite_log import compare_logs, sidecar_path
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, file_digest
+from log_index import find_logs, get_hash_from_file_name, index_logs
+
+# Records the inputs of every summary in the summaries directory
+MANIFEST = ".manifest.json"
+# Modules whose code affects the summaries and their sidecars
+COMPARE_MODULES = (
+    "compare_testsuite_log.py",
+    "compare_glibc_log.py",
+    "aggregate.py",
+    "disk_cache.py",
+)
+
+
+def compare_digest(modules: "Tuple[str, ...]" = COMPARE_MODULES) -> str:
+    """Combined digest of the comparison modules next to this script"""
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(file_digest(os.path.join(scripts_dir, module)).encode("ascii"))
+    return digest.hexdigest()
+
+
+# Summaries written by another version of the comparison are regenerated
+COMPARE_DIGEST = compare_digest()
 
 
 def parse_arguments():
@@ -28,37 +55,116 @@ def parse_arguments():
         help="The current hash is an existing GCC hash",
         action="store_true",
     )
+    parser.add_argument(
+        "-cache",
+        "--parsed-log-cache",
+        required=False,
+        default=None,
+        type=str,
+        help="Directory to cache parsed testsuite logs in",
+    )
+    parser.add_argument(
+        "-cache-size",
+        "--parsed-log-cache-size",
+        required=False,
+        default=DEFAULT_MAX_BYTES,
+        type=int,
+        help="Size cap of the parsed testsuite log cache in bytes",
+    )
+    parser.add_argument(
+        "-force",
+        "--force",
+        help="Regenerate every summary even if its inputs are unchanged",
+        action="store_true",
+    )
     return parser.parse_args()
 
 
-def find_previous_log(directory_path: str, file_regex: str):
-    dir_contents = " ".join(os.listdir(directory_path))
-    logs = re.findall(file_regex, dir_contents)
+def find_previous_log(previous_logs: Dict[str, List[str]], file_name: str):
+    """Find a previous log of the same target as file_name at any hash"""
+    logs = find_logs(previous_logs, file_name)
     if logs != []:
         return logs[0]
     return ""
 
 
-def get_file_name_regex(file_name: str):
-    new_name = file_name.split("-")
-    new_name[4] = "[^-]*"
-    return "-".join(new_name)
+def summary_inputs(
+    previous_hash: str,
+    previous_log: str,
+    current_hash: str,
+    current_log: str,
+    current_hash_committed: bool,
+    prefix: str,
+) -> Dict[str, "str | bool"]:
+    """
+    Everything a summary depends on. Logs and the comparison code are
+    recorded by content hash.
+    """
+    current_log_digest = file_digest(current_log)
+    return {
+        "compare": COMPARE_DIGEST,
+        "previous_hash": previous_hash,
+        "previous_log": (
+            current_log_digest
+            if previous_log == current_log
+            else file_digest(previous_log)
+        ),
+        "current_hash": current_hash,
+        "current_log": current_log_digest,
+        "current_hash_committed": current_hash_committed,
+        "prefix": prefix,
+    }
 
 
-def get_hash_from_file_name(file_name: str):
-    return file_name.split("-")[4]
+def load_manifest(manifest_path: str) -> Dict[str, Dict[str, "str | bool"]]:
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"ignoring corrupt manifest {manifest_path}")
+        return {}
+
+
+def is_summary_current(
+    manifest: Dict[str, Dict[str, "str | bool"]],
+    output_path: str,
+    inputs: Dict[str, "str | bool"],
+) -> bool:
+    """The summary exists and was generated from the same inputs"""
+    return (
+        manifest.get(os.path.basename(output_path)) == inputs
+        and os.path.exists(output_path)
+        and os.path.exists(sidecar_path(output_path))
+    )
 
 
-def compare_all_artifacts(current_hash: str, current_hash_committed: bool, prefix: str):
+def compare_all_artifacts(
+    current_hash: str,
+    current_hash_committed: bool,
+    prefix: str,
+    cache: "DiskCache | None" = None,
+    force: bool = False,
+):
+    """
+    Compare every current log against its previous log. Summaries whose
+    inputs didn't change since the last invocation are kept as is unless
+    force is set.
+    """
     current_logs_dir = "./current_logs"
     previous_logs_dir = "./previous_logs"
     output_dir = "./summaries"
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {} if force else load_manifest(manifest_path)
+    previous_logs = index_logs(previous_logs_dir)
     for file in os.listdir(current_logs_dir):
         if "-" not in file:  # failed_testsuite and failed_build check
             continue
         output_file_name = f"{file.split('.')[0]}-summary.md"
-        previous_log_regex = get_file_name_regex(file)
-        previous_log_name = find_previous_log(previous_logs_dir, previous_log_regex)
+        output_path = os.path.join(output_dir, output_file_name)
+        current_log = os.path.join(current_logs_dir, file)
+        previous_log_name = find_previous_log(previous_logs, file)
         print(
             "current log:",
             file,
@@ -68,46 +174,56 @@ def compare_all_artifacts(current_hash: str, current_hash_committed: bool, prefi
             output_file_name,
         )
         if previous_log_name != "":
-            try:
-                print(
-                    f"found previous log. comparing {os.path.join(previous_logs_dir, previous_log_name)} with {os.path.join(current_logs_dir, file)}"
-                )
-                compare_logs(
-                    get_hash_from_file_name(previous_log_name),
-                    os.path.join(previous_logs_dir, previous_log_name),
-                    current_hash,
-                    os.path.join(current_logs_dir, file),
-                    os.path.join(output_dir, output_file_name),
-                    current_hash_committed,
-                    prefix,
-                )
-            except (RuntimeError, ValueError) as err:
-                with open(
-                    os.path.join(current_logs_dir, "failed_testsuite.txt"), "a+"
-                ) as f:
-                    f.write(f"{file}|{err}\n")
+            previous_log = os.path.join(previous_logs_dir, previous_log_name)
+            print(f"found previous log. comparing {previous_log} with {current_log}")
+            previous_log_hash = get_hash_from_file_name(previous_log_name)
+            current_log_hash = current_hash
         else:
-            try:
-                no_baseline_hash = current_hash + "-no-baseline"
-                compare_logs(
-                    no_baseline_hash,
-                    os.path.join(current_logs_dir, file),
-                    no_baseline_hash,
-                    os.path.join(current_logs_dir, file),
-                    os.path.join(output_dir, output_file_name),
-                    current_hash_committed,
-                    prefix,
-                )
-            except (RuntimeError, ValueError) as err:
-                with open(
-                    os.path.join(current_logs_dir, "failed_testsuite.txt"), "a+"
-                ) as f:
-                    f.write(f"{file}|{err}\n")
+            previous_log = current_log
+            previous_log_hash = current_log_hash = current_hash + "-no-baseline"
+
+        inputs = summary_inputs(
+            previous_log_hash,
+            previous_log,
+            current_log_hash,
+            current_log,
+            current_hash_committed,
+            prefix,
+        )
+        if is_summary_current(manifest, output_path, inputs):
+            print(f"inputs of {output_file_name} are unchanged. Skipping")
+            continue
+        try:
+            compare_logs(
+                previous_log_hash,
+                previous_log,
+                current_log_hash,
+                current_log,
+                output_path,
+                current_hash_committed,
+                prefix,
+                cache,
+            )
+            manifest[output_file_name] = inputs
+        except (RuntimeError, ValueError) as err:
+            manifest.pop(output_file_name, None)
+            with open(
+                os.path.join(current_logs_dir, "failed_testsuite.txt"), "a+"
+            ) as f:
+                f.write(f"{file}|{err}\n")
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
 
 def main():
     args = parse_arguments()
-    compare_all_artifacts(args.hash, args.current_hash_committed, args.prefix)
+    cache = None
+    if args.parsed_log_cache is not None:
+        cache = DiskCache(args.parsed_log_cache, args.parsed_log_cache_size)
+    compare_all_artifacts(
+        args.hash, args.current_hash_committed, args.prefix, cache, args.force
+    )
 
 
 if __name__ == "__main__":
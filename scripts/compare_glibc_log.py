@@ -1,43 +1,64 @@
 #!/usr/bin/env python3
 from pathlib import Path
 import argparse
+import os
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterable, Set, Tuple
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, parsed_log_key
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class LibName:
     """Named Tuple for arch abi model"""
 
     arch: str
     abi: str
     model: str
+    _hash: int = field(init=False, repr=False, compare=False)
 
-    def __init__(self, arch: str, abi: str, model: str):
-        self.arch = arch.strip().lower()
-        self.abi = abi.strip().lower()
-        self.model = model.strip().lower()
+    def __post_init__(self):
+        # Normalize and intern the fields so equal libnames share their strings
+        object.__setattr__(self, "arch", sys.intern(self.arch.strip().lower()))
+        object.__setattr__(self, "abi", sys.intern(self.abi.strip().lower()))
+        object.__setattr__(self, "model", sys.intern(self.model.strip().lower()))
+        object.__setattr__(self, "_hash", hash((self.arch, self.abi, self.model)))
 
     def __str__(self):
         return " ".join((self.arch, self.abi, self.model))
 
     def __hash__(self):
-        return hash((self.arch, self.abi, self.model))
+        return self._hash
+
+    def __reduce__(self):
+        # string hashes are salted per process, recompute the cached hash
+        return (LibName, (self.arch, self.abi, self.model))
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Description:
     """Named Tuple for tool arch abi model"""
 
     tool: str
     libname: LibName
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "tool", sys.intern(self.tool))
+        object.__setattr__(self, "_hash", hash((self.tool, self.libname)))
 
     def __hash__(self):
-        return hash((self.tool, self.libname))
+        return self._hash
 
+    def __reduce__(self):
+        return (Description, (self.tool, self.libname))
 
-@dataclass
+
+@dataclass(slots=True)
 class GlibcFailure:
     """Failure class to group lib's tool failures"""
 
@@ -55,7 +76,7 @@ class GlibcFailure:
         return (str(len(self.fails)), str(len(set(self.fails))))
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassifedGlibcFailures:
     """Failures class to distinguish the failure types"""
 
@@ -89,7 +110,8 @@ def parse_arguments():
         metavar="<filename>",
         required=True,
         type=str,
-        help="Path to the previous testsuite result log",
+        nargs="+",
+        help="Path to the previous testsuite result log(s)",
     )
     parser.add_argument(
         "-phash",
@@ -106,7 +128,8 @@ def parse_arguments():
         metavar="<filename>",
         required=True,
         type=str,
-        help="Path to the current testsuite result log",
+        nargs="+",
+        help="Path to the current testsuite result log(s)",
     )
 
     parser.add_argument(
@@ -134,6 +157,36 @@ def parse_arguments():
         action="store_true",
     )
 
+    parser.add_argument(
+        "-cache",
+        "--parsed-log-cache",
+        metavar="<directory>",
+        required=False,
+        default=None,
+        type=str,
+        help="Directory to cache parsed testsuite logs in",
+    )
+
+    parser.add_argument(
+        "-cache-size",
+        "--parsed-log-cache-size",
+        metavar="<bytes>",
+        required=False,
+        default=DEFAULT_MAX_BYTES,
+        type=int,
+        help="Size cap of the parsed testsuite log cache",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="<int>",
+        required=False,
+        default=None,
+        type=int,
+        help="Number of worker processes parsing logs. Defaults to the cpu count",
+    )
+
     return parser.parse_args()
 
 
@@ -162,31 +215,118 @@ def parse_failure_name(failure_line: str) -> str:
     return failure_components[1]
 
 
-def parse_testsuite_failures(log_path: str) -> Tuple[Description, List[str]] | None:
+def parse_testsuite_failures(log_path: str) -> Dict[Description, List[str]]:
     """
-    parse testsuite failures from the log in the path
+    parse testsuite failures of every target description in the log
     """
     if not Path(log_path).exists():
         raise ValueError(f"Invalid Path: {log_path}")
-    failures: List[str] = []
     with open(log_path, "r") as file:
-        description = None
-        for line in file:
-            if line == "\n":
-                break
-            if is_description(line):
-                new_description = parse_description(line)
-                if description is None:
-                    description = new_description
-                else:
-                    assert description == new_description
-                failures = []
-                continue
-            failures.append(line.strip())
-    if description is None:
-        return None
-    else:
-        return description, failures
+        return parse_testsuite_failures_from_stream(file)
+
+
+def parse_testsuite_failures_from_stream(
+    file: Iterable[str],
+) -> Dict[Description, List[str]]:
+    """
+    parse testsuite failures of every target description in the lines of a log
+    """
+    failures: Dict[Description, List[str]] = {}
+    description = None
+    for line in file:
+        if line == "\n":
+            break
+        if is_description(line):
+            description = parse_description(line)
+            failures.setdefault(description, [])
+            continue
+        failures[description].append(sys.intern(line.strip()))
+    return failures
+
+
+def parse_tested_libnames(log_path: str) -> Set[LibName]:
+    """
+    parse the libnames listed in the summary table of the log. Unlike the
+    failure descriptions it includes libnames without any failures.
+    """
+    with open(log_path, "r") as file:
+        return parse_tested_libnames_from_stream(file)
+
+
+def parse_tested_libnames_from_stream(file: Iterable[str]) -> Set[LibName]:
+    tested: Set[LibName] = set()
+    lines = iter(file)
+    for line in lines:
+        if line.startswith(
+            "               ========= Summary of glibc testsuite ========="
+        ):
+            break
+    for line in lines:
+        columns = line.split("|")
+        if len(columns) < 2:
+            continue
+        libname = columns[0].split("/")
+        if len(libname) == 3:
+            tested.add(LibName(*libname))
+    return tested
+
+
+def parse_testsuite_log_from_stream(
+    file: Iterable[str],
+) -> Tuple[Dict[Description, List[str]], Set[LibName]]:
+    """
+    (failures, tested libnames) of a log that can only be read once, e.g. a
+    report log opened with download_artifact.open_artifact_member. The
+    summary table follows the failures, so both are parsed in one pass.
+    """
+    lines = iter(file)
+    failures = parse_testsuite_failures_from_stream(lines)
+    return failures, parse_tested_libnames_from_stream(lines)
+
+
+def load_testsuite_log(
+    log_path: str, cache: "DiskCache | None" = None
+) -> Tuple[Dict[Description, List[str]], Set[LibName]]:
+    """
+    returns (failures, tested libnames) of the log. Reuses previously parsed
+    results of logs with the same content if a cache is given
+    """
+    if cache is None:
+        return parse_testsuite_failures(log_path), parse_tested_libnames(log_path)
+    if not Path(log_path).exists():
+        raise ValueError(f"Invalid Path: {log_path}")
+    key = parsed_log_key(log_path, "glibc-v2")
+    cached = cache.get_object(key)
+    if cached is not None:
+        cached_failures, cached_tested = cached
+        failures = {
+            Description(tool, LibName(arch, abi, model)): [
+                sys.intern(fail) for fail in fails
+            ]
+            for (tool, arch, abi, model), fails in cached_failures
+        }
+        return failures, {LibName(*libname) for libname in cached_tested}
+    failures = parse_testsuite_failures(log_path)
+    tested = parse_tested_libnames(log_path)
+    cache.put_object(
+        key,
+        (
+            [
+                (
+                    (
+                        description.tool,
+                        description.libname.arch,
+                        description.libname.abi,
+                        description.libname.model,
+                    ),
+                    fails,
+                )
+                for description, fails in failures.items()
+            ],
+            [(libname.arch, libname.abi, libname.model) for libname in tested],
+        ),
+    )
+    return failures, tested
 
 
 def list_difference(a: List[str], b: List[str]):
@@ -205,43 +345,104 @@ def list_intersect(a: List[str], b: List[str]):
     return list((Counter(a) & Counter(b)).elements())
 
 
-def compare_testsuite_log(previous_log_path: str, current_log_path: str):
+def compare_libname_failures(
+    previous_fails: List[str], current_fails: List[str]
+) -> Tuple[List[str], List[str], List[str]]:
+    """returns (resolved, unresolved, new) failures of a single libname"""
+    previous_set = set(previous_fails)
+    current_set = set(current_fails)
+    return (
+        sorted(previous_set - current_set),
+        sorted(previous_set & current_set),
+        sorted(current_set - previous_set),
+    )
+
+
+def merge_testsuite_logs(
+    logs: Iterable[Tuple[Dict[Description, List[str]], Set[LibName]]],
+) -> Tuple[Dict[LibName, List[str]], Set[LibName]]:
+    """Merge the failures and tested libnames of one or more parsed logs"""
+    failures: Dict[LibName, List[str]] = {}
+    tested: Set[LibName] = set()
+    for log_failures, log_tested in logs:
+        for description, fails in log_failures.items():
+            failures.setdefault(description.libname, []).extend(fails)
+        tested |= log_tested
+    return failures, tested
+
+
+def load_all_testsuite_logs(
+    log_paths: List[str], cache: "DiskCache | None" = None, jobs: "int | None" = None
+) -> List[Tuple[Dict[Description, List[str]], Set[LibName]]]:
+    """load_testsuite_log of every log, parsed in worker processes"""
+    if jobs == 1 or len(log_paths) <= 1:
+        return [load_testsuite_log(log_path, cache) for log_path in log_paths]
+    # no more workers than logs, a comparison usually only has two
+    max_workers = min(jobs or os.cpu_count() or 1, len(log_paths))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_testsuite_log, log_paths, repeat(cache)))
+
+
+def compare_testsuite_log(
+    previous_log_path: "str | List[str]",
+    current_log_path: "str | List[str]",
+    cache: "DiskCache | None" = None,
+    jobs: "int | None" = None,
+):
     """
     returns (resolved_failures, unresolved_failures, new_failures)
-    failures: Dict[tool combination label : Dict[unique testsuite name: Set[testsuite failure log]]]
-    tool combination: 'tool arch abi model'
+    failures: Dict[libname : GlibcFailure]
+    The logs may contain any number of targets. Targets are matched by
+    libname. Each log is parsed in its own worker process.
     """
-    previous_failures = parse_testsuite_failures(previous_log_path)
-    current_failures = parse_testsuite_failures(current_log_path)
+    if isinstance(previous_log_path, str):
+        previous_log_path = [previous_log_path]
+    if isinstance(current_log_path, str):
+        current_log_path = [current_log_path]
+    logs = load_all_testsuite_logs(previous_log_path + current_log_path, cache, jobs)
+    previous_failures, previous_tested = merge_testsuite_logs(
+        logs[: len(previous_log_path)]
+    )
+    current_failures, current_tested = merge_testsuite_logs(
+        logs[len(previous_log_path) :]
+    )
 
-    assert previous_failures != None
-    assert current_failures != None
+    classified_glibc_failures = ClassifedGlibcFailures({}, {}, {})
 
     # Glibc doesn't do multilib comparisons
-    if previous_failures[0] == current_failures[0]:
-        libname = previous_failures[0].libname
-
-        previous_fails = set(previous_failures[1])
-        current_fails = set(current_failures[1])
-        resolved_failures = previous_fails - current_fails
-        unresolved_failures = previous_fails & current_fails
-        new_failures = current_fails - previous_fails
-
-        classified_glibc_failures = ClassifedGlibcFailures(
-            {libname: GlibcFailure(list(resolved_failures))},
-            {libname: GlibcFailure(list(unresolved_failures))},
-            {libname: GlibcFailure(list(new_failures))},
-        )
-    else:
-        # Different libnames, so all fails are unresolved fails
-        classified_glibc_failures = ClassifedGlibcFailures(
-            {},
-            {
-                previous_failures[0].libname: GlibcFailure(previous_failures[1]),
-                current_failures[0].libname: GlibcFailure(current_failures[1]),
-            },
-            {},
+    pairs = sorted(
+        (libname for libname in previous_failures if libname in current_failures),
+        key=str,
+    )
+    for libname in pairs:
+        resolved, unresolved, new = compare_libname_failures(
+            previous_failures[libname], current_failures[libname]
         )
+        classified_glibc_failures.resolved[libname] = GlibcFailure(resolved)
+        classified_glibc_failures.unresolved[libname] = GlibcFailure(unresolved)
+        classified_glibc_failures.new[libname] = GlibcFailure(new)
+
+    for libname in sorted(previous_failures.keys() - current_failures.keys(), key=str):
+        if libname in current_tested:
+            # Tested without any failures
+            classified_glibc_failures.resolved[libname] = GlibcFailure(
+                previous_failures[libname]
+            )
+        else:
+            # No matching libname, so all fails are unresolved fails
+            classified_glibc_failures.unresolved[libname] = GlibcFailure(
+                previous_failures[libname]
+            )
+
+    for libname in sorted(current_failures.keys() - previous_failures.keys(), key=str):
+        if libname in previous_tested:
+            classified_glibc_failures.new[libname] = GlibcFailure(
+                current_failures[libname]
+            )
+        else:
+            classified_glibc_failures.unresolved[libname] = GlibcFailure(
+                current_failures[libname]
+            )
 
     return classified_glibc_failures
 
@@ -335,17 +536,20 @@ def is_result_valid(log_path: str):
 
 def compare_logs(
     previous_hash: str,
-    previous_log: str,
+    previous_log: "str | List[str]",
     current_hash: str,
-    current_log: str,
+    current_log: "str | List[str]",
     output_markdown: str,
     current_hash_committed: bool,
+    cache: "DiskCache | None" = None,
+    jobs: "int | None" = None,
 ):
-    if not is_result_valid(previous_log):
-        raise RuntimeError(f"{previous_log} doesn't include Summary of the testsuite")
-    if not is_result_valid(current_log):
-        raise RuntimeError(f"{current_log} doesn't include Summary of the testsuite")
-    failures = compare_testsuite_log(previous_log, current_log)
+    previous_logs = [previous_log] if isinstance(previous_log, str) else previous_log
+    current_logs = [current_log] if isinstance(current_log, str) else current_log
+    for log in previous_logs + current_logs:
+        if not is_result_valid(log):
+            raise RuntimeError(f"{log} doesn't include Summary of the testsuite")
+    failures = compare_testsuite_log(previous_logs, current_logs, cache, jobs)
     markdown = failures_to_markdown(
         failures, previous_hash, current_hash, current_hash_committed
     )
@@ -355,6 +559,9 @@ def compare_logs(
 
 def main():
     args = parse_arguments()
+    cache = None
+    if args.parsed_log_cache is not None:
+        cache = DiskCache(args.parsed_log_cache, args.parsed_log_cache_size)
     compare_logs(
         args.previous_hash,
         args.previous_log,
@@ -362,6 +569,8 @@ def main():
         args.current_log,
         args.output_markdown,
         args.current_hash_committed,
+        cache,
+        args.jobs,
     )
 
 
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 from pathlib import Path
 import argparse
+import json
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple
 from collections import Counter, defaultdict
 
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, parsed_log_key
+
 compare_urls = defaultdict(lambda: "https://github.com/gcc-mirror/gcc/compare/{}...{}")
 compare_urls["binutils_"] = "https://github.com/bminor/binutils-gdb/compare/{}...{}"
 compare_urls["coord_"] = "https://gcc.gnu.org/cgit/gcc/log/?qt=range&q={}...{}"
@@ -13,8 +17,18 @@ commit_urls = defaultdict(lambda: "https://github.com/gcc-mirror/gcc/commit/{}")
 commit_urls["binutils_"] = "https://github.com/bminor/binutils-gdb/commit/{}"
 commit_urls["coord_"] = "https://gcc.gnu.org/git/gitweb.cgi?p=gcc.git;h={}"
 
+TOOLS = ("gcc", "g++", "gfortran")
+# Sections of the summary. Key is the section name used by the sidecar.
+SECTIONS = {
+    "Resolved": "Resolved Failures",
+    "Remaining Preexisting": "Remaining Preexisting Failures",
+    "New": "New Failures",
+}
+SIDECAR_SUFFIX = ".json"
+SIDECAR_VERSION = 1
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LibName:
     """Named Tuple for arch abi model"""
 
@@ -23,15 +37,19 @@ class LibName:
     model: str
     multilib: bool
     other_args: str
-
-    def __init__(
-        self, arch: str, abi: str, model: str, multilib: bool, other_args: str
-    ):
-        self.arch = arch.strip().lower()
-        self.abi = abi.strip().lower()
-        self.model = model.strip().lower()
-        self.multilib = multilib
-        self.other_args = other_args.strip()
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Normalize and intern the fields so equal libnames share their strings
+        object.__setattr__(self, "arch", sys.intern(self.arch.strip().lower()))
+        object.__setattr__(self, "abi", sys.intern(self.abi.strip().lower()))
+        object.__setattr__(self, "model", sys.intern(self.model.strip().lower()))
+        object.__setattr__(self, "other_args", sys.intern(self.other_args.strip()))
+        object.__setattr__(
+            self,
+            "_hash",
+            hash((self.arch, self.abi, self.model, self.multilib, self.other_args)),
+        )
 
     def __str__(self):
         return (
@@ -41,21 +59,36 @@ class LibName:
         )
 
     def __hash__(self):
-        return hash((self.arch, self.abi, self.model, self.multilib, self.other_args))
+        return self._hash
 
+    def __reduce__(self):
+        # string hashes are salted per process, recompute the cached hash
+        return (
+            LibName,
+            (self.arch, self.abi, self.model, self.multilib, self.other_args),
+        )
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Description:
     """Named Tuple for tool arch abi model"""
 
     tool: str
     libname: LibName
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "tool", sys.intern(self.tool))
+        object.__setattr__(self, "_hash", hash((self.tool, self.libname)))
 
     def __hash__(self):
-        return hash((self.tool, self.libname))
+        return self._hash
 
+    def __reduce__(self):
+        return (Description, (self.tool, self.libname))
 
-@dataclass
+
+@dataclass(slots=True)
 class GccFailure:
     """Failure class to group lib's tool failures"""
 
@@ -121,7 +154,7 @@ class GccFailure:
             return self.gfortran_failure_count
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassifedGccFailures:
     """Failures class to distinguish the failure types"""
 
@@ -210,6 +243,26 @@ def parse_arguments():
         help="Prefix",
     )
 
+    parser.add_argument(
+        "-cache",
+        "--parsed-log-cache",
+        metavar="<directory>",
+        required=False,
+        default=None,
+        type=str,
+        help="Directory to cache parsed testsuite logs in",
+    )
+
+    parser.add_argument(
+        "-cache-size",
+        "--parsed-log-cache-size",
+        metavar="<bytes>",
+        required=False,
+        default=DEFAULT_MAX_BYTES,
+        type=int,
+        help="Size cap of the parsed testsuite log cache",
+    )
+
     return parser.parse_args()
 
 
@@ -245,24 +298,77 @@ def parse_testsuite_failures(log_path: str) -> Dict[Description, List[str]]:
     """
     if not Path(log_path).exists():
         raise ValueError(f"Invalid Path: {log_path}")
-    failures: Dict[Description, List[str]] = {}
     with open(log_path, "r") as file:
-        description = None
-        for line in file:
-            if line == "\n":
-                break
-            if is_description(line):
-                description = parse_description(line, "non-multilib" not in log_path)
-                failures[description] = []
-                continue
-            failures[description].append(line)
+        return parse_testsuite_failures_from_stream(
+            file, "non-multilib" not in log_path
+        )
+
+
+def parse_testsuite_failures_from_stream(
+    file: Iterable[str], multilib: bool
+) -> Dict[Description, List[str]]:
+    """
+    parse testsuite failures from the lines of a log, e.g. a report log
+    opened with download_artifact.open_artifact_member
+    """
+    failures: Dict[Description, List[str]] = {}
+    description = None
+    for line in file:
+        if line == "\n":
+            break
+        if is_description(line):
+            description = parse_description(line, multilib)
+            failures[description] = []
+            continue
+        failures[description].append(sys.intern(line))
+    return failures
+
+
+def load_testsuite_failures(
+    log_path: str, cache: "DiskCache | None" = None
+) -> Dict[Description, List[str]]:
+    """
+    parse_testsuite_failures that reuses previously parsed results of
+    logs with the same content
+    """
+    if cache is None:
+        return parse_testsuite_failures(log_path)
+    if not Path(log_path).exists():
+        raise ValueError(f"Invalid Path: {log_path}")
+    multilib = "non-multilib" not in log_path
+    key = parsed_log_key(log_path, "gcc-multilib" if multilib else "gcc-non-multilib")
+    cached = cache.get_object(key)
+    if cached is not None:
+        return {
+            Description(tool, LibName(arch, abi, model, multilib, other_args)): [
+                sys.intern(line) for line in lines
+            ]
+            for (tool, arch, abi, model, other_args), lines in cached
+        }
+    failures = parse_testsuite_failures(log_path)
+    cache.put_object(
+        key,
+        [
+            (
+                (
+                    description.tool,
+                    description.libname.arch,
+                    description.libname.abi,
+                    description.libname.model,
+                    description.libname.other_args,
+                ),
+                lines,
+            )
+            for description, lines in failures.items()
+        ],
+    )
     return failures
 
 
 def classify_by_unique_failure(failure_set: List[str]):
     failure_dictionary: Dict[str, List[str]] = {}
     for failure in failure_set:
-        failure_name = parse_failure_name(failure)
+        failure_name = sys.intern(parse_failure_name(failure))
         if failure_name not in failure_dictionary:
             failure_dictionary[failure_name] = []
         failure_dictionary[failure_name].append(failure)
@@ -285,14 +391,16 @@ def list_intersect(a: List[str], b: List[str]):
     return list((Counter(a) & Counter(b)).elements())
 
 
-def compare_testsuite_log(previous_log_path: str, current_log_path: str):
+def compare_testsuite_log(
+    previous_log_path: str, current_log_path: str, cache: "DiskCache | None" = None
+):
     """
     returns (resolved_failures, unresolved_failures, new_failures)
     failures: Dict[tool combination label : Dict[unique testsuite name: Set[testsuite failure log]]]
     tool combination: 'tool arch abi model'
     """
-    previous_failures = parse_testsuite_failures(previous_log_path)
-    current_failures = parse_testsuite_failures(current_log_path)
+    previous_failures = load_testsuite_failures(previous_log_path, cache)
+    current_failures = load_testsuite_failures(current_log_path, cache)
 
     previous_failures_descriptions = set(previous_failures.keys())
     current_failures_descriptions = set(current_failures.keys())
@@ -369,24 +477,42 @@ def gccfailure_to_summary(
     current_hash_committed: bool,
     prefix: str,
 ):
-    tools = ("gcc", "g++", "gfortran")
-    result = f"|{failure_name}|{tools[0]}|{tools[1]}|{tools[2]}|Previous Hash|\n"
+    result = f"|{failure_name}|{TOOLS[0]}|{TOOLS[1]}|{TOOLS[2]}|Previous Hash|\n"
     result += "|---|---|---|---|---|\n"
     for libname, gccfailure in failure.items():
-        result += f"|{libname}|"
-        for tool in tools:
-            tool_failure_key = f"{tool}_failure_count"
-            # convert tuple of counts to string
-            result += f"{'/'.join(gccfailure[tool_failure_key])}|"
-
-        if current_hash_committed:
-            result += f"[{previous_hash}]({compare_urls[prefix].format(previous_hash, current_hash)})|\n"
-        else:
-            result += f"{commit_urls[prefix].format(previous_hash)}|\n"
+        result += summary_row(
+            str(libname),
+            [gccfailure[f"{tool}_failure_count"] for tool in TOOLS],
+            previous_hash,
+            current_hash,
+            current_hash_committed,
+            prefix,
+        )
     result += "\n"
     return result
 
 
+def summary_row(
+    libname: str,
+    failure_counts: List[Tuple[str, str]],
+    previous_hash: str,
+    current_hash: str,
+    current_hash_committed: bool,
+    prefix: str,
+) -> str:
+    """Builds the summary table row of a libname"""
+    result = f"|{libname}|"
+    for failure_count in failure_counts:
+        # convert tuple of counts to string
+        result += f"{'/'.join(failure_count)}|"
+
+    if current_hash_committed:
+        result += f"[{previous_hash}]({compare_urls[prefix].format(previous_hash, current_hash)})|\n"
+    else:
+        result += f"{commit_urls[prefix].format(previous_hash)}|\n"
+    return result
+
+
 def failures_to_summary(
     failures: ClassifedGccFailures,
     previous_hash: str,
@@ -441,6 +567,52 @@ labels: bug
     return result
 
 
+def gccfailure_to_json(failure: Dict[LibName, GccFailure]):
+    """
+    {libname: {tool: {"count": [total, unique], "failures": [failure lines]}}}
+    """
+    result = {}
+    for libname, gccfailure in failure.items():
+        result[str(libname)] = {
+            tool: {
+                "count": list(gccfailure[f"{tool}_failure_count"]),
+                "failures": [
+                    line for case in gccfailure[tool].values() for line in case
+                ],
+            }
+            for tool in TOOLS
+        }
+    return result
+
+
+def failures_to_json(
+    failures: ClassifedGccFailures,
+    previous_hash: str,
+    current_hash: str,
+    current_hash_committed: bool,
+    prefix: str,
+):
+    """
+    Structured counterpart of failures_to_markdown so consumers don't have to
+    parse the markdown back
+    """
+    return {
+        "version": SIDECAR_VERSION,
+        "previous_hash": previous_hash,
+        "current_hash": current_hash,
+        "current_hash_committed": current_hash_committed,
+        "prefix": prefix,
+        "Resolved": gccfailure_to_json(failures.resolved),
+        "Remaining Preexisting": gccfailure_to_json(failures.unresolved),
+        "New": gccfailure_to_json(failures.new),
+    }
+
+
+def sidecar_path(output_markdown: str) -> str:
+    """Path of the json sidecar written next to a summary markdown"""
+    return str(Path(output_markdown).with_suffix(SIDECAR_SUFFIX))
+
+
 def is_result_valid(log_path: str):
     if not Path(log_path).exists():
         raise ValueError(f"Invalid Path: {log_path}")
@@ -483,21 +655,30 @@ def compare_logs(
     output_markdown: str,
     current_hash_committed: bool,
     prefix: str,
+    cache: "DiskCache | None" = None,
 ):
     if not is_result_valid(previous_log):
         raise RuntimeError(f"{previous_log} doesn't include Summary of the testsuite")
     if not is_result_valid(current_log):
         raise RuntimeError(f"{current_log} doesn't include Summary of the testsuite")
-    failures = compare_testsuite_log(previous_log, current_log)
+    failures = compare_testsuite_log(previous_log, current_log, cache)
     markdown = failures_to_markdown(
         failures, previous_hash, current_hash, current_hash_committed, prefix
     )
     with open(output_markdown, "w") as markdown_file:
         markdown_file.write(markdown)
+    sidecar = failures_to_json(
+        failures, previous_hash, current_hash, current_hash_committed, prefix
+    )
+    with open(sidecar_path(output_markdown), "w") as sidecar_file:
+        json.dump(sidecar, sidecar_file)
 
 
 def main():
     args = parse_arguments()
+    cache = None
+    if args.parsed_log_cache is not None:
+        cache = DiskCache(args.parsed_log_cache, args.parsed_log_cache_size)
     compare_logs(
         args.previous_hash,
         args.previous_log,
@@ -506,6 +687,7 @@ def main():
         args.output_markdown,
         args.current_hash_committed,
         args.prefix,
+        cache,
     )
 
 
@@ -1,6 +1,7 @@
 import argparse
 
-from github import Github, InputFileContent
+from github import InputFileContent
+from github_client import get_github
 from pathlib import Path
 from typing import Optional
 
@@ -57,7 +58,7 @@ def create_gist(input_file: str, token: str, title: Optional[str] = None) -> str
 
     input_contents = input_path.read_text(encoding="utf-8")
     input_file_title = title.replace(" ", "_") if title else input_file
-    github = Github(token)
+    github = get_github(token)
     auth_user = github.get_user()
     gist = auth_user.create_gist(
         public=False, files={input_file_title: InputFileContent(content=input_contents)}
@@ -0,0 +1,134 @@
+import hashlib
+import marshal
+import os
+import shutil
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, List, Tuple
+
+# 512 MiB default cap for a cache directory
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+TEMP_PREFIX = ".tmp-"
+
+
+def file_digest(file_path: str) -> str:
+    """Return the sha256 hex digest of the file contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Key/value store backed by a directory. Every entry is a single file named
+    after the hash of its key. Reads refresh the entry's mtime so eviction can
+    drop the least recently used entries once the directory grows past
+    max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def path_for(self, key: str) -> Path:
+        """Location of the entry for key. The file may not exist."""
+        return self.cache_dir / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_path(self, key: str) -> "Path | None":
+        """Return the path of a cached entry and mark it as recently used"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_bytes(self, key: str) -> "bytes | None":
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # evicted by another process between the lookup and the read
+            return None
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        fd, tmp_name = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(key, tmp_name)
+
+    def put_file(self, key: str, src_path: str) -> Path:
+        """Copy src_path into the cache"""
+        fd, tmp_name = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return self._commit(key, tmp_name)
+
+    def get_object(self, key: str) -> Any:
+        """
+        Return an object stored with put_object or None on a miss.
+        Entries that fail to decode are treated as misses.
+        """
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return marshal.loads(zlib.decompress(data))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            return None
+
+    def put_object(self, key: str, obj: Any) -> Path:
+        """
+        Store obj in a compact binary form. obj may only contain builtin
+        types supported by marshal (str, int, bool, None, tuple, list, dict).
+        """
+        return self.put_bytes(key, zlib.compress(marshal.dumps(obj)))
+
+    def _commit(self, key: str, tmp_name: str) -> Path:
+        path = self.path_for(key)
+        # atomic so concurrent readers never observe a partial entry
+        os.replace(tmp_name, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries: List[Tuple[float, int, Path]] = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(TEMP_PREFIX) or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # evicted concurrently
+                continue
+            entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def parsed_log_key(log_path: str, namespace: str) -> str:
+    """
+    Cache key of a parsed testsuite log. Logs are addressed by content so the
+    same log downloaded under another name or into another directory still
+    hits the cache. namespace separates the parsers and their output format.
+    """
+    return f"parsed-log:{namespace}:{file_digest(log_path)}"
@@ -1,12 +1,27 @@
 import argparse
+import hashlib
+import io
+import json
 import os
 import requests
+import tempfile
+import threading
+import time
 
-from pathlib import Path
-from zipfile import ZipFile
-from github import Auth, Github
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Iterable, Iterator, List, TextIO, Tuple
+from zipfile import BadZipFile, ZipFile
+from github import Github
 from tempfile import TemporaryDirectory
-from shutil import move
+from shutil import copyfile, copyfileobj
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache, file_digest
+from github_client import API_URL, GithubClient, get_client, get_github, retry_wait
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+ARTIFACT_INDEX_VERSION = 1
 
 
 def parse_arguments():
@@ -30,6 +45,20 @@ def parse_arguments():
     parser.add_argument(
         "-outdir", required=True, type=str, help="Output dir to put downloaded file"
     )
+    parser.add_argument(
+        "-cache",
+        required=False,
+        type=str,
+        default=None,
+        help="Directory caching downloaded artifact zips between runs",
+    )
+    parser.add_argument(
+        "-cache-size",
+        required=False,
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Size cap of the artifact cache in bytes",
+    )
     return parser.parse_args()
 
 
@@ -43,8 +72,7 @@ def search_for_artifact(
     Returns the artifact's id or None if the artifact was not found.
     """
     if github is None:
-        auth = Auth.Token(token)
-        github = Github(auth=auth)
+        github = get_github(token)
 
     repo = github.get_repo(repo_name)
 
@@ -55,63 +83,360 @@ def search_for_artifact(
     return None
 
 
+class ArtifactIndex:
+    """
+    Index from artifact name to the id of its latest non-expired artifact.
+    The repo's artifact list is paged once and later syncs only page through
+    the artifacts created since the previous sync. The index is kept in
+    index_path if given.
+    """
+
+    def __init__(
+        self,
+        repo_name: str,
+        token: str,
+        index_path: "str | None" = None,
+        github: "Github | None" = None,
+    ):
+        self.repo_name = repo_name
+        self.token = token
+        self.index_path = index_path
+        self.github = github
+        self.last_id = 0
+        # guards saving from the download threads
+        self.lock = threading.Lock()
+        # name: (id, expiry as an ISO 8601 string)
+        self.artifacts: Dict[str, Tuple[int, str]] = {}
+        if index_path is not None and os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                saved = json.load(f)
+            if (
+                saved.get("version") == ARTIFACT_INDEX_VERSION
+                and saved.get("repo") == repo_name
+            ):
+                self.last_id = saved["last_id"]
+                self.artifacts = {
+                    name: (artifact_id, expires_at)
+                    for name, (artifact_id, expires_at) in saved["artifacts"].items()
+                }
+
+    def sync(self):
+        """Add the artifacts created since the last sync and drop expired ones"""
+        if self.github is None:
+            self.github = get_github(self.token)
+        repo = self.github.get_repo(self.repo_name)
+        last_id = self.last_id
+        # artifacts are listed newest first
+        for artifact in repo.get_artifacts():
+            if artifact.id <= last_id:
+                break
+            self.last_id = max(self.last_id, artifact.id)
+            if artifact.expired:
+                continue
+            known = self.artifacts.get(artifact.name)
+            if known is None or known[0] < artifact.id:
+                self.artifacts[artifact.name] = (
+                    artifact.id,
+                    artifact.expires_at.astimezone(timezone.utc).isoformat(),
+                )
+        self.artifacts = {
+            name: (artifact_id, expires_at)
+            for name, (artifact_id, expires_at) in self.artifacts.items()
+            if not is_expired(expires_at)
+        }
+        self.save()
+
+    def save(self):
+        if self.index_path is None:
+            return
+        with self.lock:
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "version": ARTIFACT_INDEX_VERSION,
+                        "repo": self.repo_name,
+                        "last_id": self.last_id,
+                        "artifacts": dict(self.artifacts),
+                    },
+                    f,
+                )
+            os.replace(tmp_path, self.index_path)
+
+    def forget(self, artifact_name: str):
+        """Drop an artifact that was deleted before it expired"""
+        with self.lock:
+            forgotten = self.artifacts.pop(artifact_name, None)
+        if forgotten is not None:
+            self.save()
+
+    def lookup(self, artifact_name: str) -> "str | None":
+        """Id of the latest non-expired artifact named artifact_name"""
+        artifact = self.artifacts.get(artifact_name)
+        if artifact is None:
+            return None
+        artifact_id, expires_at = artifact
+        if is_expired(expires_at):
+            return None
+        return str(artifact_id)
+
+
+def is_expired(expires_at: str) -> bool:
+    return datetime.fromisoformat(expires_at) <= datetime.now(timezone.utc)
+
+
+def artifact_cache_key(artifact_id: str, artifact_name: str) -> str:
+    # artifact ids are never reused so entries don't go stale
+    return f"artifact:{artifact_id}:{artifact_name}"
+
+
+def artifact_digest_key(artifact_key: str) -> str:
+    """Cache key of the sha256 digest of a cached artifact zip"""
+    return f"digest:{artifact_key}"
+
+
+def artifact_zip_name(artifact_name: str) -> str:
+    return artifact_name.replace(".log", ".zip")
+
+
 def download_artifact(
-    artifact_name: str, artifact_id: str, token: str, repo: str, output_dir: str
+    artifact_name: str,
+    artifact_id: str,
+    token: str,
+    repo: str,
+    output_dir: str,
+    cache: "DiskCache | None" = None,
 ) -> str:
     """
     Uses GitHub api endpoint to download the given artifact into output_dir.
+    The zip is streamed to disk and interrupted transfers are resumed with a
+    range request. Downloads whose range is rejected start over.
+    With a cache, artifacts found in it aren't downloaded again but linked
+    into output_dir. New downloads are added to the cache along with their
+    sha256 digest, which cache hits have to match.
     Returns the path of the downloaded zip
     """
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    response = requests.get(
-        f"https://api.github.com/repos/{repo}/actions/artifacts/{artifact_id}/zip",
-        headers=params,
-        timeout=15 * 60,  # 15 minute timeout
-    )
-    print(f"download for {artifact_name}: {response.status_code}")
-
-    artifact_zip_name = artifact_name.replace(".log", ".zip")
-
     # Create missing output_dir
     output_dir_path = Path(output_dir)
     output_dir_path.mkdir(parents=True, exist_ok=True)
 
     # Write artifact to designated path
-    artifact_zip = f"{str(output_dir_path.resolve())}/{artifact_zip_name}"
-    with open(artifact_zip, "wb") as artifact:
-        artifact.write(response.content)
+    artifact_zip = (
+        f"{str(output_dir_path.resolve())}/{artifact_zip_name(artifact_name)}"
+    )
+
+    key = artifact_cache_key(artifact_id, artifact_name)
+    if cache is not None:
+        cached_zip = cache.get_path(key)
+        if cached_zip is not None and copy_cached_artifact(cached_zip, artifact_zip):
+            digest = cache.get_bytes(artifact_digest_key(key))
+            if digest == file_digest(artifact_zip).encode("ascii"):
+                print(f"download for {artifact_name}: cached")
+                return artifact_zip
+            print(f"cached {artifact_name} doesn't match its digest, downloading")
+
+    client = get_client(token)
+    url = f"{API_URL}/repos/{repo}/actions/artifacts/{artifact_id}/zip"
+
+    # Written next to artifact_zip and moved into place once complete. The
+    # path may be a hardlink of a cache entry which must not be overwritten
+    fd, partial_zip = tempfile.mkstemp(
+        prefix=f".{artifact_zip_name(artifact_name)}.", dir=output_dir_path
+    )
+    try:
+        with os.fdopen(fd, "w+b") as artifact:
+            digest = download_to(client, url, artifact_name, artifact)
+        os.replace(partial_zip, artifact_zip)
+    except BaseException:
+        Path(partial_zip).unlink(missing_ok=True)
+        raise
+
+    if cache is not None:
+        cache.put_file(key, artifact_zip)
+        cache.put_bytes(artifact_digest_key(key), digest.encode("ascii"))
     return artifact_zip
 
 
-def extract_artifact(artifact_zip: str, outdir: str = "current_logs"):
+def download_to(
+    client: GithubClient, url: str, artifact_name: str, artifact: BinaryIO
+) -> str:
     """
-    Extracts a given artifact into the outdir.
+    Stream the zip at url into artifact and return its sha256 digest, which
+    is computed chunk by chunk. Interrupted transfers are resumed with a
+    range request and the resumed zip is checked. Server errors, rate limits
+    and dropped connections are retried here, not by the client.
     """
-    with TemporaryDirectory() as tmpdir:
-        # Extract all the contents to the temporary directory for easier cleanup
-        with ZipFile(artifact_zip, "r") as zf:
-            zf.extractall(path=tmpdir)
-        tmpdir_path = Path(f"{tmpdir}")
-        # Artifact consists of either 1. files (normally a zip file) 2. Directory
-        # Case 1
-        artifact_path = tmpdir_path
-
-        # The name of the directory always follows the zip file name. Thus use stem attribute for convenience
-        directory_path = Path(f"{tmpdir}/{Path(artifact_zip).stem}")
-        # Case 2
-        if directory_path.exists():
-            artifact_path = directory_path
-
-        # Create missing outdir
-        output_dir_path = Path(outdir)
-        output_dir_path.mkdir(parents=True, exist_ok=True)
-        # Move all the files/directory unzipped from the artifact
-        for file in artifact_path.iterdir():
-            move(str(file), outdir)
+    written = 0
+    digest = hashlib.sha256()
+    resumed = False
+    # ETag of the full response, a range is only served from the same zip
+    validator = None
+    for attempt in range(DOWNLOAD_RETRIES):
+        headers = {}
+        if written > 0:
+            headers["Range"] = f"bytes={written}-"
+            if validator is not None:
+                headers["If-Range"] = validator
+        wait = 2**attempt
+        try:
+            with client.get(url, headers=headers, stream=True, retry=False) as response:
+                print(f"download for {artifact_name}: {response.status_code}")
+                retry = retry_wait(response, attempt)
+                range_requested = written > 0
+                if retry is not None:
+                    wait = retry
+                elif range_requested and response.status_code != 206:
+                    # The range was ignored or rejected, start over
+                    truncate(artifact)
+                    written, digest, resumed = 0, hashlib.sha256(), False
+                if retry is None and not (
+                    range_requested and response.status_code >= 400
+                ):
+                    response.raise_for_status()
+                    if response.status_code == 206:
+                        resumed = True
+                    else:
+                        validator = response.headers.get("ETag")
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        artifact.write(chunk)
+                        digest.update(chunk)
+                        written += len(chunk)
+                    if not resumed or is_intact_zip(artifact):
+                        return digest.hexdigest()
+                    print(f"resumed download of {artifact_name} is corrupt")
+                    truncate(artifact)
+                    written, digest, resumed = 0, hashlib.sha256(), False
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as e:
+            print(f"download for {artifact_name} interrupted: {e}")
+        if attempt + 1 == DOWNLOAD_RETRIES:
+            break
+        time.sleep(wait)
+    raise RuntimeError(
+        f"Failed to download {artifact_name} after {DOWNLOAD_RETRIES} attempts"
+    )
+
+
+def truncate(artifact: BinaryIO):
+    artifact.seek(0)
+    artifact.truncate()
+
+
+def is_intact_zip(artifact: BinaryIO) -> bool:
+    """Whether the CRCs of every member of the zip written to artifact match"""
+    artifact.flush()
+    artifact.seek(0)
+    try:
+        with ZipFile(artifact, "r") as zf:
+            return zf.testzip() is None
+    except BadZipFile:
+        return False
+    finally:
+        artifact.seek(0, os.SEEK_END)
+
+
+def copy_cached_artifact(cached_zip: Path, artifact_zip: str) -> bool:
+    """
+    Hardlink or copy a cached zip to artifact_zip, so evicting the cache entry
+    doesn't remove it. False if the entry was evicted in the meantime.
+    """
+    Path(artifact_zip).unlink(missing_ok=True)
+    try:
+        os.link(cached_zip, artifact_zip)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        # e.g. the cache is on another file system
+        try:
+            copyfile(cached_zip, artifact_zip)
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def artifact_root(
+    artifact_zip: "str | BinaryIO", names: List[str], artifact_name: "str | None"
+) -> str:
+    """
+    Prefix of the artifact's files in the zip. Artifact consists of either
+    1. files (normally a zip file) 2. Directory named after the zip
+    """
+    # The name of the directory always follows the zip file name. Thus use stem attribute for convenience
+    if artifact_name is not None:
+        stem = Path(artifact_zip_name(artifact_name)).stem
+    else:
+        stem = Path(artifact_zip).stem
+    directory = f"{stem}/"
+    # Case 2
+    if any(name.startswith(directory) for name in names):
+        return directory
+    # Case 1
+    return ""
+
+
+def member_path(outdir: Path, name: str) -> Path:
+    """Destination of a member, refusing names escaping outdir"""
+    path = PurePosixPath(name)
+    if path.is_absolute() or ".." in path.parts:
+        raise ValueError(f"Unsafe path in artifact: {name}")
+    return outdir.joinpath(*path.parts)
+
+
+def extract_artifact(
+    artifact_zip: str,
+    outdir: str = "current_logs",
+    artifact_name: "str | None" = None,
+    members: "Iterable[str] | None" = None,
+):
+    """
+    Extracts a given artifact straight into the outdir. members limits the
+    extraction to those files, named relative to the artifact's directory.
+    artifact_name is needed when the zip isn't named after the artifact, e.g.
+    when it comes from the cache.
+    """
+    # Create missing outdir
+    output_dir_path = Path(outdir)
+    output_dir_path.mkdir(parents=True, exist_ok=True)
+    with ZipFile(artifact_zip, "r") as zf:
+        root = artifact_root(artifact_zip, zf.namelist(), artifact_name)
+        infos = {
+            info.filename[len(root) :]: info
+            for info in zf.infolist()
+            if info.filename.startswith(root) and info.filename != root
+        }
+        if members is not None:
+            members = list(members)
+            missing = [member for member in members if member not in infos]
+            if missing:
+                raise ValueError(f"{artifact_zip} has no {', '.join(missing)}")
+            infos = {member: infos[member] for member in members}
+        for name, info in infos.items():
+            path = member_path(output_dir_path, name)
+            if info.is_dir():
+                path.mkdir(parents=True, exist_ok=True)
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as src, open(path, "wb") as dst:
+                copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+
+
+@contextmanager
+def open_artifact_member(
+    artifact_zip: "str | BinaryIO", member: str, artifact_name: "str | None" = None
+) -> Iterator[TextIO]:
+    """
+    Text stream of a file of the artifact read straight out of the zip, e.g.
+    for the parse_*_from_stream functions of the compare scripts. member is
+    named relative to the artifact's directory like in extract_artifact.
+    artifact_zip may also be an open zip file, which needs artifact_name.
+    """
+    with ZipFile(artifact_zip, "r") as zf:
+        root = artifact_root(artifact_zip, zf.namelist(), artifact_name)
+        with zf.open(root + member) as raw:
+            yield io.TextIOWrapper(raw)
 
 
 def main():
@@ -121,11 +446,15 @@ def main():
     if artifact_id is None:
         raise ValueError(f"Could not find artifact {args.name} in {args.repo}")
 
+    cache = None
+    if args.cache is not None:
+        cache = DiskCache(args.cache, args.cache_size)
+
     with TemporaryDirectory() as tmpdir:
         artifact_zip = download_artifact(
-            args.name, artifact_id, args.token, args.repo, tmpdir
+            args.name, artifact_id, args.token, args.repo, tmpdir, cache=cache
         )
-        extract_artifact(artifact_zip, args.outdir)
+        extract_artifact(artifact_zip, args.outdir, args.name)
 
 
 if __name__ == "__main__":
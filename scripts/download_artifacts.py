@@ -1,13 +1,29 @@
 import argparse
-import json
 import requests
 import os
 import re
-from typing import List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, TypeVar
 from pathlib import Path
-from github import Auth, Github
+from github import RateLimitExceededException
 from tempfile import TemporaryDirectory
-from download_artifact import download_artifact, extract_artifact, search_for_artifact
+from github_client import API_URL, get_client, rate_limit_wait
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache
+from download_artifact import (
+    ArtifactIndex,
+    download_artifact,
+    extract_artifact,
+    search_for_artifact,
+)
+from artifact_names import get_possible_artifact_names
+from log_index import find_logs, get_hash_from_file_name, hashless_name, index_logs
+from parse_build_warnings import baseline_warnings_key
+
+T = TypeVar("T")
+DEFAULT_JOBS = 8
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_DEFAULT_WAIT = 60
 
 
 def parse_arguments():
@@ -52,25 +68,74 @@ def parse_arguments():
     parser.add_argument(
         "-build-logs-dir", required=False, type=str, default="previous_build_logs"
     )
+    parser.add_argument(
+        "-artifact-index",
+        required=False,
+        type=str,
+        default=None,
+        help="File keeping an index of the repo's artifacts between runs. Artifacts are looked up in it instead of searched one by one",
+    )
+    parser.add_argument(
+        "-jobs",
+        required=False,
+        type=int,
+        default=DEFAULT_JOBS,
+        help="Number of targets whose artifacts are fetched concurrently",
+    )
+    parser.add_argument(
+        "-build-logs-cache",
+        required=False,
+        type=str,
+        default=None,
+        help="parse_build_warnings --baseline-cache. Cached baseline build logs aren't downloaded",
+    )
+    parser.add_argument(
+        "-build-logs-cache-size",
+        required=False,
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Size cap of the baseline warning cache in bytes",
+    )
+    parser.add_argument(
+        "-artifact-cache",
+        required=False,
+        type=str,
+        default=None,
+        help="download_artifact -cache. Cached artifacts aren't downloaded again",
+    )
+    parser.add_argument(
+        "-artifact-cache-size",
+        required=False,
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Size cap of the artifact cache in bytes",
+    )
 
     return parser.parse_args()
 
 
 def get_valid_artifact_hash(
-    hashes: List[str], repo_name: str, token: str, artifact_name: str
+    hashes: List[str],
+    repo_name: str,
+    token: str,
+    artifact_name: str,
+    index: "ArtifactIndex | None" = None,
 ) -> Tuple[str, "str | None"]:
     """
     Searches for the most recent GCC hash that has the artifact specified by
     @param artifact_name. Also returns id of found artifact for download.
+    With an index, the artifacts are looked up locally.
     """
-    # Authenticate ahead of time so we don't repeatedly authenticate for each of
-    # the requests.
-    auth = Auth.Token(token)
-    github = Github(auth=auth)
+    if index is not None:
+        for git_hash in hashes:
+            artifact_id = index.lookup(artifact_name.format(git_hash))
+            if artifact_id is not None:
+                return git_hash, artifact_id
+        return "No valid hash", None
 
     for git_hash in hashes:
         artifact_id = search_for_artifact(
-            artifact_name.format(git_hash), repo_name, token, github
+            artifact_name.format(git_hash), repo_name, token
         )
 
         if artifact_id is not None:
@@ -79,155 +144,6 @@ def get_valid_artifact_hash(
     return "No valid hash", None
 
 
-def get_weekly_names(prefix: str) -> List[str]:
-    """
-    Generates all permutaions of target artifact logs for
-    weekly runners
-
-    Current Weekly Builds (prefixes):
-    zve_
-    rvx_zvl_
-    rvx_zvl_lmulx_
-    checking_
-    """
-
-    if prefix == "checking_":
-        return ["checking_gcc-linux-rv64gcv_zicond-lp64d-{}-multilib"]
-
-    # don't test newlib with weekly runs
-    libc = [f"{prefix}gcc-linux"]
-    arch = ["rv32{}-ilp32d-{}", "rv64{}-lp64d-{}"]
-
-    possible_arch_extensions = [
-        "gcv_zve64d",
-        "gcv_zvl1024b",
-        "gcv_zvl512b",
-        "gcv_zvl256b",
-        "gcv_zvl128b",
-    ]
-    # each extension ends in '_'. Use this since lmul extensions
-    # use the same arch extension but the prefix is
-    # currently structured as rvx_zvl_lmulx_
-    is_lmul_prefix = "lmul" in prefix
-    comps = prefix.split("_")
-    prefix_arch = ""
-
-    if len(comps) == 2:
-        prefix = comps[0]
-    else:
-        prefix = comps[1]
-        prefix_arch = comps[0]
-
-    if is_lmul_prefix:
-        multilib_arch_extensions = [
-            ext for ext in possible_arch_extensions if prefix in ext
-        ]
-    else:
-        # Non lmul zvl runs do not run 128 since that's the default and is
-        # caught by the run-frequent runs. However, it would cause a false
-        # build-failure on the zvl runs because it can't find the gcv_zvl128b
-        # binary
-        multilib_arch_extensions = [
-            ext
-            for ext in possible_arch_extensions
-            if prefix in ext and "128" not in ext
-        ]
-    print("prefix arch:", prefix_arch)
-
-    # now have weekly runners rv32 zvl multilib variants
-    multilib_lists = ["-".join([i, j, "multilib"]) for i in libc for j in arch]
-    if prefix_arch != "":
-        multilib_lists = [
-            name for name in multilib_lists if prefix_arch in name.split("-")[2]
-        ]
-
-    multilib_names = [
-        name.format(ext, "{}")
-        for name in multilib_lists
-        for ext in multilib_arch_extensions
-    ]
-
-    return multilib_names
-
-
-def get_binutils_names(prefix: str) -> List[str]:
-    """
-    Generates all permutaions of target artifact logs for
-    binutils runs
-    """
-    assert prefix == "binutils_"
-
-    multilib_names = [
-        "binutils_gcc-linux-rv64gc-lp64d-{}-multilib",
-        "binutils_gcc-linux-rv32gc-ilp32d-{}-multilib",
-        "binutils_gcc-newlib-rv64gc-lp64d-{}-multilib",
-        "binutils_gcc-newlib-rv32gc-ilp32d-{}-multilib",
-    ]
-
-    return multilib_names
-
-
-def get_frequent_names(prefix: str) -> List[str]:
-    """
-    Generates all permutaions of target artifact logs for
-    build frequent runners
-    """
-    libc = [f"{prefix}gcc-linux", f"{prefix}gcc-newlib"]
-    arch = ["rv32{}-ilp32d-{}", "rv64{}-lp64d-{}"]
-
-    multilib_arch_extensions = [
-        "gcv",
-        "imc",
-        "imc_zba_zbb_zbc_zbs",
-    ]
-
-    multilib_lists = [
-        "-".join([i, j, "multilib"]) for i in libc for j in arch if "rv64" in j
-    ]
-
-    multilib_names = [
-        name.format(ext, "{}")
-        for name in multilib_lists
-        for ext in multilib_arch_extensions
-        if not ("linux" in name and "imc" in ext)  # only test uc on newlib
-    ]
-
-    non_multilib_arch_extensions = [
-        "gc",
-        "gc_zba_zbb_zbc_zbs",
-    ]
-
-    non_multilib_lists = ["-".join([i, j, "non-multilib"]) for i in libc for j in arch]
-
-    non_multilib_names = [
-        name.format(ext, "{}")
-        for name in non_multilib_lists
-        for ext in non_multilib_arch_extensions
-    ]
-
-    return multilib_names + non_multilib_names
-
-
-def get_possible_artifact_names(prefix: str) -> List[str]:
-    """
-    Generates all possible permutations of target artifact logs and
-    removes unsupported targets
-
-    Current Support:
-      Linux: rv32/64 multilib non-multilib
-      Newlib: rv32/64 non-multilib
-      Arch extensions: gc
-    """
-    # Weekly arch extensions included since rv64gcv_zv* doesn't
-    # exist without a prefix
-    if prefix == "" or prefix == "coord_" or prefix == "release_14_":
-        return get_frequent_names(prefix)
-    elif prefix == "binutils_":
-        return get_binutils_names(prefix)
-    else:
-        return get_weekly_names(prefix)
-
-
 def artifact_exists(artifact_name: str) -> bool:
     """
     @param artifact_name is the artifact associated with build success
@@ -280,18 +196,11 @@ def gcc_hashes(git_hash: str, issue_hashes: List[str], project: str):
 
 
 def issue_hashes(repo_name: str, token: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    response = requests.get(
-        f"https://api.github.com/repos/{repo_name}/issues?page=1&per_page=100&state=all",
-        headers=params,
-        timeout=15 * 60,  # 15 min timeout
+    print("getting most recent 100 issues")
+    issues = get_client(token).get_json(
+        f"{API_URL}/repos/{repo_name}/issues",
+        {"page": 1, "per_page": 100, "state": "all"},
     )
-    print(f"getting most recent 100 issues: {response.status_code}")
-    issues = json.loads(response.text)
     hashes = [
         issue["title"].split(" ")[-1]
         for issue in issues
@@ -306,51 +215,73 @@ def search_and_download_previous_report_artifact(
     prev_commits: List[str],
     repo_name: str,
     token: str,
+    previous_logs: "Dict[str, List[str]] | None" = None,
+    index: "ArtifactIndex | None" = None,
+    artifact_cache: "DiskCache | None" = None,
 ):
     """Download a most recent previous report artifact and return the corresponding hash.
     Return None if no corresponding hash has been found
+    previous_logs is the index_logs of ./previous_logs. It is built if not given.
     """
     artifact_name_template += "-report.log"
 
     # check if we already have a previous artifact available
     # mostly for regenerate issues
     if previous_hash:
-        name_components = artifact_name_template.split("-")
-        name_components[4] = "{}"
-        previous_name = "-".join(name_components).format(previous_hash)
-        name_components[4] = "[^-]*"
-        name_regex = "-".join(name_components)
-        dir_contents = " ".join(os.listdir("./previous_logs"))
-        possible_previous_logs = re.findall(name_regex, dir_contents)
+        if previous_logs is None:
+            previous_logs = index_logs("./previous_logs")
+        possible_previous_logs = find_logs(
+            previous_logs, artifact_name_template, previous_hash
+        )
+        previous_name = hashless_name(artifact_name_template)
         if len(possible_previous_logs) > 1:
             print(
-                f"found more than 1 previous log for {name_regex}: {possible_previous_logs}"
+                f"found more than 1 previous log for {previous_name}: {possible_previous_logs}"
             )
             for log in possible_previous_logs:  # remove non-recent logs
-                if previous_name not in log:
+                if get_hash_from_file_name(log) != previous_hash:
                     print(f"removing {log} from previous_logs")
                     os.remove(os.path.join("./previous_logs", log))
+                    previous_logs[previous_name].remove(log)
             return previous_hash
         if len(possible_previous_logs) == 1:
             print(f"found single log: {possible_previous_logs[0]}. Skipping download")
             return previous_hash
 
     # download previous artifact
-    base_hash, base_id = get_valid_artifact_hash(
-        prev_commits, repo_name, token, artifact_name_template
-    )
-    if base_hash != "No valid hash":
-        artifact_zip = download_artifact(
-            artifact_name_template.format(base_hash),
+    while True:
+        base_hash, base_id = get_valid_artifact_hash(
+            prev_commits, repo_name, token, artifact_name_template, index
+        )
+        if base_hash == "No valid hash":
+            break
+        artifact_name = artifact_name_template.format(base_hash)
+        artifact_zip = download_indexed_artifact(
+            artifact_name,
             str(base_id),
             token,
             repo_name,
             "./temp/",
+            index,
+            artifact_cache,
         )
-        extract_artifact(
-            artifact_zip,
-            outdir="previous_logs",
-        )
+        if artifact_zip is None:
+            # deleted and no longer in the index, try the next hash
+            continue
+        # the artifact is named after the report log it holds, anything else
+        # is extracted as a whole like before
+        try:
+            extract_artifact(
+                artifact_zip,
+                outdir="previous_logs",
+                artifact_name=artifact_name,
+                members=[artifact_name],
+            )
+        except ValueError as e:
+            print(f"{e}, extracting the whole artifact")
+            extract_artifact(
+                artifact_zip, outdir="previous_logs", artifact_name=artifact_name
+            )
         return base_hash
 
     print(
@@ -365,14 +296,26 @@ def download_build_log_artifact(
     repo_name: str,
     token: str,
     output_dir: str,
+    cache: "DiskCache | None" = None,
+    index: "ArtifactIndex | None" = None,
+    artifact_cache: "DiskCache | None" = None,
 ):
-    """Download the build log zipfiles for a corresponding base_hash and extract them to output_dir"""
+    """
+    Download the build log zipfiles for a corresponding base_hash and extract them to output_dir
+    Skipped when the parsed baseline warnings of the target are already cached,
+    parse_build_warnings --artifact-repo downloads it if they are evicted later
+    """
     # input validation
     if not base_hash:
         print("Missing base hash, skipping downloading the build log artifact")
         return
 
     target_format_pat = re.compile(r"gcc-")
+    if cache is not None:
+        target = target_format_pat.sub("", artifact_name_template).replace("-{}", "")
+        if cache.get_path(baseline_warnings_key(target, base_hash)) is not None:
+            print(f"Warnings of {target} at {base_hash} are cached. Skip download.")
+            return
     BUILD_LOG_SUFFIX = "-build-log"
     # Remove the starting gcc- and concatenate with the suffix
     artifact_name = target_format_pat.sub(
@@ -388,24 +331,75 @@ def download_build_log_artifact(
         # return
 
     # Search for the artifact id
-    auth = Auth.Token(token)
-    github = Github(auth=auth)
-    artifact_id = search_for_artifact(artifact_name, repo_name, token, github)
+    if index is not None:
+        artifact_id = index.lookup(artifact_name)
+    else:
+        artifact_id = search_for_artifact(artifact_name, repo_name, token)
     if not artifact_id:
         print(f"{artifact_name} doesn't exist in {repo_name}")
         return
 
     # download the zip file in a temporary directory to minimize side effect
     with TemporaryDirectory() as tmp_dir:
-        artifact_zip = download_artifact(
-            artifact_name, artifact_id, token, repo_name, tmp_dir
+        artifact_zip = download_indexed_artifact(
+            artifact_name,
+            artifact_id,
+            token,
+            repo_name,
+            tmp_dir,
+            index,
+            artifact_cache,
         )
+        if artifact_zip is None:
+            print(f"{artifact_name} doesn't exist in {repo_name}")
+            return
         extract_artifact(
             artifact_zip,
             outdir=output_dir,
+            artifact_name=artifact_name,
         )
 
 
+def download_indexed_artifact(
+    artifact_name: str,
+    artifact_id: str,
+    token: str,
+    repo_name: str,
+    output_dir: str,
+    index: "ArtifactIndex | None" = None,
+    artifact_cache: "DiskCache | None" = None,
+) -> "str | None":
+    """
+    download_artifact of an id that may come from the index. Artifacts
+    deleted since the index was synced are dropped from it and searched for
+    instead. Returns None if the artifact no longer exists.
+    """
+    try:
+        return download_artifact(
+            artifact_name,
+            artifact_id,
+            token,
+            repo_name,
+            output_dir,
+            cache=artifact_cache,
+        )
+    except requests.HTTPError as e:
+        if (
+            index is None
+            or e.response is None
+            or e.response.status_code not in (404, 410)
+        ):
+            raise
+    print(f"{artifact_name} ({artifact_id}) was deleted. Searching for it")
+    index.forget(artifact_name)
+    artifact_id = search_for_artifact(artifact_name, repo_name, token)
+    if artifact_id is None:
+        return None
+    return download_artifact(
+        artifact_name, artifact_id, token, repo_name, output_dir, cache=artifact_cache
+    )
+
+
 def download_all_artifacts(
     current_hash: str,
     previous_hash: str,
@@ -414,6 +408,10 @@ def download_all_artifacts(
     prefix: str,
     build_logs: bool,
     build_logs_dir: str,
+    build_logs_cache: "DiskCache | None" = None,
+    jobs: "int | None" = DEFAULT_JOBS,
+    artifact_index: "str | None" = None,
+    artifact_cache: "DiskCache | None" = None,
 ):
     """
     Goes through all possible artifact targets and downloads it
@@ -432,24 +430,123 @@ def download_all_artifacts(
     artifact_name_templates = get_possible_artifact_names(prefix)
     print(artifact_name_templates)
 
-    for artifact_name_template in artifact_name_templates:
-        artifact = artifact_name_template.format(current_hash)
-        # If this target failed to generate an artifact, skip
-        if not artifact_exists(artifact):
-            continue
+    # scan the previous logs once instead of once per artifact
+    previous_logs = index_logs("./previous_logs")
+
+    index = None
+    if artifact_index is not None:
+        index = ArtifactIndex(repo_name, token, artifact_index)
+        index.sync()
+
+    # Record build and testsuite failures in a fixed order before fetching
+    # artifacts concurrently
+    existing_templates = [
+        artifact_name_template
+        for artifact_name_template in artifact_name_templates
+        if artifact_exists(artifact_name_template.format(current_hash))
+    ]
+    args = (
+        previous_hash,
+        prev_commits,
+        repo_name,
+        token,
+        previous_logs,
+        build_logs,
+        build_logs_dir,
+        build_logs_cache,
+        index,
+        artifact_cache,
+    )
+    if jobs == 1:
+        for artifact_name_template in existing_templates:
+            download_target_artifacts(artifact_name_template, *args)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(download_target_artifacts, artifact_name_template, *args)
+            for artifact_name_template in existing_templates
+        ]
+        for future in futures:
+            future.result()
+
+
+def download_target_artifacts(
+    artifact_name_template: str,
+    previous_hash: str,
+    prev_commits: List[str],
+    repo_name: str,
+    token: str,
+    previous_logs: Dict[str, List[str]],
+    build_logs: bool,
+    build_logs_dir: str,
+    build_logs_cache: "DiskCache | None" = None,
+    index: "ArtifactIndex | None" = None,
+    artifact_cache: "DiskCache | None" = None,
+):
+    """Download all the required artifacts of a target"""
+    base_hash = retry_rate_limited(
+        search_and_download_previous_report_artifact,
+        artifact_name_template,
+        previous_hash,
+        prev_commits,
+        repo_name,
+        token,
+        previous_logs,
+        index,
+        artifact_cache,
+    )
+    if build_logs:
+        retry_rate_limited(
+            download_build_log_artifact,
+            artifact_name_template,
+            base_hash,
+            repo_name,
+            token,
+            build_logs_dir,
+            build_logs_cache,
+            index,
+            artifact_cache,
+        )
 
-        # Download all the required artifacts
-        base_hash = search_and_download_previous_report_artifact(
-            artifact_name_template, previous_hash, prev_commits, repo_name, token
+
+def rate_limited_wait(error: Exception, attempt: int) -> "int | None":
+    """
+    Seconds to wait before retrying after error or None if error isn't caused
+    by the GitHub rate limit
+    """
+    if isinstance(error, RateLimitExceededException):
+        wait = rate_limit_wait(error.status, error.headers or {}, attempt)
+        # PyGithub only raises it for rate limits, even without the headers
+        return RATE_LIMIT_DEFAULT_WAIT if wait is None else wait
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return rate_limit_wait(
+            error.response.status_code, error.response.headers, attempt
         )
-        if build_logs:
-            download_build_log_artifact(
-                artifact_name_template, base_hash, repo_name, token, build_logs_dir
-            )
+    return None
+
+
+def retry_rate_limited(function: Callable[..., T], *args) -> T:
+    """Call function, waiting for the GitHub rate limit to reset when it is exceeded"""
+    for attempt in range(RATE_LIMIT_RETRIES):
+        try:
+            return function(*args)
+        except (RateLimitExceededException, requests.HTTPError) as e:
+            wait = rate_limited_wait(e, attempt)
+            if wait is None:
+                raise
+        print(f"rate limited, retrying {function.__name__} in {wait}s")
+        time.sleep(wait)
+    return function(*args)
 
 
 def main():
     args = parse_arguments()
+    build_logs_cache = None
+    if args.build_logs_cache is not None:
+        build_logs_cache = DiskCache(args.build_logs_cache, args.build_logs_cache_size)
+    artifact_cache = None
+    if args.artifact_cache is not None:
+        artifact_cache = DiskCache(args.artifact_cache, args.artifact_cache_size)
     download_all_artifacts(
         args.hash,
         args.phash,
@@ -458,6 +555,10 @@ def main():
         args.prefix,
         args.build_logs,
         args.build_logs_dir,
+        build_logs_cache,
+        args.jobs,
+        args.artifact_index,
+        artifact_cache,
     )
 
 
@@ -1,8 +1,8 @@
-import requests
-import json
 import argparse
 import re
 
+from github_client import API_URL, get_client
+
 
 def parse_arguments():
     """parse command line arguments"""
@@ -32,15 +32,9 @@ def filter_results(issue):
 
 
 def parse_baseline_hash(url: str, token: str) -> str:
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    r = requests.get(url, params=params)
-    issues = json.loads(r.text)
-    filtered = [issue for issue in issues if filter_results(issue)]
-    issue = filtered[0]
+    # further pages are only requested if the first has no baseline
+    issues = get_client(token).paginate(url)
+    issue = next(issue for issue in issues if filter_results(issue))
     print(f"Baseline from {issue['title']}")
     assert (
         re.search("^Testsuite Status [0-9a-f]{40}$", issue["title"]) is not None
@@ -53,7 +47,9 @@ def parse_baseline_hash(url: str, token: str) -> str:
 
 def main():
     args = parse_arguments()
-    all_issues_url = "https://api.github.com/repos/patrick-rivos/gcc-postcommit-ci/issues?state=all&per_page=100"
+    all_issues_url = (
+        f"{API_URL}/repos/patrick-rivos/gcc-postcommit-ci/issues?state=all&per_page=100"
+    )
     parse_baseline_hash(all_issues_url, args.token)
 
 
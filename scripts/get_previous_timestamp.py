@@ -1,8 +1,9 @@
 import argparse
-import requests
 import json
 import sys
 
+from github_client import API_URL, get_client
+
 
 def parse_arguments():
     """parse command line arguments"""
@@ -37,20 +38,17 @@ def parse_arguments():
 
 def get_workflow_runs(token: str, repo: str, workflow: str):
     params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
         "branch": "main",
         "event": "schedule",
         "per_page": 100,
     }
-    url = f"https://api.github.com/repos/{repo}/actions/runs"
-    r = requests.get(url, params)
+    url = f"{API_URL}/repos/{repo}/actions/runs"
+    r = get_client(token).get(url, params)
     if r.status_code >= 500:
         with open("patchwork_down.txt", "w") as f:
             f.write(f"status code: {r.status_code}")
         return None
-    run_info = json.loads(r.text)
+    run_info = r.json()
     print(f"Before filter have {len(run_info['workflow_runs'])} to consider")
     runs = [run for run in run_info["workflow_runs"] if run["name"] == workflow]
     print(f"After filter have {len(runs)} to consider")
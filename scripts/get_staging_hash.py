@@ -1,10 +1,10 @@
 import argparse
-import json
-import requests
 import os
 import re
 from typing import List, Tuple
 
+from github_client import API_URL, get_client
+
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -58,18 +58,11 @@ def remove_duplicates(issues):
 
 
 def issue_hashes(repo_name: str, token: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    response = requests.get(
-        f"https://api.github.com/repos/{repo_name}/issues?page=1&per_page=100&state=all",
-        headers=params,
-        timeout=15 * 60,  # 15 min timeout
+    print("getting most recent 100 issues")
+    issues = get_client(token).get_json(
+        f"{API_URL}/repos/{repo_name}/issues",
+        {"page": 1, "per_page": 100, "state": "all"},
     )
-    print(f"getting most recent 100 issues: {response.status_code}")
-    issues = json.loads(response.text)
     filtered_issues = [issue for issue in issues if filter_issue(issue)]
     filtered_issues = remove_duplicates(filtered_issues)
     issue = filtered_issues[4]
@@ -3,6 +3,8 @@ import json
 import requests
 import re
 
+from github_client import API_URL, get_client
+
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -45,36 +47,20 @@ def filter_issue(issue):
 
 
 def get_issue(repo_name: str, token: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    response = requests.get(
-        f"https://api.github.com/repos/{repo_name}/issues?page=1&per_page=100&state=closed",
-        headers=params,
-        timeout=15 * 60,  # 15 min timeout
+    print("getting most recent closed issues")
+    # further pages are only requested if the first has no matching issue
+    issues = get_client(token).paginate(
+        f"{API_URL}/repos/{repo_name}/issues", {"per_page": 100, "state": "closed"}
     )
-    print(f"getting most recent 100 issues: {response.status_code}")
-    issues = json.loads(response.text)
-    filtered_issues = [issue for issue in issues if filter_issue(issue)]
-    issue = filtered_issues[0]
+    issue = next(issue for issue in issues if filter_issue(issue))
     return issue
 
 
 def get_comment(repo_name: str, token: str, issue_num: int):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    response = requests.get(
-        f"https://api.github.com/repos/{repo_name}/issues/{issue_num}/comments",
-        headers=params,
-        timeout=15 * 60,  # 15 min timeout
+    print(f"getting comments for issue {issue_num}")
+    comments = get_client(token).get_json(
+        f"{API_URL}/repos/{repo_name}/issues/{issue_num}/comments"
     )
-    print(f"getting comments for issue {issue_num}: {response.status_code}")
-    comments = json.loads(response.text)
     assert len(comments) > 2
     return comments[1]
 
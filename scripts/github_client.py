@@ -0,0 +1,234 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Mapping, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from github import Auth, Github
+
+from disk_cache import DiskCache
+
+API_URL = "https://api.github.com"
+API_VERSION = "2022-11-28"
+# Directory keeping the responses of conditional requests across runs
+CACHE_DIR_ENV = "GITHUB_RESPONSE_CACHE"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+POOL_SIZE = 16
+PER_PAGE = 100
+RETRIES = 5
+# other methods may not be idempotent
+RETRIED_METHODS = ("GET", "HEAD")
+MAX_WAIT = 15 * 60
+TIMEOUT = 15 * 60  # 15 min timeout
+
+# (etag, response headers, response body)
+CachedResponse = Tuple[str, Dict[str, str], bytes]
+
+
+class GithubClient:
+    """
+    GitHub REST client shared by the scripts. Requests go through one
+    keep-alive session and are retried on server errors and rate limits.
+    GETs of responses carrying an ETag are revalidated with If-None-Match, so
+    unchanged resources are served from the cache and don't count against the
+    rate limit. The cache lives in memory and in cache_dir if given.
+    """
+
+    def __init__(self, token: "str | None" = None, cache_dir: "str | None" = None):
+        self.token = token
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": API_VERSION,
+            }
+        )
+        if token:
+            self.session.headers["Authorization"] = f"token {token}"
+        self.cache = DiskCache(cache_dir, CACHE_MAX_BYTES) if cache_dir else None
+        self.responses: Dict[str, CachedResponse] = {}
+        # responses differ between tokens
+        self.cache_namespace = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+        self.lock = threading.Lock()
+        self._github: "Github | None" = None
+
+    def request(
+        self, method: str, url: str, retry: "bool | None" = None, **kwargs
+    ) -> requests.Response:
+        """
+        Send a request, retrying server errors, rate limits and dropped
+        connections with backoff. The last response is returned as is.
+        Only GET and HEAD are retried unless retry is given. Callers may pass
+        retry=True for idempotent requests and retry=False if they retry
+        themselves.
+        """
+        kwargs.setdefault("timeout", TIMEOUT)
+        if retry is None:
+            retry = method in RETRIED_METHODS
+        if not retry:
+            return self.session.request(method, url, **kwargs)
+        for attempt in range(RETRIES - 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                wait = 2**attempt
+                print(f"{method} {url} failed: {e}, retrying in {wait}s")
+            else:
+                wait = retry_wait(response, attempt)
+                if wait is None:
+                    return response
+                print(f"{method} {url}: {response.status_code}, retrying in {wait}s")
+                response.close()
+            time.sleep(wait)
+        return self.session.request(method, url, **kwargs)
+
+    def get(
+        self, url: str, params: "Dict[str, Any] | None" = None, **kwargs
+    ) -> requests.Response:
+        """Conditional GET, streamed responses are never cached"""
+        if kwargs.get("stream"):
+            return self.request("GET", url, params=params, **kwargs)
+        key = self.cache_key(url, params)
+        cached = self.cached(key)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        response = self.request("GET", url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached_response(response, cached)
+        etag = response.headers.get("ETag")
+        if response.status_code == 200 and etag:
+            self.store(key, (etag, dict(response.headers), response.content))
+        return response
+
+    def get_json(self, url: str, params: "Dict[str, Any] | None" = None) -> Any:
+        response = self.get(url, params)
+        print(f"GET {response.url}: {response.status_code}")
+        response.raise_for_status()
+        return response.json()
+
+    def paginate(
+        self,
+        url: str,
+        params: "Dict[str, Any] | None" = None,
+        key: "str | None" = None,
+    ) -> Iterator[Any]:
+        """
+        Items of a list endpoint, following the Link headers. Pages are only
+        fetched as the items are consumed. key selects the list of endpoints
+        wrapping their items in an object, e.g. workflow_runs.
+        """
+        next_url: "str | None" = url
+        while next_url is not None:
+            response = self.get(next_url, params)
+            print(f"GET {response.url}: {response.status_code}")
+            response.raise_for_status()
+            page = response.json()
+            yield from page[key] if key is not None else page
+            next_url = response.links.get("next", {}).get("url")
+            # the next link carries the query
+            params = None
+
+    def github(self) -> Github:
+        """PyGithub instance sharing this client's token"""
+        with self.lock:
+            if self._github is None:
+                auth = Auth.Token(self.token) if self.token else None
+                self._github = Github(auth=auth, per_page=PER_PAGE, pool_size=POOL_SIZE)
+            return self._github
+
+    def cache_key(self, url: str, params: "Dict[str, Any] | None") -> str:
+        prepared = requests.Request("GET", url, params=params).prepare()
+        return f"github-response:{self.cache_namespace}:{prepared.url}"
+
+    def cached(self, key: str) -> "CachedResponse | None":
+        with self.lock:
+            cached = self.responses.get(key)
+        if cached is None and self.cache is not None:
+            cached = self.cache.get_object(key)
+            if cached is not None:
+                cached = tuple(cached)
+        return cached
+
+    def store(self, key: str, cached: CachedResponse):
+        with self.lock:
+            self.responses[key] = cached
+        if self.cache is not None:
+            self.cache.put_object(key, cached)
+
+
+def rate_limit_wait(
+    status: int, headers: Mapping[str, str], attempt: int
+) -> "int | None":
+    """
+    Seconds until a rate limited request can be retried or None if the
+    response isn't rate limited. A 403 is only a rate limit when its headers
+    say so, otherwise it is a permission error.
+    """
+    headers = CaseInsensitiveDict(headers)
+    rate_limited = status == 429 or (
+        status == 403
+        and ("retry-after" in headers or headers.get("x-ratelimit-remaining") == "0")
+    )
+    if not rate_limited:
+        return None
+    if "retry-after" in headers:
+        wait = int(headers["retry-after"])
+    elif "x-ratelimit-reset" in headers:
+        wait = int(headers["x-ratelimit-reset"]) - int(time.time())
+    else:
+        wait = 60 * 2**attempt
+    return min(max(wait, 1), MAX_WAIT)
+
+
+def retry_wait(response: requests.Response, attempt: int) -> "int | None":
+    """Seconds to wait before retrying response or None if it is final"""
+    wait = rate_limit_wait(response.status_code, response.headers, attempt)
+    if wait is not None:
+        return wait
+    if response.status_code >= 500:
+        return 2**attempt
+    return None
+
+
+def cached_response(
+    response: requests.Response, cached: CachedResponse
+) -> requests.Response:
+    """Turn a 304 response into the cached 200 response"""
+    _, headers, content = cached
+    result = requests.Response()
+    result.status_code = 200
+    result.reason = "OK"
+    result.headers = CaseInsensitiveDict(headers)
+    result._content = content
+    result.url = response.url
+    result.request = response.request
+    return result
+
+
+_clients: Dict["str | None", GithubClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token: "str | None" = None) -> GithubClient:
+    """
+    The shared client of token. Responses are cached on disk in the directory
+    named by the GITHUB_RESPONSE_CACHE environment variable if it is set.
+    """
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = GithubClient(token, os.environ.get(CACHE_DIR_ENV))
+            _clients[token] = client
+        return client
+
+
+def get_github(token: "str | None" = None) -> Github:
+    """The shared PyGithub instance of token"""
+    return get_client(token).github()
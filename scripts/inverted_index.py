@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from dataclasses import astuple, dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from aggregate import (
+    SUMMARIES,
+    classify_failure,
+    load_summary_sidecar,
+    parse_arch_info,
+    parse_summary_markdown,
+)
+from compare_testsuite_log import SIDECAR_SUFFIX, parse_failure_name, sidecar_path
+from log_index import get_hash_from_file_name
+from testsuite_history import TARGET_COLUMNS, connect
+
+INDEX_VERSION = 1
+HISTORY = "History"
+
+
+@dataclass(frozen=True, slots=True)
+class Posting:
+    """One occurrence of a test in a summary or in the history store"""
+
+    hash: str
+    target: str
+    tool: str
+    section: str
+    status: str
+    category: str
+
+
+class InvertedIndex:
+    """Maps test names to the postings of every target reporting them"""
+
+    def __init__(self):
+        self.postings: Dict[str, List[Posting]] = defaultdict(list)
+
+    def add_sections(
+        self,
+        file: str,
+        sections: Dict[str, Dict[str, Dict[str, List[str]]]],
+    ):
+        """Index the failures of a parsed summary"""
+        git_hash = get_hash_from_file_name(file)
+        for section, targets in sections.items():
+            for target, tools in targets.items():
+                if target is None:
+                    continue
+                arch_info = sys.intern(parse_arch_info(file, target))
+                for tool, lines in tools.items():
+                    for line in lines:
+                        self.postings[parse_failure_name(line.strip())].append(
+                            Posting(
+                                git_hash,
+                                arch_info,
+                                tool,
+                                section,
+                                sys.intern(line.split(" ")[0].rstrip(":")),
+                                classify_failure(line),
+                            )
+                        )
+
+    def add_summary(self, file_name: str):
+        sidecar_name = sidecar_path(file_name)
+        if os.path.exists(sidecar_name):
+            _, sections = load_summary_sidecar(sidecar_name)
+        else:
+            _, sections = parse_summary_markdown(file_name)
+        self.add_sections(os.path.basename(file_name), sections)
+
+    def add_summaries(self, summaries_dir: str):
+        for file in sorted(os.listdir(summaries_dir)):
+            # sidecars are read together with their summary
+            if not file.endswith(SIDECAR_SUFFIX):
+                self.add_summary(os.path.join(summaries_dir, file))
+
+    def add_history(self, conn: sqlite3.Connection, tests: "Iterable[str] | None"):
+        """
+        Index the stored results of every ingested run, optionally only of
+        tests. Tests ending with '/' select every test in that directory.
+        """
+        query = f"SELECT test, hash, {', '.join(TARGET_COLUMNS)}, status FROM results"
+        conditions: List[str] = []
+        params: List[str] = []
+        for test in tests or []:
+            if test.endswith("/"):
+                conditions.append("substr(test, 1, ?) = ?")
+                params += [len(test), test]
+            else:
+                conditions.append("test = ?")
+                params.append(test)
+        if tests is not None:
+            query += f" WHERE {' OR '.join(conditions) or '0'}"
+        for row in conn.execute(query, params):
+            test, git_hash, libc, arch, abi, model, multilib, other_args, tool = row[:9]
+            target = " ".join(
+                part
+                for part in (
+                    libc,
+                    arch,
+                    abi,
+                    model,
+                    "multilib" if multilib else "non-multilib",
+                    other_args,
+                )
+                if part
+            )
+            self.postings[test].append(
+                Posting(git_hash, target, tool, HISTORY, row[9], "")
+            )
+
+    def lookup(self, test: str) -> List[Tuple[str, Posting]]:
+        """
+        (test name, posting) of every posting of test. A test ending with '/'
+        matches every test in that directory.
+        """
+        if test.endswith("/"):
+            names = [name for name in self.postings if name.startswith(test)]
+        else:
+            names = [test] if test in self.postings else []
+        return sorted(
+            ((name, posting) for name in names for posting in self.postings[name]),
+            key=lambda item: (item[0], astuple(item[1])),
+        )
+
+    def save(self, index_path: str):
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "postings": {
+                        test: [astuple(posting) for posting in postings]
+                        for test, postings in self.postings.items()
+                    },
+                },
+                f,
+            )
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path: str) -> "InvertedIndex":
+        index = cls()
+        with open(index_path, "r") as f:
+            saved = json.load(f)
+        if saved.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {index_path}")
+        for test, postings in saved["postings"].items():
+            index.postings[test] = [Posting(*posting) for posting in postings]
+        return index
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Test name to target index")
+    parser.add_argument(
+        "-summaries",
+        default=SUMMARIES,
+        metavar="<dir>",
+        type=str,
+        help="Directory containing the summaries of a run",
+    )
+    parser.add_argument(
+        "-index",
+        default=None,
+        metavar="<filename>",
+        type=str,
+        help="Index file written by build and read by query",
+    )
+    parser.add_argument(
+        "-db",
+        "--database",
+        default=None,
+        metavar="<filename>",
+        type=str,
+        help="testsuite_history database whose results are indexed as well",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Index the summaries and write -index")
+    query = subparsers.add_parser("query", help="Targets reporting a test")
+    query.add_argument(
+        "tests",
+        nargs="+",
+        type=str,
+        help="Test names, e.g. gcc.dg/pr1.c. Names ending with '/' match a directory",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "query" and args.index and os.path.exists(args.index):
+        # history was indexed when the index was built
+        index = InvertedIndex.load(args.index)
+    else:
+        index = InvertedIndex()
+        index.add_summaries(args.summaries)
+        if args.database:
+            conn = connect(args.database)
+            # a query only needs the requested tests out of the history store
+            index.add_history(conn, args.tests if args.command == "query" else None)
+            conn.close()
+
+    if args.command == "build":
+        if args.index is None:
+            raise ValueError("build requires -index")
+        index.save(args.index)
+        print(f"indexed {len(index.postings)} tests")
+        return
+
+    for test in args.tests:
+        for name, posting in index.lookup(test):
+            print(
+                f"{name}|{posting.target}|{posting.tool}|{posting.section}|"
+                f"{posting.status}|{posting.category}|{posting.hash}"
+            )
+
+
+if __name__ == "__main__":
+    main()
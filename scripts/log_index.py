@@ -0,0 +1,48 @@
+import os
+from collections import defaultdict
+from typing import Dict, List
+
+# Artifact file names look like gcc-linux-rv64gcv-lp64d-<hash>-multilib-report.log
+HASH_INDEX = 4
+
+
+def hashless_name(file_name: str) -> str:
+    """Remove the hash component from an artifact file name"""
+    components = file_name.split("-")
+    if len(components) > HASH_INDEX:
+        del components[HASH_INDEX]
+    return "-".join(components)
+
+
+def get_hash_from_file_name(file_name: str) -> str:
+    return file_name.split("-")[HASH_INDEX]
+
+
+def index_logs(directory_path: str) -> Dict[str, List[str]]:
+    """
+    Scan directory_path once and map every hashless file name to the files
+    sharing it. Files are kept in directory listing order.
+    """
+    index: Dict[str, List[str]] = defaultdict(list)
+    if not os.path.exists(directory_path):
+        return index
+    for file in os.listdir(directory_path):
+        if len(file.split("-")) <= HASH_INDEX:  # failed_testsuite and failed_build
+            continue
+        index[hashless_name(file)].append(file)
+    return index
+
+
+def find_logs(
+    index: Dict[str, List[str]], file_name: str, preferred_hash: "str | None" = None
+) -> List[str]:
+    """
+    Return the files in index that only differ from file_name by their hash.
+    Files at preferred_hash are moved to the front.
+    """
+    logs = index.get(hashless_name(file_name), [])
+    if preferred_hash:
+        logs = sorted(
+            logs, key=lambda log: get_hash_from_file_name(log) != preferred_hash
+        )
+    return logs
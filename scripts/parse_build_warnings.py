@@ -1,11 +1,34 @@
-from typing import Dict, Set, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
 from pathlib import Path
+import hashlib
+import mmap
+import os
 import re
 import argparse
+from disk_cache import DEFAULT_MAX_BYTES, DiskCache
 
 PRE_COMMIT = "pre-commit"
 POST_COMMIT = "post-commit"
 
+# Leading and trailing wildcards are dropped since the patterns are only searched
+WARNING_PATTERN = re.compile(r":\s*warning:", re.IGNORECASE)
+FILE_PATTERN = re.compile(r"\s(?:\d+|\s)\s*\|")
+NOTE_PATTERN = re.compile(r":\d+(:\d+)?:\s*note:", re.IGNORECASE)
+ABSOLUTE_PATH_PATTERN = re.compile(r"(/\S*/)*riscv-gnu-toolchain")
+# Every line matching WARNING_PATTERN contains this
+WARNING_CANDIDATE_PATTERN = re.compile(rb"warning:", re.IGNORECASE)
+# file:248:25, plural.y:52.1-7 and Rules:360 locations
+LOCATION_PATTERN = re.compile(r":\d+(?:[.:]\d+)*(?:-\d+)?(?=:)")
+# "  248 |       pp_printf (...);" source excerpt of a warning
+EXCERPT_PATTERN = re.compile(r"\s*\d+\s*\|(.*)")
+FINGERPRINT_SIZE = 16
+
+# (target, baseline hash) -> path of the downloaded baseline build log
+BaselineDownloader = Callable[[str, str], "Path | None"]
+
 
 class WarningParser:
     def __init__(self):
@@ -17,13 +40,10 @@ class WarningParser:
             "": No new warnings
             string value: parsed warning
         """
-        WARNING_PATTERN = re.compile(r".*(:[\w]+)*:\s*warning:.*", re.IGNORECASE)
-        FILE_PATTERN = re.compile(r"\s+(?:\d+|\s)\s*\|\s*.*")
-        NOTE_PATTERN = re.compile(r".*:\d+(:\d+)?:\s*note:.*", re.IGNORECASE)
-        ABSOLUTE_PATH_PATTERN = re.compile(r"(/\S*/)*riscv-gnu-toolchain")
         # Replace all absolute path to path relative to riscv-gnu-toolchain
         # Identical errors could be treated "different" due to the difference in the path
-        line = ABSOLUTE_PATH_PATTERN.sub("riscv-gnu-toolchain", line)
+        if "riscv-gnu-toolchain" in line:
+            line = ABSOLUTE_PATH_PATTERN.sub("riscv-gnu-toolchain", line)
         # If we see a warning pattern, always flush the message for a new warning message
         if WARNING_PATTERN.search(line):
             temp, self.message = self.message, line
@@ -47,36 +67,177 @@ class WarningParser:
 def parse_build_warnings(
     old_build_path: str, new_build_path: str
 ) -> Tuple[Set[str], Set[str]]:
-    """Construct a set of new warnings that are not present in the old build warning"""
-    new_build_warnings = construct_warning_set(new_build_path)
-    old_build_warnings = construct_warning_set(old_build_path)
-    resolved_warnings = old_build_warnings - new_build_warnings
-    new_warnings = new_build_warnings - old_build_warnings
+    """
+    Construct a set of new warnings that are not present in the old build warning
+    Warnings are compared by fingerprint so moved warnings are neither new nor resolved
+    """
+    new_build_warnings = construct_warning_fingerprints(new_build_path)
+    old_build_warnings = construct_warning_fingerprints(old_build_path)
+    return diff_warning_fingerprints(old_build_warnings, new_build_warnings)
+
+
+def diff_warning_fingerprints(
+    old_build_warnings: Dict[bytes, str], new_build_warnings: Dict[bytes, str]
+) -> Tuple[Set[str], Set[str]]:
+    """returns (new warnings, resolved warnings)"""
+    resolved_warnings = {
+        old_build_warnings[fingerprint]
+        for fingerprint in old_build_warnings.keys() - new_build_warnings.keys()
+    }
+    new_warnings = {
+        new_build_warnings[fingerprint]
+        for fingerprint in new_build_warnings.keys() - old_build_warnings.keys()
+    }
     return new_warnings, resolved_warnings
 
 
+def warning_fingerprint(warning: str) -> bytes:
+    """
+    Digest of the warning without line and column numbers: the file, message
+    and flag of the warning line plus the first source line it points at
+    """
+    lines = warning.split("\n")
+    key = LOCATION_PATTERN.sub("", lines[0]).strip()
+    for line in lines[1:]:
+        excerpt = EXCERPT_PATTERN.match(line)
+        if excerpt:
+            key += "\n" + excerpt.group(1).strip()
+            break
+    return hashlib.blake2b(key.encode(), digest_size=FINGERPRINT_SIZE).digest()
+
+
+def construct_warning_fingerprints(build_path: str) -> Dict[bytes, str]:
+    """
+    Fingerprints of every warning in the build file mapped to the first
+    warning text with that fingerprint
+    """
+    path = Path(build_path)
+    # validate the path
+    if not path.exists():
+        raise ValueError(f"{build_path} doesn't exist")
+    build_warnings: Dict[bytes, str] = {}
+    for warning in iter_warnings(build_path):
+        if warning != "":
+            build_warnings.setdefault(warning_fingerprint(warning), warning)
+    return build_warnings
+
+
+def baseline_warnings_key(target: str, baseline_hash: str) -> str:
+    """Cache key of the warning fingerprints of a target's baseline build log"""
+    return f"baseline-warnings:{target}:{baseline_hash}"
+
+
+def load_baseline_warnings(
+    old_build_path: "Path | None",
+    target: str,
+    baseline_hash: str,
+    cache: "DiskCache | None" = None,
+    download_baseline: "BaselineDownloader | None" = None,
+) -> Dict[bytes, str]:
+    """
+    Fingerprints of the baseline build log. Cached fingerprints are used
+    instead of the log when available and freshly parsed logs are cached.
+    Logs that are neither cached nor given are downloaded with
+    download_baseline, e.g. when the cache entry was evicted after the
+    download step skipped the log.
+    """
+    key = baseline_warnings_key(target, baseline_hash)
+    if cache is not None:
+        cached = cache.get_object(key)
+        if cached is not None:
+            return cached
+    if old_build_path is None and download_baseline is not None:
+        print(f"Warnings of {target} at {baseline_hash} aren't cached. Downloading")
+        old_build_path = download_baseline(target, baseline_hash)
+    if old_build_path is None:
+        raise RuntimeError(f"Older build for {target} at {baseline_hash} doesn't exist")
+    build_warnings = construct_warning_fingerprints(str(old_build_path))
+    if cache is not None:
+        cache.put_object(key, build_warnings)
+    return build_warnings
+
+
+def parse_target_build_warnings(
+    target: str,
+    old_build_path: "Path | None",
+    new_build_path: Path,
+    baseline_hash: str,
+    cache: "DiskCache | None" = None,
+    download_baseline: "BaselineDownloader | None" = None,
+) -> Tuple[Set[str], Set[str]]:
+    """parse_build_warnings with the baseline fingerprints loaded through the cache"""
+    old_build_warnings = load_baseline_warnings(
+        old_build_path, target, baseline_hash, cache, download_baseline
+    )
+    new_build_warnings = construct_warning_fingerprints(str(new_build_path))
+    return diff_warning_fingerprints(old_build_warnings, new_build_warnings)
+
+
 def construct_warning_set(build_path: str) -> Set[str]:
     """Iterate through each warning from the build file and construct a set"""
     path = Path(build_path)
     # validate the path
-    if not path.exists:
+    if not path.exists():
         raise ValueError(f"{build_path} doesn't exist")
     build_warnings = set()
+    for warning in iter_warnings(build_path):
+        if warning != "":
+            build_warnings.add(warning)
+    return build_warnings
 
-    def AddToSet(msg: str):
-        if msg != "":
-            build_warnings.add(msg)
 
+def iter_warnings(build_path: str) -> Iterator[str]:
+    """
+    Yields the warnings of the build file. Only lines containing "warning:" and
+    the lines following a warning are decoded and parsed.
+    """
+    if os.path.getsize(build_path) == 0:
+        return
     parser = WarningParser()
-    with open(build_path, "r") as file:
-        for line in file:
-            parsed = parser.parse(line)
+    with open(build_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        if data.find(b"\r") != -1:
+            # Text mode translates \r and \r\n into line breaks
+            yield from iter_warnings_text(build_path)
+            return
+        # end of the last parsed line
+        pos = 0
+        for match in WARNING_CANDIDATE_PATTERN.finditer(data):
+            if match.start() < pos:
+                continue
+            line_start = data.rfind(b"\n", 0, match.start()) + 1
+            # lines attached to the current warning
+            pos = yield from parse_lines(parser, data, pos, line_start)
+            line_end = data.find(b"\n", line_start)
+            pos = len(data) if line_end == -1 else line_end + 1
             # if the following line is a start of the new warning, parser emits the parsed warning message
-            AddToSet(parsed)
+            yield parser.parse(data[line_start:pos].decode(errors="replace"))
+        yield from parse_lines(parser, data, pos, len(data))
     # If new warning line is not given, the last message cannot be flushed automatically
-    parsed = parser.flush()
-    AddToSet(parsed)
-    return build_warnings
+    yield parser.flush()
+
+
+def parse_lines(parser: WarningParser, data: mmap.mmap, pos: int, end: int):
+    """
+    Parse the lines in data[pos:end] while a warning is being constructed.
+    Lines after that can't change the parser state as none of them are
+    warnings. returns end
+    """
+    while parser.message and pos < end:
+        line_end = data.find(b"\n", pos, end)
+        line_end = end if line_end == -1 else line_end + 1
+        yield parser.parse(data[pos:line_end].decode(errors="replace"))
+        pos = line_end
+    return end
+
+
+def iter_warnings_text(build_path: str) -> Iterator[str]:
+    parser = WarningParser()
+    with open(build_path, "r") as file:
+        for line in file:
+            yield parser.parse(line)
+    yield parser.flush()
 
 
 def parse_target(file_name: str) -> str:
@@ -91,6 +252,12 @@ def parse_target(file_name: str) -> str:
     return "-".join(parts[:BUILD_LOG_INDEX])
 
 
+def parse_hash(file_name: str) -> str:
+    """Parse the hash from the post commit build log formatted file name"""
+    HASH_INDEX = 3
+    return file_name.split("-")[HASH_INDEX]
+
+
 def convert_pre_to_post_format(file_name: str):
     """Convert pre-commit's build log file format to post-commit's format
     pre-commit's build log format: ${patch_number}-{}
@@ -103,15 +270,47 @@ def convert_pre_to_post_format(file_name: str):
     return "-".join(parts)
 
 
+def download_baseline_log(
+    old_build_directory: str, repo_name: str, token: str, target: str, git_hash: str
+) -> "Path | None":
+    """Download the build log of target at git_hash into old_build_directory"""
+    # download_artifacts imports this module
+    from download_artifacts import download_build_log_artifact
+
+    parts = target.split("-")
+    HASH_INDEX = 3
+    parts.insert(HASH_INDEX, "{}")
+    download_build_log_artifact(
+        "gcc-" + "-".join(parts), git_hash, repo_name, token, old_build_directory
+    )
+    old_build_path = Path(old_build_directory)
+    if not old_build_path.exists():
+        return None
+    for file in old_build_path.iterdir():
+        if parse_target(file.name) == target and parse_hash(file.name) == git_hash:
+            return file
+    return None
+
+
 def parse_build_warnings_from_directory(
-    old_build_directory: str, new_build_directory: str, repo: str
+    old_build_directory: str,
+    new_build_directory: str,
+    repo: str,
+    jobs: "int | None" = None,
+    cache: "DiskCache | None" = None,
+    baseline_hash: "str | None" = None,
+    download_baseline: "BaselineDownloader | None" = None,
 ) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
     """Iterate through new build logs in the new_build_directory to compare with the old build logs from old_build_directory
     After constructing a set of new warnings for each build log, the set of new warnings is printed out to the output file
+    Each target is compared in one of jobs worker processes
+    With a cache, the baseline warnings of targets without an old build log are
+    loaded from the cache entry of baseline_hash, or downloaded with
+    download_baseline if it was evicted
     """
     # input validation
     old_build_path = Path(old_build_directory)
-    if not old_build_path.exists():
+    if not old_build_path.exists() and cache is None:
         raise ValueError(f"{old_build_directory} doesn't exist")
     new_build_path = Path(new_build_directory)
     if not new_build_path.exists():
@@ -119,32 +318,85 @@ def parse_build_warnings_from_directory(
 
     new_build_counterpart = dict()
     # Construct the new build counterpart while unrolling the old_build_path.iterdir(). Then searching for the counterpart is not required.
-    for file in old_build_path.iterdir():
-        hashless = parse_target(file.name)
-        new_build_counterpart[hashless] = file
+    if old_build_path.exists():
+        for file in old_build_path.iterdir():
+            hashless = parse_target(file.name)
+            new_build_counterpart[hashless] = file
 
-    new_warnings = dict()
-    resolved_warnings = dict()
+    targets = []
+    old_build_files = []
+    new_build_files = []
+    baseline_hashes = []
     for new_build_file in new_build_path.iterdir():
         # Pre-commit build log files have a different format from post-commit build log files
         new_build_file_name = new_build_file.name
         if repo == PRE_COMMIT:
             new_build_file_name = convert_pre_to_post_format(new_build_file_name)
         hashless = parse_target(new_build_file_name)
-        old_build_file = new_build_counterpart[hashless]
-        if old_build_file == "":
+        old_build_file = new_build_counterpart.get(hashless)
+        if old_build_file is not None:
+            baseline_hashes.append(parse_hash(old_build_file.name))
+        elif cache is not None and baseline_hash is not None:
+            baseline_hashes.append(baseline_hash)
+        else:
             raise RuntimeError(f"Older build for {new_build_file} doesn't exist")
-        new_warnings[hashless], resolved_warnings[hashless] = parse_build_warnings(
-            old_build_file, new_build_file
-        )
+        targets.append(hashless)
+        old_build_files.append(old_build_file)
+        new_build_files.append(new_build_file)
+
+    args = (
+        targets,
+        old_build_files,
+        new_build_files,
+        baseline_hashes,
+        repeat(cache),
+        repeat(download_baseline),
+    )
+    if jobs == 1 or len(targets) <= 1:
+        return merge_build_warnings(targets, map(parse_target_build_warnings, *args))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(parse_target_build_warnings, *args)
+        return merge_build_warnings(targets, results)
+
+
+def merge_build_warnings(
+    targets: List[str], results: Iterable[Tuple[Set[str], Set[str]]]
+) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+    """Identical warnings of different targets share a single string"""
+    interned: Dict[str, str] = {}
+    new_warnings = dict()
+    resolved_warnings = dict()
+    for hashless, (new, resolved) in zip(targets, results):
+        new_warnings[hashless] = {interned.setdefault(w, w) for w in new}
+        resolved_warnings[hashless] = {interned.setdefault(w, w) for w in resolved}
     return new_warnings, resolved_warnings
 
 
+def group_warnings_by_targets(
+    warnings_dict: Dict[str, Set[str]]
+) -> Dict[Tuple[str, ...], List[str]]:
+    """
+    Group the warnings by the exact set of targets they appear on
+    returns Dict[sorted targets: sorted warnings]
+    """
+    warning_targets: Dict[str, List[str]] = {}
+    for target, warnings in sorted(warnings_dict.items()):
+        for warning in warnings:
+            warning_targets.setdefault(warning, []).append(target)
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for warning, targets in warning_targets.items():
+        groups.setdefault(tuple(targets), []).append(warning)
+    for warnings in groups.values():
+        warnings.sort()
+    return groups
+
+
 def export_build_warnings(
     warnings_dict: Dict[str, Set[str]], output: str, warning_type: str
 ):
     """Export the build warnings to a specified output file
     Simply print New build warnings doesn't exist if warnings_dict is empty
+    Each warning is printed once under the targets it appears on
     """
 
     def is_warnings_dict_empty(warnings_dict: Dict[str, Set[str]]):
@@ -160,11 +412,14 @@ def export_build_warnings(
             return
         comment = f"# {warning_type}\nA List of build warnings present at this hash\n"
         f.write(comment)
-        for target, warnings in sorted(warnings_dict.items()):
-            if not warnings:
-                continue
-            f.write(f"## {target}\n```\n")
-            for warning in sorted(warnings):
+        groups = group_warnings_by_targets(warnings_dict)
+        # warnings on the most targets first
+        for targets in sorted(groups, key=lambda targets: (-len(targets), targets)):
+            if len(warnings_dict) > 1 and len(targets) == len(warnings_dict):
+                f.write("## All targets\n```\n")
+            else:
+                f.write(f"## {', '.join(targets)}\n```\n")
+            for warning in groups[targets]:
                 f.write(warning)
             f.write("```\n---\n")
 
@@ -203,13 +458,63 @@ def parse_arguments():
         type=str,
         help="Repo that is running the script. It affects the build log file name format",
     )
+    parser.add_argument(
+        "--baseline-cache",
+        default=None,
+        type=str,
+        help="Directory caching the parsed warnings of baseline build logs",
+    )
+    parser.add_argument(
+        "--baseline-cache-size",
+        default=DEFAULT_MAX_BYTES,
+        type=int,
+        help="Size cap of the baseline warning cache in bytes",
+    )
+    parser.add_argument(
+        "--baseline-hash",
+        default=None,
+        type=str,
+        help="Hash of the baseline build. Targets without an old build log use its cached warnings",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=None,
+        type=int,
+        help="Number of worker processes comparing targets. Defaults to the cpu count",
+    )
+    parser.add_argument(
+        "--artifact-repo",
+        default=None,
+        type=str,
+        help="Repo of the build log artifacts. Baseline logs evicted from the cache are downloaded from it",
+    )
+    parser.add_argument(
+        "--token",
+        default=None,
+        type=str,
+        help="Github access token used with --artifact-repo",
+    )
     return parser.parse_args()
 
 
 def main():
     args = parse_arguments()
+    cache = None
+    if args.baseline_cache is not None:
+        cache = DiskCache(args.baseline_cache, args.baseline_cache_size)
+    download_baseline = None
+    if args.artifact_repo is not None:
+        download_baseline = partial(
+            download_baseline_log, args.old_dir, args.artifact_repo, args.token
+        )
     new_warnings, resolved_warnings = parse_build_warnings_from_directory(
-        args.old_dir, args.new_dir, args.repo
+        args.old_dir,
+        args.new_dir,
+        args.repo,
+        args.jobs,
+        cache,
+        args.baseline_hash,
+        download_baseline,
     )
     export_build_warnings(new_warnings, args.new_warnings_output, "New build warnings")
     export_build_warnings(
@@ -1,6 +1,6 @@
 import argparse
-import requests
-import json
+
+from github_client import API_URL, get_client
 
 
 def parse_arguments():
@@ -22,14 +22,8 @@ def parse_arguments():
 
 
 def get_issue_hash(issue_num: str, token: str):
-    issue_url = f"https://api.github.com/repos/patrick-rivos/gcc-postcommit-ci/issues/{issue_num}"
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-Github-Api-Version": "2022-11-28",
-    }
-    r = requests.get(issue_url, headers=params)
-    response = json.loads(r.text)
+    issue_url = f"{API_URL}/repos/patrick-rivos/gcc-postcommit-ci/issues/{issue_num}"
+    response = get_client(token).get_json(issue_url)
     print(response["title"].split(" ")[-1])
 
 
@@ -1,8 +1,10 @@
 import argparse
 import os
-from collections import defaultdict
-from typing import Dict, List, Set
-import sys
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, TextIO, Tuple
 
 nicknames = {
     "--param=riscv-autovec-preference=": "autovec-",
@@ -33,52 +35,129 @@ def parse_arguments():
         type=str,
         help="output directory",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=None,
+        metavar="<int>",
+        type=int,
+        help="Number of worker processes splitting the files of -indir. Defaults to the cpu count",
+    )
     return parser.parse_args()
 
 
-def parse_file(file_name: str):
+def get_output_name(target: str, libc: str, gcchash: str, multilib: str) -> str:
+    comps = target.split(" ")
+    arch = comps[0]
+    abi = comps[1]
+    other_args = "_".join(comps[3:]) if len(comps) > 3 else None
+    if other_args:
+        for k, v in nicknames.items():
+            other_args = other_args.replace(k, v)
+        return f"gcc-{libc}-{arch}-{abi}-{gcchash}-{other_args}-{multilib}-report.log"
+    return f"gcc-{libc}-{arch}-{abi}-{gcchash}-{multilib}-report.log"
+
+
+class TargetFiles:
+    """
+    Per-target output files. Content goes to temporary files in outdir which
+    only replace the outputs once commit is called.
+    """
+
+    def __init__(self, outdir: str, libc: str, gcchash: str, multilib: str):
+        self.outdir = outdir
+        self.libc = libc
+        self.gcchash = gcchash
+        self.multilib = multilib
+        self.handles: Dict[str, TextIO] = {}
+        self.renames: List[Tuple[str, str]] = []
+
+    def __contains__(self, target: str) -> bool:
+        return target in self.handles
+
+    def get(self, target: str) -> TextIO:
+        if target not in self.handles:
+            output = os.path.join(
+                self.outdir,
+                get_output_name(target, self.libc, self.gcchash, self.multilib),
+            )
+            # unique per process so concurrent writers never share a file
+            temp_path = os.path.join(
+                self.outdir, f".{os.path.basename(output)}.{os.getpid()}.tmp"
+            )
+            self.handles[target] = open(temp_path, "w")
+            self.renames.append((temp_path, output))
+        return self.handles[target]
+
+    def write_all(self, content: str):
+        for handle in self.handles.values():
+            handle.write(content)
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+
+    def commit(self):
+        for temp_path, output in self.renames:
+            os.replace(temp_path, output)
+
+    def discard(self):
+        self.close()
+        for temp_path, _ in self.renames:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def split_file(file_name: str, files: TargetFiles):
+    """
+    Streams the report once, writing the failures of every target followed
+    by the summary table header and the target's summary rows to files
+    """
     print(f"parsing file: {file_name}")
-    target_info = defaultdict(list)
     with open(file_name, "r") as f:
         cur_target = None
-        while True:
-            line = f.readline()
+        for line in f:
             if line == "\n":
                 break
             if "===" in line and "Unexpected fails for" in line:
                 comps = line.strip().split(" ")
                 cur_target = f"{' '.join(comps[5:-1])}".strip()
-            target_info[cur_target].append(line)
+            if cur_target is not None:
+                files.get(cur_target).write(line)
         summary = f.readline() + f.readline() + f.readline()
-        for target in target_info.keys():
-            target_info[target].append("\n" + summary)
-        comps = None
-        prev_line = None
-        while True:
-            line = f.readline()
-            if not line:
-                break
+        files.write_all("\n" + summary)
+        # A summary row is followed by a line with its other args if it has any
+        row = None
+        row_target = None
+        for line in f:
+            if not line.strip():
+                continue
             if "/" not in line:
-                comps += [line.strip()]
-                target = " ".join(comps)
-                target_info[target].append(prev_line)
-                target_info[target].append(line)
-            prev_line = line
-            temp = line.split("|")[0].strip().split("/")
-            comps = [i.strip() for i in temp]
-            target = " ".join(comps)
-            print(target, target_info.keys())
-            if target in target_info.keys():
-                target_info[target].append(line)
-
-    return target_info
+                if row is not None:
+                    target = f"{row_target} {line.strip()}"
+                    files.get(target).write(row + line)
+                    row = None
+                continue
+            if row is not None and row_target in files:
+                files.get(row_target).write(row)
+            row = line
+            row_target = " ".join(
+                comp.strip() for comp in line.split("|")[0].strip().split("/")
+            )
+        if row is not None and row_target in files:
+            files.get(row_target).write(row)
 
 
 def write_file(file_name: str, outdir: str, multilib: str, indir: str = "./"):
-    targets = parse_file(os.path.join(indir, file_name))
     libc = "linux" if "linux" in file_name else "newlib"
     gcchash = file_name.split("-")[4]
-    print(targets.keys())
+    files = TargetFiles(outdir, libc, gcchash, multilib)
+    try:
+        split_file(os.path.join(indir, file_name), files)
+        files.close()
+    except Exception:
+        files.discard()
+        raise
 
     # need to remove file name otherwise the previous file may be used in
     # comparisons when we don't want it to
@@ -90,23 +169,32 @@ def write_file(file_name: str, outdir: str, multilib: str, indir: str = "./"):
         print(f"file {os.path.join(indir, file_name)} removed")
         os.remove(os.path.join(indir, file_name))
 
-    for target, content in targets.items():
-        comps = target.split(" ")
-        arch = comps[0]
-        abi = comps[1]
-        other_args = "_".join(comps[3:]) if len(comps) > 3 else None
-        fname = None
-        if other_args:
-            for k, v in nicknames.items():
-                other_args = other_args.replace(k, v)
-            fname = (
-                f"gcc-{libc}-{arch}-{abi}-{gcchash}-{other_args}-{multilib}-report.log"
-            )
-        else:
-            fname = f"gcc-{libc}-{arch}-{abi}-{gcchash}-{multilib}-report.log"
+    files.commit()
+
 
-        with open(f"{os.path.join(outdir, fname)}", "w") as f:
-            f.writelines(content)
+def write_files_in_pool(
+    files: List[str], outdir: str, multilib: str, indir: str, jobs: "int | None"
+):
+    """
+    write_file every file in worker processes. Outputs are staged in a
+    directory of their own and only moved to outdir once all workers are done,
+    since an output may be named like an input another worker still reads.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=outdir)
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            list(
+                executor.map(
+                    write_file, files, repeat(staging), repeat(multilib), repeat(indir)
+                )
+            )
+    finally:
+        # the inputs of finished workers are gone, keep their outputs
+        for output in os.listdir(staging):
+            if not output.startswith("."):
+                os.replace(os.path.join(staging, output), os.path.join(outdir, output))
+        shutil.rmtree(staging)
 
 
 def main():
@@ -116,10 +204,19 @@ def main():
     # Postfix everything to multilib for matching purposes
     multilib = "multilib"
     if args.directory_name is not None:
-        for file in os.listdir(args.directory_name):
-            if "failed" in file:  # failed_build.txt failed_testsuite.txt
-                continue
-            write_file(file, args.outdir, multilib, args.directory_name)
+        files = [
+            file
+            for file in os.listdir(args.directory_name)
+            # failed_build.txt failed_testsuite.txt and leftover temporary files
+            if "failed" not in file and not file.startswith(".")
+        ]
+        if args.jobs == 1 or len(files) <= 1:
+            for file in files:
+                write_file(file, args.outdir, multilib, args.directory_name)
+        else:
+            write_files_in_pool(
+                files, args.outdir, multilib, args.directory_name, args.jobs
+            )
     if args.file_name is not None:
         write_file(args.file_name, args.outdir, multilib)
 
@@ -0,0 +1,381 @@
+import argparse
+import os
+import sqlite3
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from compare_testsuite_log import (
+    LibName,
+    parse_failure_name,
+    parse_testsuite_failures,
+)
+
+TARGET_COLUMNS = ("libc", "arch", "abi", "model", "multilib", "other_args", "tool")
+Target = Tuple[str, str, str, str, int, str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS targets (
+    hash TEXT NOT NULL REFERENCES runs(hash),
+    libc TEXT NOT NULL,
+    arch TEXT NOT NULL,
+    abi TEXT NOT NULL,
+    model TEXT NOT NULL,
+    multilib INTEGER NOT NULL,
+    other_args TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    PRIMARY KEY (hash, libc, arch, abi, model, multilib, other_args, tool)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    hash TEXT NOT NULL REFERENCES runs(hash),
+    libc TEXT NOT NULL,
+    arch TEXT NOT NULL,
+    abi TEXT NOT NULL,
+    model TEXT NOT NULL,
+    multilib INTEGER NOT NULL,
+    other_args TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    test TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hash, libc, arch, abi, model, multilib, other_args, tool, test, status)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_test ON results (test, status);
+CREATE INDEX IF NOT EXISTS results_by_target ON results
+    (libc, arch, abi, model, multilib, other_args, tool, test);
+CREATE INDEX IF NOT EXISTS targets_by_target ON targets
+    (libc, arch, abi, model, multilib, other_args, tool);
+"""
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Testsuite result history store")
+    parser.add_argument(
+        "-db",
+        "--database",
+        default="./testsuite_history.sqlite",
+        metavar="<filename>",
+        type=str,
+        help="Path to the sqlite history database",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Store the report logs of a run")
+    ingest.add_argument(
+        "-hash", required=True, type=str, help="GCC hash the logs were generated at"
+    )
+    ingest.add_argument(
+        "-logdir",
+        default="./current_logs",
+        type=str,
+        help="Directory containing the filtered report logs of the run",
+    )
+    ingest.add_argument(
+        "-timestamp",
+        default=None,
+        type=str,
+        help="ISO 8601 time used to order the run. Defaults to now",
+    )
+
+    first = subparsers.add_parser("first", help="First hash where a test failed")
+    first.add_argument("test", type=str, help="Test name, e.g. gcc.dg/pr1.c")
+
+    failing = subparsers.add_parser("failing", help="Targets currently failing a test")
+    failing.add_argument("test", type=str, help="Test name, e.g. gcc.dg/pr1.c")
+
+    flaky = subparsers.add_parser("flaky", help="Tests that keep flipping state")
+    flaky.add_argument(
+        "-runs",
+        default=10,
+        type=int,
+        help="Number of most recent runs of each target to consider",
+    )
+    flaky.add_argument(
+        "-flips",
+        default=2,
+        type=int,
+        help="Minimum number of fail/pass transitions to be flaky",
+    )
+
+    baseline = subparsers.add_parser(
+        "baseline", help="Most recent of the given hashes that has been ingested"
+    )
+    baseline.add_argument("hashes", nargs="+", type=str, help="Hashes, newest first")
+    return parser.parse_args()
+
+
+def connect(database: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(database)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_summary_targets(log_path: str) -> List[Tuple[LibName, str]]:
+    """
+    Read the summary table of a report log. It lists every tested libname
+    even when it has no unexpected failures, which the failure sections
+    don't.
+    """
+    multilib = "non-multilib" not in log_path
+    targets: List[Tuple[LibName, str]] = []
+    with open(log_path, "r") as file:
+        for line in file:
+            if line.startswith("               ========= Summary of"):
+                break
+        # skip the first header line, the second one names the tools
+        file.readline()
+        tools = [tool.strip() for tool in file.readline().split("|")[1:-1]]
+        row: Optional[List[str]] = None
+        for line in file:
+            if "|" not in line:
+                # other args of the previous row
+                if row is not None:
+                    targets += summary_row_targets(row, tools, line.strip(), multilib)
+                    row = None
+                continue
+            if row is not None:
+                targets += summary_row_targets(row, tools, "", multilib)
+            row = line.split("|")
+        if row is not None:
+            targets += summary_row_targets(row, tools, "", multilib)
+    return targets
+
+
+def summary_row_targets(
+    row: List[str], tools: List[str], other_args: str, multilib: bool
+) -> List[Tuple[LibName, str]]:
+    arch, abi, model = [comp.strip() for comp in row[0].split("/")]
+    libname = LibName(arch, abi, model, multilib, other_args)
+    # tools that weren't run are marked with '-'
+    return [
+        (libname, tool)
+        for tool, cell in zip(tools, row[1:])
+        if cell.strip() not in ("", "-")
+    ]
+
+
+def to_target(libc: str, libname: LibName, tool: str) -> Target:
+    return (
+        libc,
+        libname.arch,
+        libname.abi,
+        libname.model,
+        int(libname.multilib),
+        libname.other_args,
+        tool,
+    )
+
+
+def report_logs(log_dir: str) -> Iterator[str]:
+    for file in sorted(os.listdir(log_dir)):
+        if "-" not in file or not file.endswith("-report.log"):
+            # failed_testsuite and failed_build check
+            continue
+        yield file
+
+
+def ingest_run(
+    conn: sqlite3.Connection, git_hash: str, log_dir: str, timestamp: "str | None"
+):
+    """Store every report log in log_dir as results of git_hash"""
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc).isoformat()
+    with conn:
+        conn.execute(
+            "INSERT INTO runs (hash, timestamp) VALUES (?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET timestamp = excluded.timestamp",
+            (git_hash, timestamp),
+        )
+        for file in report_logs(log_dir):
+            log_path = os.path.join(log_dir, file)
+            libc = file.split("-")[1]
+            targets = {
+                to_target(libc, libname, tool)
+                for libname, tool in parse_summary_targets(log_path)
+            }
+            counts: Dict[Tuple[Target, str, str], int] = Counter()
+            for description, lines in parse_testsuite_failures(log_path).items():
+                target = to_target(libc, description.libname, description.tool)
+                targets.add(target)
+                for line in lines:
+                    status = line.split(" ")[0].rstrip(":")
+                    counts[(target, parse_failure_name(line.strip()), status)] += 1
+            print(f"ingesting {file}: {len(targets)} targets, {len(counts)} results")
+            # re-ingesting a run replaces its previous results
+            conn.executemany(
+                "DELETE FROM results WHERE hash = ? AND libc = ? AND arch = ? "
+                "AND abi = ? AND model = ? AND multilib = ? AND other_args = ? "
+                "AND tool = ?",
+                [(git_hash, *target) for target in targets],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO targets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(git_hash, *target) for target in targets],
+            )
+            conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (git_hash, *target, test, status, count)
+                    for (target, test, status), count in counts.items()
+                ],
+            )
+
+
+def first_failure(conn: sqlite3.Connection, test: str) -> Dict[Target, str]:
+    """Earliest ingested hash each target failed test at"""
+    rows = conn.execute(
+        f"""
+        SELECT {', '.join(f'results.{column}' for column in TARGET_COLUMNS)}, runs.hash
+        FROM results JOIN runs ON runs.hash = results.hash
+        WHERE results.test = ?
+        ORDER BY runs.timestamp DESC, runs.id DESC
+        """,
+        (test,),
+    )
+    first: Dict[Target, str] = {}
+    for row in rows:
+        # rows are newest first so the last assignment wins
+        first[tuple(row[:-1])] = row[-1]
+    return first
+
+
+def currently_failing(conn: sqlite3.Connection, test: str) -> Dict[Target, List[str]]:
+    """Targets failing test in the most recent run that tested them"""
+    rows = conn.execute(
+        f"""
+        WITH latest AS (
+            SELECT {', '.join(f'targets.{column}' for column in TARGET_COLUMNS)},
+                   targets.hash,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {', '.join(f'targets.{column}' for column in TARGET_COLUMNS)}
+                       ORDER BY runs.timestamp DESC, runs.id DESC
+                   ) AS age
+            FROM targets JOIN runs ON runs.hash = targets.hash
+        )
+        SELECT {', '.join(f'latest.{column}' for column in TARGET_COLUMNS)},
+               latest.hash, results.status
+        FROM latest JOIN results USING
+            (hash, {', '.join(TARGET_COLUMNS)})
+        WHERE latest.age = 1 AND results.test = ?
+        """,
+        (test,),
+    )
+    failing: Dict[Target, List[str]] = defaultdict(list)
+    for row in rows:
+        failing[tuple(row[:-2])].append(f"{row[-1]} at {row[-2]}")
+    return failing
+
+
+def flaky_tests(
+    conn: sqlite3.Connection, runs: int, flips: int
+) -> Dict[Tuple[Target, str], int]:
+    """
+    Tests that went from failing to passing or back at least flips times
+    within the last runs runs of a target
+    """
+    recent = conn.execute(
+        f"""
+        SELECT {', '.join(TARGET_COLUMNS)}, hash FROM (
+            SELECT {', '.join(f'targets.{column}' for column in TARGET_COLUMNS)},
+                   targets.hash,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {', '.join(f'targets.{column}' for column in TARGET_COLUMNS)}
+                       ORDER BY runs.timestamp DESC, runs.id DESC
+                   ) AS age
+            FROM targets JOIN runs ON runs.hash = targets.hash
+        ) WHERE age <= ? ORDER BY age DESC
+        """,
+        (runs,),
+    )
+    # oldest to newest runs of each target
+    target_runs: Dict[Target, List[str]] = defaultdict(list)
+    for row in recent:
+        target_runs[tuple(row[:-1])].append(row[-1])
+
+    result: Dict[Tuple[Target, str], int] = {}
+    for target, hashes in target_runs.items():
+        if len(hashes) <= flips:
+            continue
+        failed_at: Dict[str, set] = defaultdict(set)
+        rows = conn.execute(
+            f"""
+            SELECT test, hash FROM results
+            WHERE {' AND '.join(f'{column} = ?' for column in TARGET_COLUMNS)}
+            AND hash IN ({', '.join('?' for _ in hashes)})
+            """,
+            (*target, *hashes),
+        )
+        for test, git_hash in rows:
+            failed_at[test].add(git_hash)
+        for test, failed_hashes in failed_at.items():
+            states = [git_hash in failed_hashes for git_hash in hashes]
+            transitions = sum(1 for a, b in zip(states, states[1:]) if a != b)
+            if transitions >= flips:
+                result[(target, test)] = transitions
+    return result
+
+
+def baseline_hash(conn: sqlite3.Connection, hashes: List[str]) -> "str | None":
+    """First of the given hashes with an ingested run"""
+    ingested = {
+        row[0]
+        for row in conn.execute(
+            f"SELECT hash FROM runs WHERE hash IN ({', '.join('?' for _ in hashes)})",
+            hashes,
+        )
+    }
+    for git_hash in hashes:
+        if git_hash in ingested:
+            return git_hash
+    return None
+
+
+def format_target(target: Target) -> str:
+    libc, arch, abi, model, multilib, other_args, tool = target
+    return " ".join(
+        part
+        for part in (
+            f"{tool}:",
+            libc,
+            arch,
+            abi,
+            model,
+            "multilib" if multilib else "non-multilib",
+            other_args,
+        )
+        if part
+    )
+
+
+def main():
+    args = parse_arguments()
+    conn = connect(args.database)
+    if args.command == "ingest":
+        ingest_run(conn, args.hash, args.logdir, args.timestamp)
+    elif args.command == "first":
+        for target, git_hash in sorted(first_failure(conn, args.test).items()):
+            print(f"{format_target(target)}|{git_hash}")
+    elif args.command == "failing":
+        for target, statuses in sorted(currently_failing(conn, args.test).items()):
+            print(f"{format_target(target)}|{';'.join(statuses)}")
+    elif args.command == "flaky":
+        flaky = flaky_tests(conn, args.runs, args.flips)
+        for (target, test), transitions in sorted(flaky.items()):
+            print(f"{format_target(target)}|{test}|{transitions} transitions")
+    elif args.command == "baseline":
+        git_hash = baseline_hash(conn, args.hashes)
+        if git_hash is None:
+            print("No valid hash")
+        else:
+            print(git_hash)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
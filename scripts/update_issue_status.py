@@ -1,8 +1,8 @@
-import requests
 import argparse
-import json
 from typing import Dict, List, Set
 
+from github_client import API_URL, get_client
+
 
 def parse_arguments():
     """parse command line arguments"""
@@ -58,15 +58,10 @@ def parse_arguments():
 
 
 def get_comment(token: str, comment: str, check: str, repo: str):
-    params = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"token {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    url = f"https://api.github.com/repos/{repo}/issues/comments/{comment}"
-    r = requests.get(url, params)
+    url = f"{API_URL}/repos/{repo}/issues/comments/{comment}"
+    r = get_client(token).get(url)
     print(f"status code: {r.status_code}")
-    found_comment = json.loads(r.text)
+    found_comment = r.json()
     if "body" not in found_comment.keys():
         print(f"Can't find comment body. api returned: {found_comment}")
     return found_comment
@@ -0,0 +1,196 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import shutil
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+import aggregate
+from aggregate import FailureIndex, additional_failures_to_markdown, aggregate_summary, build_summary, classify_failure, get_common_intersection, get_pending_targets, iter_bits, load_result, results_path, summarize_file, summarize_files, to_bitmap, update_state
+from compare_testsuite_log import compare_logs, sidecar_path
+
+SUMMARY_TABLE = '''
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+     rv64gc/  lp64d/ medlow |    2 /     2 |    1 /     1 |    0 /     0 |
+'''
+
+@pytest.fixture
+def previous_log_string()->str:
+    return '''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr1.c execution test
+FAIL: gcc.dg/pr2.c (test for excess errors)
+FAIL: gcc.dg/pr4.c scan-assembler-times vsetvli 1
+\t\t=== g++: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: g++.dg/pr3.C  -std=gnu++14 execution test
+''' + SUMMARY_TABLE
+
+@pytest.fixture
+def current_log_string()->str:
+    return '''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr2.c (test for excess errors)
+FAIL: gcc.dg/pr4.c scan-assembler-times vsetvli 1
+FAIL: gcc.dg/pr5.c (internal compiler error: Segmentation fault)
+\t\t=== g++: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: g++.dg/pr3.C  -std=gnu++14 execution test
+''' + SUMMARY_TABLE
+
+@pytest.fixture
+def summary(previous_log_string, current_log_string):
+    tmp_dir = TemporaryDirectory()
+    previous_log = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-aaa-multilib-report.log")
+    current_log = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-bbb-multilib-report.log")
+    with open(previous_log, "w") as f:
+        f.write(previous_log_string)
+    with open(current_log, "w") as f:
+        f.write(current_log_string)
+    output = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-bbb-multilib-report-summary.md")
+    compare_logs("aaa", previous_log, "bbb", current_log, output, True, "")
+    yield output
+    tmp_dir.cleanup()
+
+
+def empty_failures():
+    return {"Resolved": [], "Remaining Preexisting": [], "New": []}
+
+def test_sidecar_matches_markdown(summary):
+    assert(os.path.exists(sidecar_path(summary)))
+    from_sidecar = aggregate_summary(empty_failures(), summary)
+    os.remove(sidecar_path(summary))
+    from_markdown = aggregate_summary(empty_failures(), summary)
+    assert(from_sidecar == from_markdown)
+
+def test_aggregate_summary(summary):
+    failures, resolved, unresolved, new, categories = aggregate_summary(empty_failures(), summary)
+    target = "rv64gc lp64d medlow multilib"
+    assert(failures["New"][0].startswith("|linux: rv64gc lp64d medlow multilib |1/1|0/0|0/0|"))
+    assert(resolved[target] == {"FAIL: gcc.dg/pr1.c execution test\n"})
+    # only important preexisting failures are kept
+    assert(unresolved[target] == {"FAIL: gcc.dg/pr2.c (test for excess errors)\n", "FAIL: g++.dg/pr3.C  -std=gnu++14 execution test\n"})
+    assert(new[target] == {"FAIL: gcc.dg/pr5.c (internal compiler error: Segmentation fault)\n"})
+    assert(categories[target] == {"excess-errors": 1, "execution": 1, "other": 1})
+
+@pytest.mark.parametrize("line, category", [
+    ("FAIL: gcc.dg/pr5.c (internal compiler error: Segmentation fault)\n", "internal-compiler-error"),
+    ("FAIL: gcc.dg/pr5.c (test for excess errors) Segmentation fault\n", "segmentation-fault"),
+    ("FAIL: gcc.dg/pr2.c (test for excess errors)\n", "excess-errors"),
+    ("FAIL: gcc.c-torture/execute/pr1.c   -O2  execution test\n", "execution"),
+    ("FAIL: gcc.dg/torture/pr1.c   -O2  execute \n", "execution"),
+    ("FAIL: gcc.dg/pr6.c compilation failed to produce executable\n", "link"),
+    ("WARNING: program timed out.\n", "timeout"),
+    ("UNRESOLVED: gcc.dg/pr7.c scan-assembler vsetvli\n", "unresolved"),
+    ("FAIL: gcc.dg/pr4.c scan-assembler-times vsetvli 1\n", "other"),
+])
+def test_classify_failure(line, category):
+    assert(classify_failure(line) == category)
+
+def test_summarize_files_in_workers(summary):
+    serial = list(summarize_files([summary, summary], jobs=1))
+    assert(list(summarize_files([summary, summary], jobs=2)) == serial)
+    assert(serial[0] == (summary, summarize_file(summary)))
+
+def test_update_state_only_ingests_changes(summary, monkeypatch):
+    with TemporaryDirectory() as summaries_dir, TemporaryDirectory() as results_dir:
+        monkeypatch.setattr(aggregate, "SUMMARIES", summaries_dir)
+        shutil.copy(summary, summaries_dir)
+        shutil.copy(sidecar_path(summary), summaries_dir)
+        file = os.path.basename(summary)
+        summaries = {}
+        assert(update_state(summaries, results_dir, jobs=1))
+        assert(list(summaries) == [file])
+        assert(not update_state(summaries, results_dir, jobs=1))
+        os.remove(os.path.join(summaries_dir, file))
+        assert(update_state(summaries, results_dir, jobs=1))
+        assert(summaries == {})
+        assert(os.listdir(results_dir) == [])
+
+# Only counts are kept in the state, the results are read back from disk
+def test_update_state_writes_results(summary, monkeypatch):
+    with TemporaryDirectory() as summaries_dir, TemporaryDirectory() as results_dir:
+        monkeypatch.setattr(aggregate, "SUMMARIES", summaries_dir)
+        shutil.copy(summary, summaries_dir)
+        shutil.copy(sidecar_path(summary), summaries_dir)
+        file = os.path.basename(summary)
+        summaries = {}
+        assert(update_state(summaries, results_dir, jobs=1))
+        assert(summaries[file]["counts"] == {"targets": 1, "resolved": 1, "new": 1})
+        rows, resolved, unresolved, new, categories = load_result(results_dir, file)
+        assert(resolved == {target: list(failures) for target, failures in summarize_file(summary)[1].items()})
+        # a lost result is ingested again
+        os.remove(results_path(results_dir, file))
+        assert(update_state(summaries, results_dir, jobs=1))
+        assert(os.path.exists(results_path(results_dir, file)))
+
+@pytest.mark.parametrize("failure_file, line", [
+    # written by compare_all_artifacts when the comparison fails
+    ("failed_testsuite.txt", "checking_gcc-linux-rv64gcv_zicond-lp64d-abc-multilib-report.log|Invalid Path: previous_logs/x\n"),
+    # written by download_artifacts when the testsuite or build artifact is missing
+    ("failed_testsuite.txt", "checking_gcc-linux-rv64gcv_zicond-lp64d-abc-multilib|Cannot find testsuite artifact. Likely caused by testsuite timeout.\n"),
+    ("failed_build.txt", "checking_gcc-linux-rv64gcv_zicond-lp64d-abc-multilib|Check logs\n"),
+])
+def test_failed_targets_are_not_pending(failure_file, line, monkeypatch):
+    with TemporaryDirectory() as summaries_dir, TemporaryDirectory() as failures_dir:
+        monkeypatch.setattr(aggregate, "SUMMARIES", summaries_dir)
+        monkeypatch.setattr(aggregate, "FAILURES", failures_dir)
+        assert(get_pending_targets("checking_", "abc") == ["checking_gcc-linux-rv64gcv_zicond-lp64d-abc-multilib"])
+        with open(os.path.join(failures_dir, failure_file), "w") as f:
+            f.write(line)
+        assert(get_pending_targets("checking_", "abc") == [])
+
+def test_summarized_targets_are_not_pending(monkeypatch):
+    with TemporaryDirectory() as summaries_dir, TemporaryDirectory() as failures_dir:
+        monkeypatch.setattr(aggregate, "SUMMARIES", summaries_dir)
+        monkeypatch.setattr(aggregate, "FAILURES", failures_dir)
+        open(os.path.join(summaries_dir, "checking_gcc-linux-rv64gcv_zicond-lp64d-abc-multilib-report-summary.md"), "w").close()
+        assert(get_pending_targets("checking_", "abc") == [])
+
+# Sections are keyed by the failure name without the trailing "Failures"
+def test_build_summary():
+    failures = {"New": ["|new|\n"], "Resolved": [], "Remaining Preexisting": ["|b|\n", "|a|\n"]}
+    assert(build_summary(failures, "New Failures") == "|New Failures|gcc|g++|gfortran|Previous Hash|\n|---|---|---|---|---|\n|new|\n\n")
+    assert(build_summary(failures, "Remaining Preexisting Failures").endswith("|---|---|---|---|---|\n|a|\n|b|\n\n"))
+
+def test_bitmap_round_trip():
+    ids = [0, 3, 7, 8, 64, 1000]
+    assert(list(iter_bits(to_bitmap(ids))) == ids)
+    assert(list(iter_bits(0)) == [])
+
+@pytest.fixture
+def failure_index()->FailureIndex:
+    index = FailureIndex()
+    index.add("gcc-linux-rv64gcv-lp64d-a-multilib-report-summary.md", "rv64gcv lp64d medlow multilib", ["FAIL: common\n", "FAIL: shared\n", "FAIL: only64\n"])
+    index.add("gcc-linux-rv32gcv-ilp32d-a-multilib-report-summary.md", "rv32gcv ilp32d medlow multilib", ["FAIL: common\n", "FAIL: shared\n"])
+    index.add("gcc-newlib-rv64gc-lp64d-a-multilib-report-summary.md", "rv64gc lp64d medlow multilib", ["FAIL: common\n"])
+    index.add("gcc-newlib-rv32gc-ilp32d-a-multilib-report-summary.md", "rv32gc ilp32d medlow multilib", [])
+    return index
+
+def test_failure_index(failure_index):
+    # targets without failures are not affected targets
+    assert(len(failure_index.targets) == 3)
+    intersect, num_targets = get_common_intersection(failure_index)
+    assert(num_targets == 3)
+    assert(failure_index.failures(intersect) == ["FAIL: common\n"])
+    signatures = failure_index.signatures(exclude=intersect)
+    assert({mask: failure_index.failures(failures) for mask, failures in signatures.items()} == {0b011: ["FAIL: shared\n"], 0b001: ["FAIL: only64\n"]})
+
+def test_additional_failures_to_markdown(failure_index):
+    markdown = additional_failures_to_markdown("New", failure_index, 4)
+    assert(markdown == '''## New Failures Across All Affected Targets (3 targets / 4 total targets)
+```
+FAIL: common
+```
+## Architecture Specific New Failures
+linux rv64gcv lp64d medlow multilib:
+```
+FAIL: only64
+```
+## New Failures Shared By Multiple Targets
+linux rv64gcv lp64d medlow multilib, linux rv32gcv ilp32d medlow multilib:
+```
+FAIL: shared
+```
+
+''')
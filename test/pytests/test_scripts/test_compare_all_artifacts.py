@@ -0,0 +1,87 @@
+from pathlib import Path
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+import compare_all_artifacts
+from compare_all_artifacts import compare_all_artifacts as compare_all
+
+LOG = '''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr{}.c execution test
+
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+     rv64gc/  lp64d/ medlow |    1 /     1 |    0 /     0 |    0 /     0 |
+'''
+
+CURRENT_LOG = "current_logs/gcc-linux-rv64gc-lp64d-bbb-multilib-report.log"
+SUMMARY = "summaries/gcc-linux-rv64gc-lp64d-bbb-multilib-report-summary.md"
+
+@pytest.fixture
+def comparisons(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for directory in ("current_logs", "previous_logs", "summaries"):
+        os.mkdir(directory)
+    with open("previous_logs/gcc-linux-rv64gc-lp64d-aaa-multilib-report.log", "w") as f:
+        f.write(LOG.format(1))
+    with open(CURRENT_LOG, "w") as f:
+        f.write(LOG.format(2))
+    compared = []
+    compare_logs = compare_all_artifacts.compare_logs
+    def counting_compare_logs(*args):
+        compared.append(os.path.basename(args[4]))
+        compare_logs(*args)
+    monkeypatch.setattr(compare_all_artifacts, "compare_logs", counting_compare_logs)
+    return compared
+
+def test_unchanged_summaries_are_skipped(comparisons):
+    compare_all("bbb", True, "")
+    assert(comparisons == [os.path.basename(SUMMARY)])
+    assert(os.path.exists(SUMMARY))
+    compare_all("bbb", True, "")
+    assert(len(comparisons) == 1)
+
+def test_changed_log_is_compared_again(comparisons):
+    compare_all("bbb", True, "")
+    with open(CURRENT_LOG, "w") as f:
+        f.write(LOG.format(3))
+    compare_all("bbb", True, "")
+    assert(len(comparisons) == 2)
+
+def test_changed_arguments_are_compared_again(comparisons):
+    compare_all("bbb", True, "")
+    compare_all("bbb", False, "")
+    assert(len(comparisons) == 2)
+
+def test_missing_summary_is_compared_again(comparisons):
+    compare_all("bbb", True, "")
+    os.remove(SUMMARY)
+    compare_all("bbb", True, "")
+    assert(len(comparisons) == 2)
+
+def test_force_compares_again(comparisons):
+    compare_all("bbb", True, "")
+    compare_all("bbb", True, "", force=True)
+    assert(len(comparisons) == 2)
+
+# Summaries of another version of the comparison code are regenerated
+def test_changed_comparison_is_compared_again(comparisons, monkeypatch):
+    compare_all("bbb", True, "")
+    monkeypatch.setattr(compare_all_artifacts, "COMPARE_DIGEST", "changed")
+    compare_all("bbb", True, "")
+    assert(len(comparisons) == 2)
+
+# Every module that shapes the summaries is part of the digest
+def test_compare_digest_covers_modules(tmp_path, monkeypatch):
+    for module in ["compare_testsuite_log.py", "compare_glibc_log.py", "aggregate.py"]:
+        assert(module in compare_all_artifacts.COMPARE_MODULES)
+    assert(compare_all_artifacts.compare_digest() == compare_all_artifacts.COMPARE_DIGEST)
+    modules = [tmp_path / "a.py", tmp_path / "b.py"]
+    for module in modules:
+        module.write_text("")
+    digest = compare_all_artifacts.compare_digest(tuple(str(module) for module in modules))
+    modules[1].write_text("changed = True\n")
+    assert(compare_all_artifacts.compare_digest(tuple(str(module) for module in modules)) != digest)
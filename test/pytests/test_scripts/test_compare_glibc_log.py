@@ -0,0 +1,115 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from zipfile import ZipFile
+import io
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+import compare_glibc_log
+from compare_glibc_log import LibName, compare_testsuite_log, load_all_testsuite_logs, load_testsuite_log, parse_testsuite_log_from_stream
+from download_artifact import open_artifact_member
+
+SUMMARY_HEADER = '''
+               ========= Summary of glibc testsuite =========
+                            | # of unexpected case
+                            |        glibc |
+'''
+
+@pytest.fixture
+def previous_log_string()->str:
+    return '''\t\t=== glibc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: elf/tst-a
+FAIL: math/test-b
+\t\t=== glibc: Unexpected fails for rv32gc ilp32d medlow  ===
+FAIL: nptl/tst-c
+\t\t=== glibc: Unexpected fails for rv64gcv lp64d medlow  ===
+FAIL: string/tst-d
+''' + SUMMARY_HEADER + '''     rv64gc/  lp64d/ medlow |            2 |
+     rv32gc/ ilp32d/ medlow |            1 |
+    rv64gcv/  lp64d/ medlow |            1 |
+'''
+
+@pytest.fixture
+def current_log_string()->str:
+    return '''\t\t=== glibc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: math/test-b
+FAIL: elf/tst-e
+\t\t=== glibc: Unexpected fails for rv32gcv ilp32d medlow  ===
+FAIL: string/tst-f
+''' + SUMMARY_HEADER + '''     rv64gc/  lp64d/ medlow |            2 |
+     rv32gc/ ilp32d/ medlow |            0 |
+    rv32gcv/ ilp32d/ medlow |            1 |
+'''
+
+@pytest.fixture
+def logs(previous_log_string, current_log_string):
+    tmp_dir = TemporaryDirectory()
+    previous_log = os.path.join(tmp_dir.name, "previous-report.log")
+    current_log = os.path.join(tmp_dir.name, "current-report.log")
+    with open(previous_log, "w") as f:
+        f.write(previous_log_string)
+    with open(current_log, "w") as f:
+        f.write(current_log_string)
+    yield previous_log, current_log
+    tmp_dir.cleanup()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compare_multiple_targets(logs, jobs):
+    previous_log, current_log = logs
+    failures = compare_testsuite_log(previous_log, current_log, jobs=jobs)
+    rv64gc = LibName("rv64gc", "lp64d", "medlow")
+    rv32gc = LibName("rv32gc", "ilp32d", "medlow")
+    rv64gcv = LibName("rv64gcv", "lp64d", "medlow")
+    rv32gcv = LibName("rv32gcv", "ilp32d", "medlow")
+    assert(failures.resolved[rv64gc].fails == ["FAIL: elf/tst-a"])
+    assert(failures.unresolved[rv64gc].fails == ["FAIL: math/test-b"])
+    assert(failures.new[rv64gc].fails == ["FAIL: elf/tst-e"])
+    # rv32gc was tested in the current log without failures
+    assert(failures.resolved[rv32gc].fails == ["FAIL: nptl/tst-c"])
+    # rv64gcv and rv32gcv only exist on one side
+    assert(failures.unresolved[rv64gcv].fails == ["FAIL: string/tst-d"])
+    assert(failures.unresolved[rv32gcv].fails == ["FAIL: string/tst-f"])
+    assert(rv32gcv not in failures.new)
+
+def test_compare_split_logs(logs):
+    # the same comparison with the previous targets split across files
+    previous_log, current_log = logs
+    with open(previous_log, "r") as f:
+        lines = f.readlines()
+    split_log = previous_log.replace("previous", "split")
+    with open(split_log, "w") as f:
+        f.writelines(lines[:3] + [SUMMARY_HEADER] + [lines[-3]])
+    with open(previous_log, "w") as f:
+        f.writelines(lines[3:7] + [SUMMARY_HEADER] + lines[-2:])
+    failures = compare_testsuite_log([split_log, previous_log], current_log, jobs=1)
+    rv64gc = LibName("rv64gc", "lp64d", "medlow")
+    assert(failures.resolved[rv64gc].fails == ["FAIL: elf/tst-a"])
+    assert(failures.new[rv64gc].fails == ["FAIL: elf/tst-e"])
+
+# The pool never has more workers than logs and one log is parsed in-process
+def test_load_all_logs_pool_size(logs, monkeypatch):
+    pools = []
+    class Pool(compare_glibc_log.ProcessPoolExecutor):
+        def __init__(self, max_workers):
+            pools.append(max_workers)
+            super().__init__(max_workers=max_workers)
+    monkeypatch.setattr(compare_glibc_log, "ProcessPoolExecutor", Pool)
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    previous_log, current_log = logs
+    assert(load_all_testsuite_logs([previous_log, current_log]) == [load_testsuite_log(previous_log), load_testsuite_log(current_log)])
+    assert(load_all_testsuite_logs([previous_log], jobs=8) == [load_testsuite_log(previous_log)])
+    assert(pools == [2])
+
+# A report log is parsed straight out of an artifact zip held in memory
+def test_parse_log_from_artifact_member(logs, previous_log_string):
+    previous_log, _ = logs
+    name = "glibc-linux-rv64gc-lp64d-abc-multilib-report.log"
+    artifact_zip = io.BytesIO()
+    with ZipFile(artifact_zip, "w") as zf:
+        zf.writestr(name, previous_log_string)
+    with open_artifact_member(artifact_zip, name, name) as f:
+        assert(parse_testsuite_log_from_stream(f) == load_testsuite_log(previous_log))
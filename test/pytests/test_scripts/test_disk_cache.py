@@ -0,0 +1,66 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+from disk_cache import DiskCache
+from compare_testsuite_log import load_testsuite_failures, parse_testsuite_failures
+
+@pytest.fixture
+def report_log_string()->str:
+    return '''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr1.c execution test
+FAIL: gcc.dg/pr2.c (test for excess errors)
+\t\t=== g++: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: g++.dg/pr3.C  -std=gnu++14 execution test
+
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+     rv64gc/  lp64d/ medlow |    2 /     2 |    1 /     1 |    0 /     0 |
+'''
+
+@pytest.fixture
+def cache_dir():
+    tmp_dir = TemporaryDirectory()
+    yield tmp_dir.name
+    tmp_dir.cleanup()
+
+
+def test_object_round_trip(cache_dir):
+    cache = DiskCache(cache_dir)
+    assert(cache.get_object("missing") is None)
+    cache.put_object("key", [(("gcc", "rv64gc"), ["FAIL: a\n"])])
+    assert(cache.get_object("key") == [(("gcc", "rv64gc"), ["FAIL: a\n"])])
+
+def test_lru_eviction(cache_dir):
+    cache = DiskCache(cache_dir, max_bytes=250)
+    cache.put_bytes("a", b"a" * 100)
+    cache.put_bytes("b", b"b" * 100)
+    # make "a" the least recently used entry
+    os.utime(cache.path_for("a"), (0, 0))
+    assert(cache.get_bytes("b") is not None)
+    cache.put_bytes("c", b"c" * 100)
+    assert(cache.get_bytes("a") is None)
+    assert(cache.get_bytes("b") == b"b" * 100)
+    assert(cache.get_bytes("c") == b"c" * 100)
+
+def test_cached_testsuite_failures(cache_dir, report_log_string):
+    with TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "gcc-linux-rv64gc-lp64d-abc-multilib-report.log")
+        with open(log_path, "w") as f:
+            f.write(report_log_string)
+        cache = DiskCache(cache_dir)
+        expected = parse_testsuite_failures(log_path)
+        # first load populates the cache, the second one is served from it
+        assert(load_testsuite_failures(log_path, cache) == expected)
+        assert(len(os.listdir(cache_dir)) == 1)
+        os.remove(log_path)
+        renamed_path = os.path.join(tmp, "gcc-linux-rv64gc-lp64d-def-multilib-report.log")
+        with open(renamed_path, "w") as f:
+            f.write(report_log_string)
+        assert(load_testsuite_failures(renamed_path, cache) == expected)
+        assert(len(os.listdir(cache_dir)) == 1)
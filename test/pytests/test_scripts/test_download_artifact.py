@@ -1,10 +1,23 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from zipfile import ZIP_STORED, ZipFile
+import hashlib
+import io
+import os
+import pytest
 import sys
 
 scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
 sys.path.append(str(scripts_path))
-from download_artifact import extract_artifact
+from disk_cache import DiskCache
+import download_artifact as download_artifact_module
+import github_client
+from compare_testsuite_log import parse_testsuite_failures, parse_testsuite_failures_from_stream
+from download_artifact import ArtifactIndex, artifact_cache_key, artifact_digest_key, download_artifact, extract_artifact, open_artifact_member
 
 # Test Zipfile with a single file
 def test_extract_artifact_1():
@@ -32,3 +45,262 @@ def test_extract_artifact_3():
         extracted_files = [file for file in Path(tmp).iterdir()]
         assert(len(extracted_files) == 1)
         assert(Path(extracted_files[0]).name == "test1.zip")
+
+REPORT_NAME = "gcc-linux-rv64gc-lp64d-abc-multilib-report.log"
+REPORT_LOG = '''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr1.c execution test
+
+'''
+
+@pytest.fixture
+def report_artifact():
+    tmp_dir = TemporaryDirectory()
+    artifact_zip = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-abc-multilib-report.zip")
+    with ZipFile(artifact_zip, "w") as zf:
+        zf.writestr(REPORT_NAME, REPORT_LOG)
+        zf.writestr("logs/other.log", "other")
+    yield artifact_zip
+    tmp_dir.cleanup()
+
+# Only the selected members are extracted
+def test_extract_artifact_members(report_artifact):
+    with TemporaryDirectory() as tmp:
+        extract_artifact(report_artifact, tmp, members=[REPORT_NAME])
+        assert([file.name for file in Path(tmp).iterdir()] == [REPORT_NAME])
+        with pytest.raises(ValueError):
+            extract_artifact(report_artifact, tmp, members=["missing.log"])
+
+def test_extract_artifact_unsafe_path():
+    with TemporaryDirectory() as tmp:
+        artifact_zip = os.path.join(tmp, "unsafe.zip")
+        with ZipFile(artifact_zip, "w") as zf:
+            zf.writestr("../escaped.log", "escaped")
+        with pytest.raises(ValueError):
+            extract_artifact(artifact_zip, os.path.join(tmp, "out"))
+        assert(not os.path.exists(os.path.join(tmp, "escaped.log")))
+
+# Parsing a member stream matches parsing the extracted log
+def test_open_artifact_member(report_artifact):
+    with open(report_artifact, "rb") as f:
+        artifact_zip = io.BytesIO(f.read())
+    # nested in a directory named after the artifact
+    nested_zip = io.BytesIO()
+    with ZipFile(nested_zip, "w") as zf:
+        zf.writestr(f"gcc-linux-rv64gc-lp64d-abc-multilib-report/{REPORT_NAME}", REPORT_LOG)
+    for zip_file in (artifact_zip, nested_zip):
+        with open_artifact_member(zip_file, REPORT_NAME, REPORT_NAME) as f:
+            failures = parse_testsuite_failures_from_stream(f, True)
+        with TemporaryDirectory() as tmp:
+            extract_artifact(report_artifact, tmp)
+            assert(failures == parse_testsuite_failures(os.path.join(tmp, REPORT_NAME)))
+    assert(len(next(iter(failures.values()))) == 1)
+
+def put_cached_artifact(cache, artifact_id, artifact_name, data):
+    key = artifact_cache_key(artifact_id, artifact_name)
+    cache.put_bytes(key, data)
+    cache.put_bytes(artifact_digest_key(key), hashlib.sha256(data).hexdigest().encode("ascii"))
+
+# Cached artifacts are extracted from the cache without being downloaded
+def test_download_cached_artifact():
+    fixture_file = Path(__file__).parent.parent / "fixtures" / "test2.zip"
+    with TemporaryDirectory() as tmp:
+        cache = DiskCache(os.path.join(tmp, "cache"))
+        put_cached_artifact(cache, "42", "test2", fixture_file.read_bytes())
+        artifact_zip = download_artifact("test2", "42", "token", "repo", os.path.join(tmp, "download"), cache=cache)
+        assert(artifact_zip == os.path.join(tmp, "download", "test2"))
+        # the zip outlives the cache entry
+        cache.max_bytes = 0
+        cache.evict()
+        assert(cache.get_path(artifact_cache_key("42", "test2")) is None)
+        outdir = os.path.join(tmp, "out")
+        extract_artifact(artifact_zip, outdir, "test2")
+        extracted_files = [file for file in Path(outdir).iterdir()]
+        assert(len(extracted_files) == 1)
+        assert(Path(extracted_files[0]).name == "test.log")
+
+@dataclass
+class FakeArtifact:
+    id: int
+    name: str
+    expired: bool
+    expires_at: datetime
+
+class FakeGithub:
+    def __init__(self, artifacts):
+        self.artifacts = artifacts
+        self.listed = 0
+
+    def get_repo(self, repo_name):
+        return self
+
+    def get_artifacts(self):
+        # newest first like the API
+        for artifact in sorted(self.artifacts, key=lambda artifact: -artifact.id):
+            self.listed += 1
+            yield artifact
+
+def test_artifact_index():
+    later = datetime.now(timezone.utc) + timedelta(days=1)
+    earlier = datetime.now(timezone.utc) - timedelta(days=1)
+    github = FakeGithub([
+        FakeArtifact(1, "a-report", False, later),
+        FakeArtifact(2, "a-report", False, later),
+        FakeArtifact(3, "b-report", True, earlier),
+    ])
+    with TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "index.json")
+        index = ArtifactIndex("repo", "token", index_path, github)
+        index.sync()
+        assert(index.lookup("a-report") == "2")
+        assert(index.lookup("b-report") is None)
+        # only the artifacts created since the last sync are listed again
+        github.artifacts.append(FakeArtifact(4, "c-report", False, later))
+        github.listed = 0
+        index = ArtifactIndex("repo", "token", index_path, github)
+        index.sync()
+        assert(github.listed == 2)
+        assert(index.lookup("a-report") == "2")
+        assert(index.lookup("c-report") == "4")
+
+CHUNK_SIZE = download_artifact_module.DOWNLOAD_CHUNK_SIZE
+
+def make_artifact()->bytes:
+    artifact = io.BytesIO()
+    with ZipFile(artifact, "w", ZIP_STORED) as zf:
+        zf.writestr("test.log", bytes(range(256)) * (3 * CHUNK_SIZE // 256))
+    return artifact.getvalue()
+
+ARTIFACT = make_artifact()
+
+class ArtifactHandler(BaseHTTPRequestHandler):
+    # how to answer range requests: "resume", "corrupt" or a status code rejecting them
+    range_response = "resume"
+    # status of every response if set
+    status = None
+    interrupt = True
+    ranges = []
+    if_ranges = []
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        ArtifactHandler.ranges.append(range_header)
+        ArtifactHandler.if_ranges.append(self.headers.get("If-Range"))
+        status = ArtifactHandler.status
+        if status is None and range_header is not None and ArtifactHandler.range_response not in ("resume", "corrupt"):
+            status = ArtifactHandler.range_response
+        if status is not None:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = int(range_header[len("bytes="):-1]) if range_header else 0
+        self.send_response(206 if range_header else 200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(ARTIFACT) - start))
+        self.end_headers()
+        if ArtifactHandler.interrupt:
+            # drop the connection half way through the second chunk
+            ArtifactHandler.interrupt = False
+            self.wfile.write(ARTIFACT[start:CHUNK_SIZE * 3 // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        if range_header is not None and ArtifactHandler.range_response == "corrupt":
+            self.wfile.write(b"\xff" * (len(ARTIFACT) - start))
+            return
+        self.wfile.write(ARTIFACT[start:])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def artifact_server(monkeypatch):
+    monkeypatch.setattr(download_artifact_module.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(github_client.time, "sleep", lambda seconds: None)
+    ArtifactHandler.range_response = "resume"
+    ArtifactHandler.status = None
+    ArtifactHandler.interrupt = True
+    ArtifactHandler.ranges = []
+    ArtifactHandler.if_ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArtifactHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(download_artifact_module, "API_URL", f"http://127.0.0.1:{server.server_port}")
+    yield
+    server.shutdown()
+    server.server_close()
+
+# Interrupted transfers continue where they stopped
+def test_download_artifact_resumes(artifact_server):
+    with TemporaryDirectory() as tmp:
+        artifact_zip = download_artifact("test", "1", "token", "repo", tmp)
+        assert(Path(artifact_zip).read_bytes() == ARTIFACT)
+        assert(ArtifactHandler.ranges == [None, f"bytes={CHUNK_SIZE}-"])
+        # the range is only served from the zip that was interrupted
+        assert(ArtifactHandler.if_ranges == [None, '"v1"'])
+
+# A rejected range or a resumed zip failing its checks restarts the download
+@pytest.mark.parametrize("status", [416, 404, "corrupt"])
+def test_download_artifact_restarts(artifact_server, status):
+    ArtifactHandler.range_response = status
+    with TemporaryDirectory() as tmp:
+        artifact_zip = download_artifact("test", "1", "token", "repo", tmp)
+        assert(Path(artifact_zip).read_bytes() == ARTIFACT)
+        assert(ArtifactHandler.ranges == [None, f"bytes={CHUNK_SIZE}-", None])
+
+# Entries evicted between the lookup and the copy are downloaded again
+def test_download_evicted_artifact(artifact_server, monkeypatch):
+    ArtifactHandler.interrupt = False
+    with TemporaryDirectory() as tmp:
+        cache = DiskCache(os.path.join(tmp, "cache"))
+        key = artifact_cache_key("1", "test")
+        cache.put_bytes(key, b"stale")
+        get_path = cache.get_path
+        def evicting_get_path(key):
+            path = get_path(key)
+            cache.max_bytes = 0
+            cache.evict()
+            cache.max_bytes = 2 * len(ARTIFACT)
+            return path
+        monkeypatch.setattr(cache, "get_path", evicting_get_path)
+        artifact_zip = download_artifact("test", "1", "token", "repo", os.path.join(tmp, "download"), cache=cache)
+        assert(Path(artifact_zip).read_bytes() == ARTIFACT)
+        assert(ArtifactHandler.ranges == [None])
+        assert(get_path(key).read_bytes() == ARTIFACT)
+
+# Downloading over a zip linked from the cache leaves the cache entry intact
+def test_download_over_cached_artifact(artifact_server):
+    ArtifactHandler.interrupt = False
+    with TemporaryDirectory() as tmp:
+        cache = DiskCache(os.path.join(tmp, "cache"))
+        put_cached_artifact(cache, "1", "test", b"ARTIFACT-1")
+        download_dir = os.path.join(tmp, "download")
+        assert(Path(download_artifact("test", "1", "token", "repo", download_dir, cache=cache)).read_bytes() == b"ARTIFACT-1")
+        artifact_zip = download_artifact("test", "2", "token", "repo", download_dir, cache=cache)
+        assert(Path(artifact_zip).read_bytes() == ARTIFACT)
+        assert(cache.get_bytes(artifact_cache_key("1", "test")) == b"ARTIFACT-1")
+        assert(os.listdir(download_dir) == ["test"])
+
+# Cached zips not matching their digest are downloaded again
+@pytest.mark.parametrize("digest", [b"0" * 64, None])
+def test_download_corrupt_cached_artifact(artifact_server, digest):
+    ArtifactHandler.interrupt = False
+    with TemporaryDirectory() as tmp:
+        cache = DiskCache(os.path.join(tmp, "cache"))
+        key = artifact_cache_key("1", "test")
+        cache.put_bytes(key, b"CORRUPT")
+        if digest is not None:
+            cache.put_bytes(artifact_digest_key(key), digest)
+        artifact_zip = download_artifact("test", "1", "token", "repo", tmp, cache=cache)
+        assert(Path(artifact_zip).read_bytes() == ARTIFACT)
+        assert(ArtifactHandler.ranges == [None])
+        assert(cache.get_bytes(key) == ARTIFACT)
+        assert(cache.get_bytes(artifact_digest_key(key)) == hashlib.sha256(ARTIFACT).hexdigest().encode("ascii"))
+
+# Server errors are only retried by download_artifact, not by the client as well
+def test_download_artifact_retries_once(artifact_server):
+    ArtifactHandler.status = 503
+    with TemporaryDirectory() as tmp:
+        with pytest.raises(RuntimeError):
+            download_artifact("test", "1", "token", "repo", tmp)
+        assert(len(ArtifactHandler.ranges) == download_artifact_module.DOWNLOAD_RETRIES)
+        assert(os.listdir(tmp) == [])
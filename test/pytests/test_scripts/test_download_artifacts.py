@@ -1,11 +1,16 @@
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from zipfile import ZipFile
+import os
+import requests
 import sys
 import pytest
 
 scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
 sys.path.append(str(scripts_path))
-from download_artifacts import download_build_log_artifact
+import download_artifacts
+from download_artifact import ArtifactIndex
+from download_artifacts import download_all_artifacts, download_build_log_artifact, download_indexed_artifact, retry_rate_limited, search_and_download_previous_report_artifact
 from get_baseline_hash import parse_baseline_hash
 
 @pytest.fixture
@@ -29,4 +34,123 @@ def test_download_build_log_artifact(base_hash, github_token):
         BUILD_LOG_FILE_NUM = 1
         assert(len(build_log_files) == BUILD_LOG_FILE_NUM)
         EXPECTED_ZIP_NAME = template.format(base_hash) + "-build-log.zip"
-        assert(Path(build_log_files[0]).name == EXPECTED_ZIP_NAME)
\ No newline at end of file
+        assert(Path(build_log_files[0]).name == EXPECTED_ZIP_NAME)
+
+def http_error(status, headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return requests.HTTPError(response=response)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(download_artifacts.time, "sleep", sleeps.append)
+    return sleeps
+
+def failing(errors):
+    def function():
+        if errors:
+            raise errors.pop(0)
+        return "done"
+    return function
+
+@pytest.mark.parametrize("headers", [
+    {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "0"},
+    {"retry-after": "5"},
+])
+def test_retry_rate_limited_403(headers, sleeps):
+    assert(retry_rate_limited(failing([http_error(403, headers)])) == "done")
+    assert(len(sleeps) == 1)
+
+def test_retry_rate_limited_429(sleeps):
+    assert(retry_rate_limited(failing([http_error(429, {})])) == "done")
+    assert(len(sleeps) == 1)
+
+# Permission errors fail right away
+@pytest.mark.parametrize("status, headers", [
+    (403, {"x-ratelimit-remaining": "4999"}),
+    (404, {}),
+])
+def test_retry_rate_limited_other_errors(status, headers, sleeps):
+    with pytest.raises(requests.HTTPError):
+        retry_rate_limited(failing([http_error(status, headers)]))
+    assert(sleeps == [])
+
+@pytest.fixture
+def fake_downloads(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    names = [f"gcc-linux-rv64gc-lp64d-{{}}-target{i}" for i in range(6)]
+    downloaded = []
+    monkeypatch.setattr(download_artifacts, "issue_hashes", lambda repo, token: ["b", "c"])
+    monkeypatch.setattr(download_artifacts, "gcc_hashes", lambda git_hash, hashes, project: hashes)
+    monkeypatch.setattr(download_artifacts, "get_possible_artifact_names", lambda prefix: names)
+    # target0 failed to build
+    monkeypatch.setattr(download_artifacts, "artifact_exists", lambda name: not name.endswith("target0"))
+    def download_target_artifacts(template, previous_hash, prev_commits, *args):
+        assert(prev_commits == ["b", "c"])
+        downloaded.append(template)
+    monkeypatch.setattr(download_artifacts, "download_target_artifacts", download_target_artifacts)
+    return names, downloaded
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_download_all_artifacts(fake_downloads, jobs):
+    names, downloaded = fake_downloads
+    download_all_artifacts("a", "", "repo", "token", "", False, "build_logs", jobs=jobs)
+    assert(sorted(downloaded) == names[1:])
+
+def test_download_all_artifacts_raises_worker_errors(fake_downloads, monkeypatch):
+    def download_target_artifacts(template, *args):
+        raise RuntimeError(template)
+    monkeypatch.setattr(download_artifacts, "download_target_artifacts", download_target_artifacts)
+    with pytest.raises(RuntimeError):
+        download_all_artifacts("a", "", "repo", "token", "", False, "build_logs", jobs=4)
+
+@pytest.fixture
+def stale_index(monkeypatch, tmp_path):
+    """An index whose artifact 2 was deleted and re-uploaded as artifact 5"""
+    monkeypatch.chdir(tmp_path)
+    index = ArtifactIndex("repo", "token", str(tmp_path / "index.json"))
+    index.artifacts = {"a-report.log": (2, "2999-01-01T00:00:00+00:00"), "b-report.log": (3, "2999-01-01T00:00:00+00:00")}
+    downloads = []
+    def download_artifact(artifact_name, artifact_id, token, repo_name, output_dir, cache=None):
+        downloads.append(artifact_id)
+        if artifact_id == "2":
+            raise http_error(404, {})
+        return f"{artifact_name}.zip"
+    monkeypatch.setattr(download_artifacts, "download_artifact", download_artifact)
+    searched = {"a-report.log": "5"}
+    monkeypatch.setattr(download_artifacts, "search_for_artifact", lambda name, repo, token: searched.get(name))
+    return index, downloads, searched
+
+def test_deleted_indexed_artifact_is_searched(stale_index):
+    index, downloads, _ = stale_index
+    assert(download_indexed_artifact("a-report.log", "2", "token", "repo", "out", index) == "a-report.log.zip")
+    assert(downloads == ["2", "5"])
+    assert(index.lookup("a-report.log") is None)
+    assert(ArtifactIndex("repo", "token", index.index_path).lookup("a-report.log") is None)
+
+def test_deleted_artifact_falls_back_to_next_hash(stale_index, monkeypatch):
+    index, downloads, searched = stale_index
+    searched.clear()
+    extracted = []
+    monkeypatch.setattr(download_artifacts, "extract_artifact", lambda artifact_zip, **kwargs: extracted.append(artifact_zip))
+    base_hash = search_and_download_previous_report_artifact("{}", "", ["a", "b"], "repo", "token", index=index)
+    assert(base_hash == "b")
+    assert(downloads == ["2", "3"])
+    assert(extracted == ["b-report.log.zip"])
+
+def test_deleted_artifact_without_index_raises(stale_index):
+    with pytest.raises(requests.HTTPError):
+        download_indexed_artifact("a-report.log", "2", "token", "repo", "out")
+
+# Report artifacts missing the log they are named after are extracted whole
+def test_report_artifact_without_named_log(stale_index, monkeypatch, tmp_path):
+    index, _, _ = stale_index
+    artifact_zip = str(tmp_path / "b-report.zip")
+    with ZipFile(artifact_zip, "w") as zf:
+        zf.writestr("renamed-report.log", "log")
+        zf.writestr("logs/other.log", "other")
+    monkeypatch.setattr(download_artifacts, "download_artifact", lambda *args, **kwargs: artifact_zip)
+    assert(search_and_download_previous_report_artifact("{}", "", ["b"], "repo", "token", index=index) == "b")
+    assert(sorted(os.listdir("previous_logs")) == ["logs", "renamed-report.log"])
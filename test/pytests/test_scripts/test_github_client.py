@@ -0,0 +1,103 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+import json
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+import github_client
+from github_client import GithubClient
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+    failures = 0
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.headers.get("If-None-Match"), self.headers.get("Authorization")))
+        if Handler.failures > 0:
+            Handler.failures -= 1
+            self.send_response(502)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        page = 2 if "page=2" in self.path else 1
+        etag = f'"page{page}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps([page * 10, page * 10 + 1]).encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if page == 1:
+            self.send_header("Link", f'<http://127.0.0.1:{self.server.server_port}/items?page=2>; rel="next"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PATCH(self):
+        Handler.requests.append((self.path, None, self.headers.get("Authorization")))
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status = 502 if Handler.failures > 0 else 200
+        Handler.failures = max(Handler.failures - 1, 0)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url(monkeypatch):
+    monkeypatch.setattr(github_client.time, "sleep", lambda seconds: None)
+    Handler.requests = []
+    Handler.failures = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_paginate_follows_links(server_url):
+    client = GithubClient("secret")
+    assert(list(client.paginate(f"{server_url}/items")) == [10, 11, 20, 21])
+    assert([path for path, _, _ in Handler.requests] == ["/items", "/items?page=2"])
+    assert(all(auth == "token secret" for _, _, auth in Handler.requests))
+
+def test_conditional_get_is_served_from_cache(server_url):
+    with TemporaryDirectory() as cache_dir:
+        client = GithubClient("secret", cache_dir)
+        assert(client.get_json(f"{server_url}/items") == [10, 11])
+        # a new client only has the responses kept on disk
+        client = GithubClient("secret", cache_dir)
+        response = client.get(f"{server_url}/items")
+        assert(response.status_code == 200)
+        assert(response.json() == [10, 11])
+        assert(Handler.requests[-1][1] == '"page1"')
+        # responses are not shared between tokens
+        GithubClient("other", cache_dir).get(f"{server_url}/items")
+        assert(Handler.requests[-1][1] is None)
+
+def test_server_errors_are_retried(server_url):
+    Handler.failures = 2
+    client = GithubClient()
+    assert(client.get_json(f"{server_url}/items") == [10, 11])
+    assert(len(Handler.requests) == 3)
+    Handler.failures = github_client.RETRIES
+    assert(client.get(f"{server_url}/items?page=2").status_code == 502)
+
+# Requests that may not be idempotent are only retried when asked to
+def test_patch_is_not_retried(server_url):
+    client = GithubClient()
+    Handler.failures = 1
+    assert(client.request("PATCH", f"{server_url}/issues/1", data="{}").status_code == 502)
+    assert(len(Handler.requests) == 1)
+    Handler.failures = 1
+    assert(client.request("PATCH", f"{server_url}/issues/1", retry=True, data="{}").status_code == 200)
+    assert(len(Handler.requests) == 3)
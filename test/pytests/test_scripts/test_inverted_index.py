@@ -0,0 +1,58 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+from compare_testsuite_log import compare_logs
+from inverted_index import InvertedIndex, Posting
+
+SUMMARY_TABLE = '''
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+     rv64gc/  lp64d/ medlow |    2 /     2 |    0 /     0 |    0 /     0 |
+'''
+
+@pytest.fixture
+def summaries_dir():
+    tmp_dir = TemporaryDirectory()
+    previous_log = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-aaa-multilib-report.log")
+    current_log = os.path.join(tmp_dir.name, "gcc-linux-rv64gc-lp64d-bbb-multilib-report.log")
+    with open(previous_log, "w") as f:
+        f.write('''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.dg/pr1.c execution test
+FAIL: gcc.target/riscv/rvv/pr2.c (test for excess errors)
+''' + SUMMARY_TABLE)
+    with open(current_log, "w") as f:
+        f.write('''\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: gcc.target/riscv/rvv/pr2.c (test for excess errors)
+FAIL: gcc.target/riscv/rvv/pr3.c (internal compiler error: Segmentation fault)
+''' + SUMMARY_TABLE)
+    summaries = os.path.join(tmp_dir.name, "summaries")
+    os.mkdir(summaries)
+    output = os.path.join(summaries, "gcc-linux-rv64gc-lp64d-bbb-multilib-report-summary.md")
+    compare_logs("aaa", previous_log, "bbb", current_log, output, True, "")
+    yield summaries
+    tmp_dir.cleanup()
+
+
+def test_lookup(summaries_dir):
+    index = InvertedIndex()
+    index.add_summaries(summaries_dir)
+    target = "linux rv64gc lp64d medlow multilib"
+    assert(index.lookup("gcc.dg/pr1.c") == [("gcc.dg/pr1.c", Posting("bbb", target, "gcc", "Resolved", "FAIL", "execution"))])
+    assert(index.lookup("gcc.target/riscv/rvv/") == [
+        ("gcc.target/riscv/rvv/pr2.c", Posting("bbb", target, "gcc", "Remaining Preexisting", "FAIL", "excess-errors")),
+        ("gcc.target/riscv/rvv/pr3.c", Posting("bbb", target, "gcc", "New", "FAIL", "internal-compiler-error")),
+    ])
+    assert(index.lookup("gcc.dg/missing.c") == [])
+
+def test_save_and_load(summaries_dir):
+    index = InvertedIndex()
+    index.add_summaries(summaries_dir)
+    index_path = os.path.join(summaries_dir, "..", "index.json")
+    index.save(index_path)
+    assert(InvertedIndex.load(index_path).postings == index.postings)
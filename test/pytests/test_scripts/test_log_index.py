@@ -0,0 +1,50 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+from log_index import find_logs, get_hash_from_file_name, hashless_name, index_logs
+
+LOGS = [
+    "gcc-linux-rv64gcv-lp64d-aaa-multilib-report.log",
+    "gcc-linux-rv64gcv-lp64d-bbb-multilib-report.log",
+    "gcc-linux-rv64gcv-lp64d-aaa-non-multilib-report.log",
+    "gcc-newlib-rv32gc-ilp32d-ccc-non-multilib-report.log",
+    "failed_testsuite.txt",
+    "failed_build.txt",
+]
+
+@pytest.fixture
+def log_dir():
+    tmp_dir = TemporaryDirectory()
+    for log in LOGS:
+        open(os.path.join(tmp_dir.name, log), "w").close()
+    yield tmp_dir.name
+    tmp_dir.cleanup()
+
+def test_hashless_name():
+    assert(hashless_name("gcc-linux-rv64gcv-lp64d-aaa-multilib-report.log") == "gcc-linux-rv64gcv-lp64d-multilib-report.log")
+    assert(hashless_name("gcc-newlib-rv32gc-ilp32d-ccc-non-multilib-report.log") == "gcc-newlib-rv32gc-ilp32d-non-multilib-report.log")
+    assert(get_hash_from_file_name("gcc-newlib-rv32gc-ilp32d-ccc-non-multilib-report.log") == "ccc")
+
+def test_index_logs(log_dir):
+    index = index_logs(log_dir)
+    assert({name: sorted(files) for name, files in index.items()} == {
+        "gcc-linux-rv64gcv-lp64d-multilib-report.log": [LOGS[0], LOGS[1]],
+        "gcc-linux-rv64gcv-lp64d-non-multilib-report.log": [LOGS[2]],
+        "gcc-newlib-rv32gc-ilp32d-non-multilib-report.log": [LOGS[3]],
+    })
+    assert(index_logs(os.path.join(log_dir, "missing")) == {})
+
+def test_find_logs(log_dir):
+    index = index_logs(log_dir)
+    # any hash of the same target matches, the preferred hash comes first
+    assert(find_logs(index, "gcc-linux-rv64gcv-lp64d-zzz-multilib-report.log", "bbb")[0] == LOGS[1])
+    assert(find_logs(index, "gcc-linux-rv64gcv-lp64d-zzz-multilib-report.log", "aaa")[0] == LOGS[0])
+    # multilib and non-multilib logs of a target are kept apart
+    assert(find_logs(index, "gcc-linux-rv64gcv-lp64d-zzz-non-multilib-report.log") == [LOGS[2]])
+    assert(find_logs(index, "gcc-newlib-rv32gc-ilp32d-{}-non-multilib-report.log") == [LOGS[3]])
+    assert(find_logs(index, "gcc-newlib-rv64gc-lp64d-ccc-non-multilib-report.log") == [])
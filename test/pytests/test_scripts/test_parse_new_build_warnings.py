@@ -1,5 +1,6 @@
 from pathlib import Path
 from tempfile import TemporaryDirectory, NamedTemporaryFile
+import os
 import re
 import pytest
 import sys
@@ -7,7 +8,9 @@ import sys
 scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
 sys.path.append(str(scripts_path))
 
-from parse_build_warnings import parse_build_warnings, construct_warning_set, parse_build_warnings_from_directory, parse_target, POST_COMMIT, PRE_COMMIT, export_build_warnings
+from disk_cache import DiskCache
+import download_artifacts
+from parse_build_warnings import parse_build_warnings, construct_warning_set, download_baseline_log, parse_build_warnings_from_directory, parse_target, POST_COMMIT, PRE_COMMIT, export_build_warnings
 
 @pytest.fixture
 def build_warning_string_1()->str:
@@ -133,6 +136,17 @@ def test_parse_build_warnings(build_warning_1, build_warning_2):
     assert(new_warnings == expected)
     assert(resolved_warnings == set())
 
+def test_parse_build_warnings_ignores_line_numbers(build_warning_1, build_warning_string_1):
+    with NamedTemporaryFile() as tmp:
+        tmp.write(build_warning_string_1.replace("248", "250").replace(":25:", ":27:").encode('utf-8'))
+        tmp.flush()
+        assert(parse_build_warnings(build_warning_1, tmp.name) == (set(), set()))
+    with NamedTemporaryFile() as tmp:
+        tmp.write(build_warning_string_1.replace("event_id", "other_id").encode('utf-8'))
+        tmp.flush()
+        new_warnings, resolved_warnings = parse_build_warnings(build_warning_1, tmp.name)
+        assert(len(new_warnings) == 1 and len(resolved_warnings) == 1)
+
 def test_pre_commit_parse_build_warnings_from_directory(build_warnings_directory_1, build_warnings_directory_3):
     old_build_dir, old_a, old_b = build_warnings_directory_1
     new_build_dir, _, _ = build_warnings_directory_3
@@ -193,6 +207,48 @@ def test_post_commit_parse_build_warnings_from_directory(build_warnings_director
         print("\n\nnew_warnings: ", new_warnings[target])
         assert(new_warnings[target] == warning_set)
 
+def test_cached_baseline_warnings(build_warnings_directory_1, build_warnings_directory_2):
+    old_build_dir, old_a, _ = build_warnings_directory_1
+    new_build_dir, _, _ = build_warnings_directory_2
+    with TemporaryDirectory() as cache_dir:
+        cache = DiskCache(cache_dir)
+        expected = parse_build_warnings_from_directory(old_build_dir, new_build_dir, POST_COMMIT, 1, cache)
+        # the baseline of a is no longer downloaded
+        os.remove(old_a)
+        assert(parse_build_warnings_from_directory(old_build_dir, new_build_dir, POST_COMMIT, 1, cache, "a") == expected)
+        with pytest.raises(RuntimeError):
+            parse_build_warnings_from_directory(old_build_dir, new_build_dir, POST_COMMIT, 1, cache, "c")
+
+# Baselines evicted after the download step skipped them are downloaded
+def test_evicted_baseline_warnings(build_warnings_directory_1, build_warnings_directory_2):
+    old_build_dir, old_a, _ = build_warnings_directory_1
+    new_build_dir, _, _ = build_warnings_directory_2
+    with TemporaryDirectory() as cache_dir:
+        cache = DiskCache(cache_dir)
+        expected = parse_build_warnings_from_directory(old_build_dir, new_build_dir, POST_COMMIT, 1, cache)
+        log = old_a.read_text()
+        os.remove(old_a)
+        cache.max_bytes = 0
+        cache.evict()
+        downloads = []
+        def download_baseline(target, git_hash):
+            downloads.append((target, git_hash))
+            old_a.write_text(log)
+            return old_a
+        assert(parse_build_warnings_from_directory(old_build_dir, new_build_dir, POST_COMMIT, 1, cache, "a", download_baseline) == expected)
+        assert(downloads == [(parse_target(old_a.name), "a")])
+
+def test_download_baseline_log(build_warnings_directory_1, monkeypatch):
+    old_build_dir, old_a, _ = build_warnings_directory_1
+    templates = []
+    def download_build_log_artifact(template, git_hash, repo_name, token, output_dir):
+        templates.append(template)
+        Path(output_dir, "linux-rv64gc-lp64d-d-non-multilib-build-log-stderr.log").touch()
+    monkeypatch.setattr(download_artifacts, "download_build_log_artifact", download_build_log_artifact)
+    path = download_baseline_log(old_build_dir, "repo", "token", parse_target(old_a.name), "d")
+    assert(templates == ["gcc-linux-rv64gc-lp64d-{}-non-multilib"])
+    assert(path.name == "linux-rv64gc-lp64d-d-non-multilib-build-log-stderr.log")
+
 def test_export_empty_build_warnings():
     empty_warnings_dict = {"foo": set()}
     warning_type = "New build warnings"
@@ -208,3 +264,34 @@ def test_export_build_warnings():
         export_build_warnings(warnings_dict, tmp.name, warning_type)
         with open(tmp.name, 'r') as f:
             assert(f.readline() == f"# {warning_type}\n")
+
+def test_construct_warning_set_line_endings(build_warning_string_1):
+    with NamedTemporaryFile() as tmp:
+        assert(construct_warning_set(tmp.name) == set())
+        tmp.write(build_warning_string_1.replace("\n", "\r\n").encode('utf-8'))
+        tmp.flush()
+        assert(construct_warning_set(tmp.name) == {'../../../gcc/gcc/analyzer/analyzer.cc:248:25: warning: unknown conversion type character ‘@’ in format [-Wformat=]\n  248 |       pp_printf (&pp, "%@", &event_id);\n      |                         ^\n'})
+
+def test_export_grouped_build_warnings():
+    warnings_dict = {"linux-a": {"w1\n", "w2\n"}, "linux-b": {"w1\n", "w3\n"}, "newlib-c": {"w1\n", "w3\n"}}
+    with NamedTemporaryFile() as tmp:
+        export_build_warnings(warnings_dict, tmp.name, "New build warnings")
+        with open(tmp.name, 'r') as f:
+            assert(f.read() == '''# New build warnings
+A List of build warnings present at this hash
+## All targets
+```
+w1
+```
+---
+## linux-b, newlib-c
+```
+w3
+```
+---
+## linux-a
+```
+w2
+```
+---
+''')
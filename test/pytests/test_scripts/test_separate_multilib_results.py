@@ -0,0 +1,109 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+import separate_multilib_results
+from separate_multilib_results import write_file
+
+REPORT_NAME = "gcc-linux-rv64gcv-lp64d-abc123-multilib-report.log"
+
+REPORT = '''\t\t=== gcc: Unexpected fails for rv64gcv lp64d medlow  ===
+FAIL: gcc.dg/pr1.c execution test
+\t\t=== gcc: Unexpected fails for rv64gcv lp64d medlow --param=riscv-autovec-preference=scalable  ===
+FAIL: gcc.dg/pr2.c execution test
+
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+    rv64gcv/  lp64d/ medlow |    1 /     1 |    0 /     0 |    0 /     0 |
+    rv64gcv/  lp64d/ medlow |    1 /     1 |    0 /     0 |    0 /     0 |
+  --param=riscv-autovec-preference=scalable
+'''
+
+@pytest.fixture
+def report_dir():
+    tmp_dir = TemporaryDirectory()
+    with open(os.path.join(tmp_dir.name, REPORT_NAME), "w") as f:
+        f.write(REPORT)
+    yield tmp_dir.name
+    tmp_dir.cleanup()
+
+
+def test_split_in_place(report_dir):
+    write_file(REPORT_NAME, report_dir, "multilib", report_dir)
+    assert(sorted(os.listdir(report_dir)) == [
+        "gcc-linux-rv64gcv-lp64d-abc123-autovec-scalable-multilib-report.log",
+        REPORT_NAME,
+    ])
+    with open(os.path.join(report_dir, REPORT_NAME), "r") as f:
+        lines = f.readlines()
+    assert(lines[1] == "FAIL: gcc.dg/pr1.c execution test\n")
+    # only the row of the target itself
+    assert(len(lines) == 7)
+    with open(os.path.join(report_dir, "gcc-linux-rv64gcv-lp64d-abc123-autovec-scalable-multilib-report.log"), "r") as f:
+        lines = f.readlines()
+    assert(lines[1] == "FAIL: gcc.dg/pr2.c execution test\n")
+    assert(lines[-1] == "  --param=riscv-autovec-preference=scalable\n")
+
+def read_dir(directory):
+    contents = {}
+    for file in os.listdir(directory):
+        with open(os.path.join(directory, file), "r") as f:
+            contents[file] = f.read()
+    return contents
+
+def split_directory(tmp_path, monkeypatch, jobs):
+    indir = tmp_path / f"reports-{jobs}"
+    os.mkdir(indir)
+    for git_hash in ("abc123", "def456", "fed789"):
+        with open(indir / REPORT_NAME.replace("abc123", git_hash), "w") as f:
+            f.write(REPORT)
+    with open(indir / "failed_testsuite.txt", "w") as f:
+        f.write(REPORT_NAME + "\n")
+    outdir = tmp_path / f"out-{jobs}"
+    os.mkdir(outdir)
+    monkeypatch.setattr(sys, "argv", ["separate_multilib_results.py", "-indir", str(indir), "-outdir", str(outdir), "-j", jobs])
+    separate_multilib_results.main()
+    # the reports are consumed, failed_*.txt is left alone
+    assert(os.listdir(indir) == ["failed_testsuite.txt"])
+    return read_dir(outdir)
+
+# The -indir worker pool writes the same files as a serial run
+def test_split_directory_pooled(tmp_path, monkeypatch):
+    serial = split_directory(tmp_path, monkeypatch, "1")
+    pooled = split_directory(tmp_path, monkeypatch, "2")
+    assert(len(serial) == 6)
+    assert(pooled == serial)
+
+SCALABLE_NAME = "gcc-linux-rv64gcv-lp64d-abc123-autovec-scalable-multilib-report.log"
+LMUL_NAME = "gcc-linux-rv64gcv-lp64d-abc123-lmul-m2-multilib-report.log"
+
+# Splitting in place is safe when an output is named like another worker's input
+def test_split_directory_in_place_pooled(tmp_path, monkeypatch):
+    with open(tmp_path / REPORT_NAME, "w") as f:
+        f.write(REPORT)
+    with open(tmp_path / SCALABLE_NAME, "w") as f:
+        f.write('''\t\t=== gcc: Unexpected fails for rv64gcv lp64d medlow --param=riscv-autovec-preference=scalable  ===
+FAIL: gcc.dg/pr2.c execution test
+\t\t=== gcc: Unexpected fails for rv64gcv lp64d medlow --param=riscv-autovec-lmul=m2  ===
+FAIL: gcc.dg/pr3.c execution test
+
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+    rv64gcv/  lp64d/ medlow |    1 /     1 |    0 /     0 |    0 /     0 |
+  --param=riscv-autovec-preference=scalable
+    rv64gcv/  lp64d/ medlow |    1 /     1 |    0 /     0 |    0 /     0 |
+  --param=riscv-autovec-lmul=m2
+''')
+    monkeypatch.setattr(sys, "argv", ["separate_multilib_results.py", "-indir", str(tmp_path), "-outdir", str(tmp_path), "-j", "2"])
+    separate_multilib_results.main()
+    assert(sorted(os.listdir(tmp_path)) == sorted([REPORT_NAME, SCALABLE_NAME, LMUL_NAME]))
+    with open(tmp_path / LMUL_NAME, "r") as f:
+        assert(f.readline() == "\t\t=== gcc: Unexpected fails for rv64gcv lp64d medlow --param=riscv-autovec-lmul=m2  ===\n")
+    with open(tmp_path / SCALABLE_NAME, "r") as f:
+        assert(f.readlines()[1] == "FAIL: gcc.dg/pr2.c execution test\n")
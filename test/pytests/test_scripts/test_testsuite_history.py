@@ -0,0 +1,100 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import os
+import pytest
+import sys
+
+scripts_path = Path(__file__).parent.parent.parent.parent / "scripts"
+sys.path.append(str(scripts_path))
+from testsuite_history import baseline_hash, connect, currently_failing, first_failure, flaky_tests, ingest_run
+
+SUMMARY_TABLE = '''
+               ========= Summary of gcc testsuite =========
+                            | # of unexpected case / # of unique unexpected case
+                            |          gcc |          g++ |     gfortran |
+     rv64gc/  lp64d/ medlow |    {} /     {} |    0 /     0 |    0 /     0 |
+'''
+
+TARGET = ("linux", "rv64gc", "lp64d", "medlow", 1, "", "gcc")
+
+def report_log(failures):
+    log = "\t\t=== gcc: Unexpected fails for rv64gc lp64d medlow  ===\n"
+    log += "".join(f"FAIL: {test} execution test\n" for test in failures)
+    return log + SUMMARY_TABLE.format(len(failures), len(failures))
+
+@pytest.fixture
+def history():
+    tmp_dir = TemporaryDirectory()
+    conn = connect(os.path.join(tmp_dir.name, "history.sqlite"))
+    # pr1 keeps failing, pr2 flips between failing and passing
+    runs = [
+        ("aaa", ["gcc.dg/pr1.c", "gcc.dg/pr2.c"]),
+        ("bbb", ["gcc.dg/pr1.c"]),
+        ("ccc", ["gcc.dg/pr1.c", "gcc.dg/pr2.c"]),
+    ]
+    for day, (git_hash, failures) in enumerate(runs):
+        log_dir = os.path.join(tmp_dir.name, git_hash)
+        os.mkdir(log_dir)
+        with open(os.path.join(log_dir, f"gcc-linux-rv64gc-lp64d-{git_hash}-multilib-report.log"), "w") as f:
+            f.write(report_log(failures))
+        ingest_run(conn, git_hash, log_dir, f"2024-01-0{day + 1}T00:00:00+00:00")
+    yield conn, tmp_dir.name
+    conn.close()
+    tmp_dir.cleanup()
+
+def test_first_failure(history):
+    conn, _ = history
+    assert(first_failure(conn, "gcc.dg/pr1.c") == {TARGET: "aaa"})
+    assert(first_failure(conn, "gcc.dg/pr3.c") == {})
+
+def test_currently_failing(history):
+    conn, tmp_dir = history
+    assert(currently_failing(conn, "gcc.dg/pr2.c") == {TARGET: ["FAIL at ccc"]})
+    # a later run without failures fixes the target
+    log_dir = os.path.join(tmp_dir, "ddd")
+    os.mkdir(log_dir)
+    with open(os.path.join(log_dir, "gcc-linux-rv64gc-lp64d-ddd-multilib-report.log"), "w") as f:
+        f.write(report_log([]))
+    ingest_run(conn, "ddd", log_dir, "2024-01-04T00:00:00+00:00")
+    assert(currently_failing(conn, "gcc.dg/pr1.c") == {})
+
+def test_flaky_tests(history):
+    conn, _ = history
+    assert(flaky_tests(conn, runs=10, flips=2) == {(TARGET, "gcc.dg/pr2.c"): 2})
+    # only the two most recent runs are considered
+    assert(flaky_tests(conn, runs=2, flips=1) == {(TARGET, "gcc.dg/pr2.c"): 1})
+
+def test_reingest_replaces_results(history):
+    conn, tmp_dir = history
+    log_dir = os.path.join(tmp_dir, "ccc")
+    with open(os.path.join(log_dir, "gcc-linux-rv64gc-lp64d-ccc-multilib-report.log"), "w") as f:
+        f.write(report_log(["gcc.dg/pr1.c"]))
+    ingest_run(conn, "ccc", log_dir, "2024-01-03T00:00:00+00:00")
+    assert(currently_failing(conn, "gcc.dg/pr2.c") == {})
+    assert(flaky_tests(conn, runs=10, flips=1) == {(TARGET, "gcc.dg/pr2.c"): 1})
+
+def test_baseline_hash(history):
+    conn, _ = history
+    assert(baseline_hash(conn, ["zzz", "bbb", "aaa"]) == "bbb")
+    assert(baseline_hash(conn, ["zzz"]) is None)
+
+BINUTILS_LOG = '''\t\t=== ld: Unexpected fails for rv64gc lp64d medlow  ===
+FAIL: ld-riscv-elf/pr1
+''' + '''
+               ========= Summary of binutils testsuite =========
+                            | # of unexpected case
+                            |     binutils |           ld |          gas |
+     rv64gc/  lp64d/ medlow |            0 |            1 |      - |
+'''
+
+# The tool columns are read from the header of the summary table
+def test_ingest_binutils_report():
+    with TemporaryDirectory() as tmp_dir:
+        conn = connect(os.path.join(tmp_dir, "history.sqlite"))
+        with open(os.path.join(tmp_dir, "binutils-linux-rv64gc-lp64d-aaa-multilib-report.log"), "w") as f:
+            f.write(BINUTILS_LOG)
+        ingest_run(conn, "aaa", tmp_dir, "2024-01-01T00:00:00+00:00")
+        tools = {row[0] for row in conn.execute("SELECT tool FROM targets")}
+        assert(tools == {"binutils", "ld"})
+        assert(first_failure(conn, "ld-riscv-elf/pr1") == {("linux", "rv64gc", "lp64d", "medlow", 1, "", "ld"): "aaa"})
+        conn.close()